@@ -1,22 +1,14 @@
 import pandas as pd
-import psycopg2
 from psycopg2.extras import execute_batch
 from dotenv import load_dotenv
-import os
 import re
+import sys
+from pathlib import Path
 
-load_dotenv()
-conn = psycopg2.connect(
-    host=os.getenv('DB_HOST'),
-    port=int(os.getenv('DB_PORT')),
-    database=os.getenv('DB_NAME'),
-    user=os.getenv('DB_USER'),
-    password=os.getenv('DB_PASSWORD')
-)
-df = pd.read_sql("SELECT * FROM forum_posts", conn)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connect, release
 
-df['post_length'] = df['post_content'].str.len()
-df = df[(df['post_length'] >= 100) & (df['post_length'] <= 5000)] #discarding very small and very large posts
+load_dotenv()
 
 
 def count_strong_signals(text):
@@ -34,9 +26,6 @@ def count_strong_signals(text):
     
     return sum(signals.values())
 
-df['signal_count'] = df['post_content'].apply(count_strong_signals) # Require 2 strong signals
-df = df[df['signal_count'] >= 2]
-
 def calculate_quality_score(text):
     """Calculating post quality to drop low quality posts"""
     text_lower = str(text).lower()
@@ -67,9 +56,6 @@ def calculate_quality_score(text):
     
     return score
 
-df['quality_score'] = df['post_content'].apply(calculate_quality_score)
-df = df[df['quality_score'] >= 5] # quality filter
-
 def is_question_only(text):
     """Removing posts that are just questions"""
     text_lower = str(text).lower()
@@ -86,8 +72,6 @@ def is_question_only(text):
     
     return False
 
-df = df[~df['post_content'].apply(is_question_only)]
-
 def is_generic_response(text):
     """Filtering out generic posts"""
     text_lower = str(text).lower().strip()
@@ -110,8 +94,6 @@ def is_generic_response(text):
     
     return False
 
-df = df[~df['post_content'].apply(is_generic_response)]
-
 exclude_keywords = [
     'toefl only', 'ielts only', 'visa only',
     'housing', 'apartment', 'roommate',
@@ -125,10 +107,6 @@ def is_offtopic(title):
     title_lower = str(title).lower()
     return any(keyword in title_lower for keyword in exclude_keywords)
 
-df = df[~df['thread_title'].apply(is_offtopic)]
-
-df = df.drop_duplicates(subset=['post_content'], keep='first')
-
 def get_signature(text):
     """Finding and removing duplicate posts"""
     text_lower = str(text).lower()
@@ -142,55 +120,82 @@ def get_signature(text):
     
     return '|'.join(numbers[:10]) + '||' + '|'.join(sorted(schools))
 
-df['signature'] = df['post_content'].apply(get_signature)
-df = df.drop_duplicates(subset=['signature'], keep='first')
-
 target_max = 30000
-if len(df) > target_max:
-    df = df.nlargest(target_max, 'quality_score')
-
-df_clean = df[['id', 'thread_title', 'thread_url', 'author', 'page', 'post_content', 'scraped_at']].copy()
-
-cursor = conn.cursor()
-
-cursor.execute("DROP TABLE IF EXISTS filtered_posts;")
-
-cursor.execute("""
-    CREATE TABLE filtered_posts (
-        id INTEGER PRIMARY KEY,
-        thread_title TEXT,
-        thread_url TEXT,
-        author VARCHAR(255),
-        page INTEGER,
-        post_content TEXT,
-        scraped_at TIMESTAMP,
-        filtered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    
-    CREATE INDEX idx_filtered_thread ON filtered_posts(thread_title);
-    CREATE INDEX idx_filtered_author ON filtered_posts(author);
-    CREATE INDEX idx_filtered_content ON filtered_posts USING gin(to_tsvector('english', post_content));
-""")
-conn.commit()
-
-insert_query = """
-    INSERT INTO filtered_posts (id, thread_title, thread_url, author, page, post_content, scraped_at)
-    VALUES (%s, %s, %s, %s, %s, %s, %s)
-"""
-
-data = [
-    (int(row['id']), str(row['thread_title']), str(row['thread_url']),
-     str(row['author']), int(row['page']), str(row['post_content']), row['scraped_at'])
-    for _, row in df_clean.iterrows()
-]
 
-execute_batch(cursor, insert_query, data, page_size=1000)
-conn.commit()
+def filter_posts(df):
+    """Apply the filters above to forum_posts rows, returns the posts kept for extraction"""
+    df['post_length'] = df['post_content'].str.len()
+    df = df[(df['post_length'] >= 100) & (df['post_length'] <= 5000)] #discarding very small and very large posts
+
+    df['signal_count'] = df['post_content'].apply(count_strong_signals) # Require 2 strong signals
+    df = df[df['signal_count'] >= 2]
+
+    df['quality_score'] = df['post_content'].apply(calculate_quality_score)
+    df = df[df['quality_score'] >= 5] # quality filter
+
+    df = df[~df['post_content'].apply(is_question_only)]
+
+    df = df[~df['post_content'].apply(is_generic_response)]
+
+    df = df[~df['thread_title'].apply(is_offtopic)]
+
+    df = df.drop_duplicates(subset=['post_content'], keep='first')
+
+    df['signature'] = df['post_content'].apply(get_signature)
+    df = df.drop_duplicates(subset=['signature'], keep='first')
+
+    if len(df) > target_max:
+        df = df.nlargest(target_max, 'quality_score')
+
+    return df[['id', 'thread_title', 'thread_url', 'author', 'page', 'post_content', 'scraped_at']].copy()
+
+
+def main():
+    conn = connect()
+    df = pd.read_sql("SELECT * FROM forum_posts", conn)
+    df_clean = filter_posts(df)
+
+    cursor = conn.cursor()
+
+    cursor.execute("DROP TABLE IF EXISTS filtered_posts;")
+
+    cursor.execute("""
+        CREATE TABLE filtered_posts (
+            id INTEGER PRIMARY KEY,
+            thread_title TEXT,
+            thread_url TEXT,
+            author VARCHAR(255),
+            page INTEGER,
+            post_content TEXT,
+            scraped_at TIMESTAMP,
+            filtered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE INDEX idx_filtered_thread ON filtered_posts(thread_title);
+        CREATE INDEX idx_filtered_author ON filtered_posts(author);
+        CREATE INDEX idx_filtered_content ON filtered_posts USING gin(to_tsvector('english', post_content));
+    """)
+    conn.commit()
+
+    insert_query = """
+        INSERT INTO filtered_posts (id, thread_title, thread_url, author, page, post_content, scraped_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+
+    data = [
+        (int(row['id']), str(row['thread_title']), str(row['thread_url']),
+         str(row['author']), int(row['page']), str(row['post_content']), row['scraped_at'])
+        for _, row in df_clean.iterrows()
+    ]
 
+    execute_batch(cursor, insert_query, data, page_size=1000)
+    conn.commit()
 
-df_clean.to_csv('filtered_posts_for_gpt.csv', index=False)
+    df_clean.to_csv('filtered_posts_for_gpt.csv', index=False)
 
+    cursor.close()
+    release(conn)
 
-cursor.close()
-conn.close()
 
+if __name__ == "__main__":
+    main()
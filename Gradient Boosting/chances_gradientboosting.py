@@ -4,21 +4,18 @@ Gradient Boosting for PhD Admissions chances
 
 import pandas as pd
 import numpy as np
-import psycopg2
 from dotenv import load_dotenv
-import os
+import sys
+from pathlib import Path
 from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
 from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix, mean_squared_error, mean_absolute_error
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connection
+from shared.snapshot import load_snapshot, snapshot_is_current
+
 load_dotenv()
-db_params = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
 
 FEATURES = ['undergrad_gpa_std', 'attended_grad_program', 'taken_calculus', 
             'taken_linear_algebra', 'taken_real_analysis', 'gre_quant_std', 
@@ -27,10 +24,16 @@ FEATURES = ['undergrad_gpa_std', 'attended_grad_program', 'taken_calculus',
 
 TARGET = 'got_phd_offer'
 
-conn = psycopg2.connect(**db_params)
-query = f"SELECT {', '.join(FEATURES + [TARGET])} FROM admissions_data_cleaned WHERE {TARGET} IS NOT NULL"
-df = pd.read_sql(query, conn)
-conn.close()
+# Parquet snapshot published by cleaning.py, read from Postgres instead before the first one
+# or when admissions_data_cleaned changed since (e.g. cleaned with --no-snapshot)
+with connection() as conn:
+    if snapshot_is_current(conn):
+        df = load_snapshot(FEATURES + [TARGET])
+        df = df[df[TARGET].notna()]
+    else:
+        print("No current snapshot of admissions_data_cleaned, reading it from Postgres")
+        query = f"SELECT {', '.join(FEATURES + [TARGET])} FROM admissions_data_cleaned WHERE {TARGET} IS NOT NULL"
+        df = pd.read_sql(query, conn)
 
 X = df[FEATURES]
 y = df[TARGET]
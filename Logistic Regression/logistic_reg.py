@@ -1,20 +1,17 @@
 import pandas as pd
 import numpy as np
-import psycopg2
 from dotenv import load_dotenv
-import os
+import sys
+from pathlib import Path
 from sklearn.model_selection import train_test_split, GridSearchCV, StratifiedKFold
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, confusion_matrix, classification_report
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connection
+from shared.snapshot import load_snapshot, snapshot_is_current
+
 load_dotenv()
-db_params = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
 
 
 FEATURES = ['undergrad_gpa_std', 'attended_grad_program', 'taken_calculus', 
@@ -24,10 +21,14 @@ FEATURES = ['undergrad_gpa_std', 'attended_grad_program', 'taken_calculus',
 
 TARGET = 'got_phd_offer'
 
-conn = psycopg2.connect(**db_params)
-query = f"SELECT {', '.join(FEATURES + [TARGET])} FROM admissions_data_cleaned"
-df = pd.read_sql(query, conn)
-conn.close()
+# Parquet snapshot published by cleaning.py, read from Postgres instead before the first one
+# or when admissions_data_cleaned changed since (e.g. cleaned with --no-snapshot)
+with connection() as conn:
+    if snapshot_is_current(conn):
+        df = load_snapshot(FEATURES + [TARGET])
+    else:
+        print("No current snapshot of admissions_data_cleaned, reading it from Postgres")
+        df = pd.read_sql(f"SELECT {', '.join(FEATURES + [TARGET])} FROM admissions_data_cleaned", conn)
 
 df_complete = df.dropna()
 
@@ -1,18 +1,14 @@
 import pandas as pd
-import psycopg2
 from psycopg2.extras import execute_batch
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
-load_dotenv()
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connect, release
 
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
+load_dotenv()
 
 def upload_csv_to_postgres(csv_file):
     if not os.path.exists(csv_file):
@@ -27,7 +23,7 @@ def upload_csv_to_postgres(csv_file):
     cursor = None
     
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = connect()
         cursor = conn.cursor()
 
         insert_query = """
@@ -59,7 +55,7 @@ def upload_csv_to_postgres(csv_file):
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
+            release(conn)
 
 if __name__ == "__main__":
     csv_file = "urch_forum_pages_1_to_717.csv"
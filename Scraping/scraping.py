@@ -15,8 +15,8 @@ def get_soup(url):
     r.raise_for_status()
     return BeautifulSoup(r.text, "html.parser")
 
-def extract_threads_from_forum_page(page_url):
-    soup = get_soup(page_url)
+def parse_forum_page(soup):
+    """(title, url) of the threads listed on a forum page, and the url of the next page"""
     threads = soup.select("li.ipsDataItem[data-rowid]")
     results = []
     for t in threads:
@@ -39,6 +39,27 @@ def extract_threads_from_forum_page(page_url):
     return results, next_url
 
 
+def extract_threads_from_forum_page(page_url):
+    return parse_forum_page(get_soup(page_url))
+
+
+def parse_thread_page(soup):
+    """(post_id, author, content) of the posts on a thread page"""
+    posts = []
+    for post in soup.select("article.ipsComment"):
+        post_id = post.get("data-comment-id") or post.get("id")
+        if not post_id:
+            content_tag = post.select_one(".ipsComment_content")
+            post_id = hash(content_tag.get_text(strip=True)[:100]) if content_tag else None
+
+        author_tag = post.select_one(".ipsComment_author a")
+        content_tag = post.select_one(".ipsComment_content")
+        author = author_tag.get_text(strip=True) if author_tag else "Unknown"
+        content = content_tag.get_text(" ", strip=True) if content_tag else ""
+        posts.append((post_id, author, content))
+    return posts
+
+
 def extract_posts_from_thread(thread_url, csv_writer, thread_title, max_pages=None):
     posts_count = 0
     page = 1
@@ -58,29 +79,19 @@ def extract_posts_from_thread(thread_url, csv_writer, thread_title, max_pages=No
         except Exception:
             break
             
-        post_items = soup.select("article.ipsComment")
-        
+        post_items = parse_thread_page(soup)
+
         if not post_items:
             break
-        
+
         new_posts_on_page = 0
-        for post in post_items:
-            post_id = post.get("data-comment-id") or post.get("id")
-            if not post_id:
-                content_tag = post.select_one(".ipsComment_content")
-                post_id = hash(content_tag.get_text(strip=True)[:100]) if content_tag else None
-            
+        for post_id, author, content in post_items:
             if post_id and post_id in seen_posts:
                 continue
-            
+
             if post_id:
                 seen_posts.add(post_id)
-            
-            author_tag = post.select_one(".ipsComment_author a")
-            content_tag = post.select_one(".ipsComment_content")
-            author = author_tag.get_text(strip=True) if author_tag else "Unknown"
-            content = content_tag.get_text(" ", strip=True) if content_tag else ""
-            
+
             csv_writer.writerow([thread_title, thread_url, author, page, content])
             posts_count += 1
             new_posts_on_page += 1
@@ -0,0 +1,136 @@
+"""
+Extraction backends:
+The same prompt and post-processing can run against OpenAI, a CPU-hosted local
+model behind an OpenAI-compatible server (llama.cpp, ONNX runtime server, ...)
+or a deterministic mock
+"""
+
+import os
+import json
+import asyncio
+from abc import ABC, abstractmethod
+from typing import NamedTuple, List, Dict
+
+from openai import AsyncOpenAI
+
+from extraction_schema import response_format, empty_record
+from pre_extractor import pre_extract
+
+RESPONSE_FORMAT = response_format()
+
+
+class Completion(NamedTuple):
+    content: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def calculate_cost(usage) -> float:
+    """Cost of a single gpt-4o-mini completion from its token usage"""
+    prompt_tokens = usage.prompt_tokens
+    completion_tokens = usage.completion_tokens
+    return (prompt_tokens * 0.15 / 1_000_000) + (completion_tokens * 0.60 / 1_000_000)
+
+
+class ExtractionBackend(ABC):
+    """Interface: turn chat messages into a completion"""
+
+    name = "base"
+    max_batch_size = 1  # above 1, requests are grouped and sent through complete_batch
+    max_concurrent = 10  # calls in flight at once across all worker processes, a call being one batch
+
+    @abstractmethod
+    async def complete(self, messages: List[Dict], output_format: Dict = RESPONSE_FORMAT) -> Completion:
+        ...
+
+    async def complete_batch(self, batch: List[List[Dict]], output_format: Dict = RESPONSE_FORMAT) -> List:
+        """Complete several conversations; failed items come back as the exception instance"""
+        return await asyncio.gather(*[self.complete(messages, output_format) for messages in batch],
+                                    return_exceptions=True)
+
+    def cost(self, completion: Completion) -> float:
+        return 0.0
+
+
+class OpenAIBackend(ExtractionBackend):
+    name = "openai"
+
+    def __init__(self, model: str = "gpt-4o-mini", base_url: str = None, api_key: str = None):
+        self.model = model
+        self.client = AsyncOpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'), base_url=base_url)
+
+    async def complete(self, messages: List[Dict], output_format: Dict = RESPONSE_FORMAT) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0,
+            max_completion_tokens=800,
+            response_format=output_format
+        )
+        return Completion(
+            response.choices[0].message.content or "",
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens
+        )
+
+    def cost(self, completion: Completion) -> float:
+        return calculate_cost(completion)
+
+
+class LocalServerBackend(OpenAIBackend):
+    """Local model behind an OpenAI-compatible server on localhost
+
+    The server's parallel slots do continuous batching, so requests go out one by one
+    with at most one in flight per slot: a freed slot takes the next request at once
+    """
+
+    name = "local"
+
+    def __init__(self):
+        super().__init__(
+            model=os.getenv('LOCAL_LLM_MODEL', 'local'),
+            base_url=os.getenv('LOCAL_LLM_URL', 'http://localhost:8080/v1'),
+            api_key='not-needed'
+        )
+        self.max_concurrent = int(os.getenv('LOCAL_LLM_PARALLEL', '4'))
+
+    def cost(self, completion: Completion) -> float:
+        return 0.0
+
+
+class MockBackend(ExtractionBackend):
+    """Deterministic offline backend: answers with the rule-based fields of the post"""
+
+    name = "mock"
+    max_batch_size = 64
+    max_concurrent = 64
+
+    def _answer(self, messages: List[Dict], output_format: Dict) -> Completion:
+        post_content = messages[1]["content"].split("\n\n", 1)[-1]
+        record = empty_record()
+        record.update(pre_extract(post_content).fields)
+        requested = output_format["json_schema"]["schema"]["properties"]
+        content = json.dumps({name: value for name, value in record.items() if name in requested})
+        return Completion(content, len(post_content) // 4, len(content) // 4)
+
+    async def complete(self, messages: List[Dict], output_format: Dict = RESPONSE_FORMAT) -> Completion:
+        return self._answer(messages, output_format)
+
+    async def complete_batch(self, batch: List[List[Dict]], output_format: Dict = RESPONSE_FORMAT) -> List[Completion]:
+        return [self._answer(messages, output_format) for messages in batch]
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalServerBackend,
+    "mock": MockBackend,
+}
+_instances = {}
+
+
+def get_backend(name: str = None) -> ExtractionBackend:
+    """Backend instance by name (default: EXTRACTION_BACKEND or openai), created once per process"""
+    name = name or os.getenv('EXTRACTION_BACKEND', 'openai')
+    if name not in _instances:
+        _instances[name] = BACKENDS[name]()
+    return _instances[name]
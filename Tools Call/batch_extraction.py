@@ -0,0 +1,298 @@
+"""
+Offline Batch API extraction:
+Writes filtered_posts requests to JSONL batch files, submits and polls them,
+then ingests the results with the same parsing/clamping as gpt_tools_call.py
+"""
+
+import os
+import sys
+import json
+import time
+from typing import List, Dict, Callable
+
+import pandas as pd
+from openai import OpenAI
+
+from backends import calculate_cost
+from extraction_schema import empty_record
+from pre_extractor import pre_extract, local_record, merge_pre_extraction
+from preprocessing import split_key
+from streaming import stream_requests
+from gpt_tools_call import (
+    connect, release, RESPONSE_FORMAT, build_messages, build_reask_messages, extraction_spec, remaining_fields,
+    parse_extracted_text, create_admissions_table, save_to_database
+)
+
+BATCH_DIR = "batches"
+MODEL = "gpt-4o-mini"
+MAX_REQUESTS_PER_FILE = 50_000  # Batch API limit per input file
+BATCH_DISCOUNT = 0.5  # Batch API is billed at half the synchronous price
+POLL_INTERVAL = 60
+
+
+def build_batch_request(key: str, messages: List[Dict], output_format: Dict = RESPONSE_FORMAT) -> Dict:
+    """One JSONL line of a /v1/chat/completions batch input file, key is the prepared request key"""
+    return {
+        "custom_id": f"post-{key}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": MODEL,
+            "messages": messages,
+            "temperature": 0,
+            "max_completion_tokens": 800,
+            "response_format": output_format
+        }
+    }
+
+
+def build_extraction_requests(prepared: Dict, pre_results: Dict) -> List[Dict]:
+    """Batch requests for the posts the rules could not cover, narrowed to the fields they left
+    exactly as process_batch narrows the online requests"""
+    requests = []
+    for key, pre in pre_results.items():
+        fields = remaining_fields(pre)
+        requests.append(build_batch_request(key, build_messages(prepared[key].text, fields), extraction_spec(fields)[1]))
+    return requests
+
+
+def write_batch_files(requests: List[Dict], out_dir: str = BATCH_DIR, prefix: str = "batch_input",
+                      max_requests: int = MAX_REQUESTS_PER_FILE) -> List[str]:
+    """Write batch requests as JSONL input files, returns the file paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+
+    for i in range(0, len(requests), max_requests):
+        path = os.path.join(out_dir, f"{prefix}_{i // max_requests + 1:03d}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for request in requests[i:i+max_requests]:
+                f.write(json.dumps(request) + "\n")
+        paths.append(path)
+
+    return paths
+
+
+class OpenAIBatchClient:
+    """Submits and polls batches through the OpenAI Batch API"""
+
+    def __init__(self, api_key: str = None):
+        self.client = OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Dict:
+        batch = self.client.batches.retrieve(batch_id)
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id
+        }
+
+    def download(self, file_id: str) -> str:
+        return self.client.files.content(file_id).text
+
+
+def null_responder(body: Dict) -> str:
+    """Default stub response: a valid record with every field empty"""
+    return json.dumps(empty_record())
+
+
+class LocalBatchClient:
+    """Offline stand-in for OpenAIBatchClient that answers each request with a local responder"""
+
+    def __init__(self, responder: Callable[[Dict], str] = null_responder):
+        self.responder = responder
+        self.batches = {}
+        self.files = {}
+
+    def submit(self, path: str) -> str:
+        batch_id = f"local-batch-{len(self.batches) + 1}"
+        output_lines = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                request = json.loads(line)
+                content = self.responder(request["body"])
+                output_lines.append(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"role": "assistant", "content": content}}],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0}
+                        }
+                    },
+                    "error": None
+                }))
+        output_file_id = f"{batch_id}-output"
+        self.files[output_file_id] = "\n".join(output_lines)
+        self.batches[batch_id] = {"status": "completed", "output_file_id": output_file_id, "error_file_id": None}
+        return batch_id
+
+    def status(self, batch_id: str) -> Dict:
+        return self.batches[batch_id]
+
+    def download(self, file_id: str) -> str:
+        return self.files[file_id]
+
+
+class Usage:
+    """Token usage from a batch output line, shaped like the SDK usage object"""
+
+    def __init__(self, usage: Dict):
+        self.prompt_tokens = usage.get("prompt_tokens", 0)
+        self.completion_tokens = usage.get("completion_tokens", 0)
+
+
+def poll_batches(batch_client, batch_ids: List[str], poll_interval: int = POLL_INTERVAL) -> Dict[str, Dict]:
+    """Wait until every batch reaches a terminal state, returns the final status per batch"""
+    terminal = {"completed", "failed", "expired", "cancelled"}
+    finished = {}
+
+    while len(finished) < len(batch_ids):
+        for batch_id in batch_ids:
+            if batch_id in finished:
+                continue
+            status = batch_client.status(batch_id)
+            if status["status"] in terminal:
+                finished[batch_id] = status
+
+        if len(finished) < len(batch_ids):
+            time.sleep(poll_interval)
+
+    return finished
+
+
+def ingest_results(output_text: str, pre_results: Dict = None) -> tuple:
+    """Parse a batch output file into (successes, errors, invalid, cost)
+
+    invalid maps the request key to (raw_response, problems) for responses that failed schema validation,
+    pre_results maps request keys to rule-based values merged into the successes
+    """
+    pre_results = pre_results or {}
+    successes = []
+    errors = []
+    invalid = {}
+    total_cost = 0
+
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        key = result["custom_id"].split("-", 1)[1]
+        post_id, segment = split_key(key)
+        response = result.get("response") or {}
+
+        if result.get("error") or response.get("status_code") != 200:
+            errors.append({"post_id": post_id, "error": str(result.get("error") or response.get("body"))})
+            continue
+
+        body = response["body"]
+        extracted_text = (body["choices"][0]["message"]["content"] or "").strip()
+        total_cost += calculate_cost(Usage(body.get("usage", {}))) * BATCH_DISCOUNT
+        fields = remaining_fields(pre_results[key]) if key in pre_results else None
+        extracted_data, problems = parse_extracted_text(extracted_text, post_id, fields)
+        if problems:
+            invalid[key] = (extracted_text, problems)
+            continue
+        extracted_data["segment"] = segment
+        if key in pre_results:
+            extracted_data = merge_pre_extraction(extracted_data, pre_results[key])
+        successes.append(extracted_data)
+
+    return successes, errors, invalid, total_cost
+
+
+def run_batches(batch_client, requests: List[Dict], conn, out_dir: str, prefix: str, poll_interval: int,
+                pre_results: Dict = None) -> tuple:
+    """Submit one round of requests and save the valid results, returns (errors, invalid, cost)"""
+    paths = write_batch_files(requests, out_dir, prefix)
+    batch_ids = [batch_client.submit(path) for path in paths]
+
+    all_errors = []
+    all_invalid = {}
+    total_cost = 0
+
+    for batch_id, status in poll_batches(batch_client, batch_ids, poll_interval).items():
+        if status["status"] != "completed":
+            all_errors.append({"post_id": None, "error": f"{batch_id}: {status['status']}"})
+            continue
+
+        if status.get("output_file_id"):
+            results, errors, invalid, cost = ingest_results(batch_client.download(status["output_file_id"]), pre_results)
+            save_to_database(results, conn)
+            all_errors.extend(errors)
+            all_invalid.update(invalid)
+            total_cost += cost
+
+        if status.get("error_file_id"):
+            _, errors, _, _ = ingest_results(batch_client.download(status["error_file_id"]))
+            all_errors.extend(errors)
+
+    return all_errors, all_invalid, total_cost
+
+
+def run_batch_extraction(batch_client, conn, out_dir: str = BATCH_DIR, poll_interval: int = POLL_INTERVAL) -> tuple:
+    """Full re-extraction of filtered_posts through the batch client, with a re-ask round for invalid posts"""
+    prepared = {r.key: r for r in stream_requests(conn)}
+
+    create_admissions_table(conn)
+
+    # Requests fully covered by the rule-based pre-extractor never reach the model
+    pre_results = {}
+    local_records = []
+    for key, request in prepared.items():
+        pre = pre_extract(request.text)
+        if pre.needs_llm:
+            pre_results[key] = pre
+        elif pre.fields:
+            local_records.append(local_record(request.post_id, pre, request.segment))
+    save_to_database(local_records, conn)
+
+    requests = build_extraction_requests(prepared, pre_results)
+    all_errors, invalid, total_cost = run_batches(batch_client, requests, conn, out_dir, "batch_input",
+                                                  poll_interval, pre_results)
+
+    # Targeted re-ask: only the posts whose responses failed validation go out again
+    if invalid:
+        reasks = []
+        for key, (raw_response, problems) in invalid.items():
+            fields = remaining_fields(pre_results[key])
+            messages = build_reask_messages(build_messages(prepared[key].text, fields), raw_response, problems)
+            reasks.append(build_batch_request(key, messages, extraction_spec(fields)[1]))
+        errors, invalid, cost = run_batches(batch_client, reasks, conn, out_dir, "batch_reask",
+                                            poll_interval, pre_results)
+        all_errors.extend(errors)
+        total_cost += cost
+
+    all_errors.extend(
+        {"post_id": prepared[key].post_id, "error": "SCHEMA_INVALID: " + "; ".join(problems)}
+        for key, (_, problems) in invalid.items()
+    )
+
+    return all_errors, total_cost
+
+
+def main():
+    batch_client = LocalBatchClient() if "--local" in sys.argv else OpenAIBatchClient()
+
+    conn = connect()
+    all_errors, total_cost = run_batch_extraction(batch_client, conn)
+    release(conn)
+
+    if all_errors:
+        error_file = "extraction_errors.csv"
+        pd.DataFrame(all_errors).to_csv(error_file, index=False)
+
+    print(f"Batch extraction finished: {len(all_errors):,} errors, cost ${total_cost:.2f}")
+
+
+if __name__ == "__main__":
+    main()
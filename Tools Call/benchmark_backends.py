@@ -0,0 +1,99 @@
+"""
+Backend benchmark:
+Runs the same prepared sample of posts through several extraction backends and
+reports throughput, cost and per-field agreement with the first (reference) backend
+"""
+
+import time
+import asyncio
+import argparse
+
+import pandas as pd
+
+from extraction_schema import EXTRACTION_FIELDS
+from backends import BACKENDS
+from gpt_tools_call import connect, release, extract_requests
+from streaming import stream_requests
+
+SAMPLE_SIZE = 300
+SEED = 42
+
+
+def normalize(value):
+    """Comparable form of an extracted value (rounded numbers, case-insensitive unordered lists)"""
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, list):
+        return frozenset(str(v).strip().lower() for v in value)
+    return value
+
+
+def field_agreement(reference: dict, candidate: dict) -> pd.Series:
+    """Share of requests answered by both backends where each field matches exactly"""
+    keys = reference.keys() & candidate.keys()
+    if not keys:
+        return pd.Series({f.name: 0.0 for f in EXTRACTION_FIELDS})
+    return pd.Series({
+        f.name: sum(normalize(reference[k].get(f.name)) == normalize(candidate[k].get(f.name)) for k in keys) / len(keys) * 100
+        for f in EXTRACTION_FIELDS
+    })
+
+
+async def run_backend(name: str, items, max_concurrent: int) -> tuple:
+    """Extract every item with one backend; records are aligned with items (None for failures)"""
+    start = time.perf_counter()
+    results = await extract_requests(items, max_concurrent, name)
+    elapsed = time.perf_counter() - start
+
+    records = [r["data"] if r["success"] else None for r in results]
+    stats = {
+        "backend": name,
+        "requests": len(items),
+        "failures": records.count(None),
+        "seconds": elapsed,
+        "requests_per_sec": len(items) / elapsed if elapsed > 0 else 0.0,
+        "cost": sum(r.get("cost", 0) for r in results)
+    }
+    return stats, records
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare extraction backends on a held-out sample")
+    parser.add_argument("backends", nargs="+", choices=sorted(BACKENDS), help="first one is the reference")
+    parser.add_argument("--sample", type=int, default=SAMPLE_SIZE)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = connect()
+    post_ids = pd.read_sql("SELECT id FROM filtered_posts ORDER BY id", conn)["id"]
+    sample_ids = set(post_ids.sample(min(args.sample, len(post_ids)), random_state=SEED).astype(int))
+    # Quote detection needs the whole thread history, so every post is prepared and the sample kept
+    requests = [r for r in stream_requests(conn) if r.post_id in sample_ids]
+    release(conn)
+
+    # Keyed by request so segments of one post are compared with each other
+    items = [(r.post_id, r.text) for r in requests]
+    keys = [r.key for r in requests]
+
+    all_stats = []
+    all_records = []
+    for name in args.backends:
+        stats, records = await run_backend(name, items, args.concurrency)
+        all_stats.append(stats)
+        all_records.append({key: record for key, record in zip(keys, records) if record is not None})
+        print(f"{name}: {stats['requests_per_sec']:.2f} requests/s, {stats['failures']} failures, ${stats['cost']:.4f}")
+
+    print(f"\nSample: {len(sample_ids):,} posts -> {len(items):,} requests")
+    print(pd.DataFrame(all_stats).round(3).to_string(index=False))
+
+    if len(args.backends) > 1:
+        agreement = pd.DataFrame({
+            name: field_agreement(all_records[0], records)
+            for name, records in zip(args.backends[1:], all_records[1:])
+        })
+        print(f"\nField agreement with {args.backends[0]} (% of requests)")
+        print(agreement.round(1).to_string())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+Held-out comparison of raw vs preprocessed extraction requests:
+Extracts the same sample of posts both ways and reports input tokens
+and field completeness, so preprocessing can be checked for lost fields
+"""
+
+import sys
+import asyncio
+
+import pandas as pd
+
+from extraction_schema import EXTRACTION_FIELDS
+from gpt_tools_call import connect, release, extract_single_post
+from preprocessing import estimate_tokens
+from streaming import stream_requests
+
+SAMPLE_SIZE = 300
+SEED = 42
+
+
+def field_completeness(records, n_posts: int) -> pd.Series:
+    """Share of posts with each field filled (non-null, non-empty list)"""
+    filled = {f.name: set() for f in EXTRACTION_FIELDS}
+    for record in records:
+        for f in EXTRACTION_FIELDS:
+            value = record.get(f.name)
+            if value is not None and value != []:
+                filled[f.name].add(record["original_post_id"])
+    return pd.Series({name: len(ids) / n_posts * 100 for name, ids in filled.items()})
+
+
+async def extract_all(items, max_concurrent: int = 10):
+    semaphore = asyncio.Semaphore(max_concurrent)
+    results = await asyncio.gather(*[extract_single_post(post_id, text, semaphore) for post_id, text in items])
+    return [r["data"] for r in results if r["success"]]
+
+
+async def main():
+    sample_size = int(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_SIZE
+
+    conn = connect()
+    post_ids = pd.read_sql("SELECT id FROM filtered_posts ORDER BY id", conn)["id"]
+    sample_ids = set(post_ids.sample(min(sample_size, len(post_ids)), random_state=SEED).astype(int))
+    sample = pd.read_sql("SELECT id, post_content FROM filtered_posts WHERE id = ANY(%s) ORDER BY id", conn,
+                         params=([int(i) for i in sorted(sample_ids)],))
+    # Quote detection needs the whole thread history, so prepare everything and then sample
+    prepared = [r for r in stream_requests(conn) if r.post_id in sample_ids]
+    release(conn)
+
+    raw_records = await extract_all(zip(sample["id"].astype(int), sample["post_content"]))
+    prepared_records = await extract_all((r.post_id, r.text) for r in prepared)
+
+    comparison = pd.DataFrame({
+        "raw_pct": field_completeness(raw_records, len(sample)),
+        "prepared_pct": field_completeness(prepared_records, len(sample)),
+    })
+    comparison["change"] = comparison["prepared_pct"] - comparison["raw_pct"]
+
+    raw_tokens = sum(estimate_tokens(str(text)) for text in sample["post_content"])
+    prepared_tokens = sum(r.tokens for r in prepared)
+
+    print(f"Sample: {len(sample):,} posts -> {len(prepared):,} prepared requests")
+    print(f"Input tokens (est.): raw {raw_tokens:,} | prepared {prepared_tokens:,} "
+          f"({(1 - prepared_tokens / raw_tokens) * 100:.1f}% fewer)")
+    print("\nField completeness (% of posts)")
+    print(comparison.round(1).to_string())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,225 @@
+"""
+Bulk writer for admissions_data:
+Records are encoded in one pass driven by a field-type table and streamed with COPY
+on a dedicated writer task, so database writes never block the extraction loop
+"""
+
+import io
+import sys
+import math
+import asyncio
+from pathlib import Path
+from typing import List, Dict
+
+from psycopg2.extras import execute_values
+
+from extraction_schema import EXTRACTION_FIELDS, SCHEMA_VERSION, Field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import copy_in
+
+# (column, type) in COPY order; types follow extraction_schema. segment is the request's position
+# within its post, so rows can be matched back to the request that produced them
+COPY_COLUMNS = [("original_post_id", "integer"), ("segment", "integer")] + \
+    [(f.name, f.json_type) for f in EXTRACTION_FIELDS]
+# Every copied row is stamped with the schema version that produced it
+COPY_COLUMN_NAMES = [name for name, _ in COPY_COLUMNS] + ["schema_version"]
+NULL = "\\N"
+
+# Column types for fields added after the table was created
+SQL_TYPES = {
+    "number": "DECIMAL",
+    "integer": "INTEGER",
+    "string": "TEXT",
+    "boolean": "BOOLEAN",
+    "array": "TEXT[]",
+}
+
+
+def sanitize_value(value, field_name):
+    """Convert unexpected types to database-safe values"""
+    # Arrays are fine for array fields
+    if field_name in ['math_courses', 'schools_applied', 'schools_accepted', 'schools_rejected', 'schools_waitlisted']:
+        if isinstance(value, list):
+            # Ensure all items in list are strings, not dicts
+            clean_list = []
+            for item in value:
+                if isinstance(item, dict):
+                    if 'name' in item:
+                        clean_list.append(str(item['name']))
+                    elif item:
+                        clean_list.append(str(list(item.values())[0]))
+                else:
+                    clean_list.append(str(item))
+            return clean_list
+        elif value is None:
+            return []
+        elif isinstance(value, dict):
+            if 'name' in value:
+                return [str(value['name'])]
+            elif value:
+                return [str(list(value.values())[0])]
+            else:
+                return []
+        else:
+            return [str(value)]
+    
+    # For other fields, flatten dicts/lists to strings
+    if isinstance(value, dict):
+        if 'name' in value:
+            return str(value['name'])
+        elif 'value' in value:
+            return str(value['value'])
+        elif value:
+            return str(list(value.values())[0])
+        else:
+            return None
+    elif isinstance(value, list) and value:
+        str_items = []
+        for item in value:
+            if isinstance(item, dict):
+                if 'name' in item:
+                    str_items.append(str(item['name']))
+                elif item:
+                    str_items.append(str(list(item.values())[0]))
+            else:
+                str_items.append(str(item))
+        return ', '.join(str_items) if str_items else None
+    elif isinstance(value, list) and not value:
+        return None
+    else:
+        return value
+
+
+def escape_copy_text(text: str) -> str:
+    """Escape a value for the COPY text format"""
+    return (text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+            .replace("\r", "\\r").replace("\x00", ""))
+
+
+def array_literal(items: List[str]) -> str:
+    """Postgres TEXT[] literal, every element quoted"""
+    quoted = ('"' + item.replace("\\", "\\\\").replace('"', '\\"') + '"' for item in items)
+    return "{" + ",".join(quoted) + "}"
+
+
+def encode_scalar(value, kind: str, field_name: str) -> str:
+    """Encode a non-array field, values that do not fit the column type become NULL"""
+    if isinstance(value, (dict, list)):
+        value = sanitize_value(value, field_name)
+    if value is None:
+        return NULL
+
+    try:
+        if kind == "integer":
+            return str(int(value))
+        if kind == "number":
+            number = float(value)
+            return repr(number) if math.isfinite(number) else NULL
+    except (ValueError, TypeError):
+        return NULL
+
+    if kind == "boolean":
+        return "t" if value else "f"
+    return escape_copy_text(str(value))
+
+
+def encode_record(record: Dict) -> str:
+    """Sanitize and encode one record as a COPY text line"""
+    fields = []
+    for name, kind in COPY_COLUMNS:
+        value = record.get(name)
+        if kind == "array":
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                value = sanitize_value(value, name)
+            fields.append(escape_copy_text(array_literal(value)))
+        else:
+            fields.append(encode_scalar(value, kind, name))
+    fields.append(str(SCHEMA_VERSION))
+    return "\t".join(fields) + "\n"
+
+
+def copy_records(conn, records: List[Dict]):
+    """Stream records into admissions_data with one COPY and commit"""
+    if not records:
+        return
+
+    buffer = io.StringIO("".join(encode_record(r) for r in records))
+    copy_in(conn, "admissions_data", buffer, COPY_COLUMN_NAMES)
+    conn.commit()
+
+
+def add_field_columns(conn):
+    """Add schema_version, segment and any extraction field missing from admissions_data"""
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE admissions_data ADD COLUMN IF NOT EXISTS schema_version INTEGER")
+    cursor.execute("ALTER TABLE admissions_data ADD COLUMN IF NOT EXISTS segment INTEGER")
+    for f in EXTRACTION_FIELDS:
+        cursor.execute(f"ALTER TABLE admissions_data ADD COLUMN IF NOT EXISTS {f.name} {SQL_TYPES[f.json_type]}")
+    conn.commit()
+    cursor.close()
+
+
+def update_fields(conn, rows: List[tuple], fields: List[Field], version: int = SCHEMA_VERSION):
+    """Overwrite only the given fields of existing rows, rows are (admissions_data id, record)"""
+    if not rows:
+        return
+
+    names = [f.name for f in fields]
+    assignments = ", ".join(f"{name} = v.{name}" for name in names)
+    template = "(%s::INTEGER, " + ", ".join(f"%s::{SQL_TYPES[f.json_type]}" for f in fields) + ", %s::INTEGER)"
+    # Records come from the validator, so values already match the field types
+    values = [(row_id, *[record.get(name) for name in names], version) for row_id, record in rows]
+
+    cursor = conn.cursor()
+    execute_values(cursor, f"""
+        UPDATE admissions_data AS a
+        SET {assignments}, schema_version = v.schema_version
+        FROM (VALUES %s) AS v (id, {', '.join(names)}, schema_version)
+        WHERE a.id = v.id
+    """, values, template=template)
+    conn.commit()
+    cursor.close()
+
+
+class RecordWriter:
+    """Dedicated writer task: chunks are queued by the extraction loop and copied in a worker thread"""
+
+    def __init__(self, conn, max_pending: int = 10):
+        self.conn = conn
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.rows_written = 0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self):
+        while True:
+            records = await self.queue.get()
+            if records is None:
+                break
+            await asyncio.to_thread(copy_records, self.conn, records)
+            self.rows_written += len(records)
+
+    def _raise_if_failed(self):
+        if self.task.done() and not self.task.cancelled() and self.task.exception() is not None:
+            raise self.task.exception()
+
+    async def _put(self, item):
+        """Queue an item, raising the writer's error instead of waiting on a queue nobody drains"""
+        self._raise_if_failed()
+        put = asyncio.ensure_future(self.queue.put(item))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+        self._raise_if_failed()
+
+    async def write(self, records: List[Dict]):
+        if records:
+            await self._put(records)
+
+    async def close(self):
+        await self._put(None)
+        await self.task
@@ -0,0 +1,153 @@
+"""
+Typed record definition for the admissions extraction:
+The prompt structure, the JSON schema sent to the model and the validator
+applied to its responses are all derived from EXTRACTION_FIELDS
+
+Each field carries the schema version that added it or last changed its meaning;
+when a field is added or its description changes, give it SCHEMA_VERSION + 1 so
+reextract_fields.py can re-ask existing rows for just that field
+"""
+
+from typing import NamedTuple, List, Dict, Callable
+
+
+class Field(NamedTuple):
+    name: str
+    json_type: str  # number, integer, string, boolean or array (of strings)
+    nullable: bool
+    description: str  # type description shown to the model in the prompt
+    version: int = 1  # schema version that added or last changed the field
+
+
+EXTRACTION_FIELDS = [
+    Field("undergrad_gpa", "number", True, "float or null"),
+    Field("undergrad_gpa_out_of", "number", True, "float or null"),
+    Field("grad_gpa", "number", True, "float or null"),
+    Field("grad_gpa_out_of", "number", True, "float or null"),
+    Field("gre_quant", "integer", True, "int (130-170) or null"),
+    Field("gre_verbal", "integer", True, "int (130-170) or null"),
+    Field("gre_writing", "number", True, "float (0-6) or null"),
+    Field("undergrad_institution", "string", True, "string or null"),
+    Field("grad_institution", "string", True, "string or null"),
+    Field("undergrad_major", "string", True, "string or null"),
+    Field("grad_major", "string", True, "string or null"),
+    Field("math_courses", "array", False, "array of strings or []"),
+    Field("phd_course_taken", "boolean", False, "boolean"),
+    Field("research_experience", "boolean", True, "boolean or null"),
+    Field("publications", "integer", True, "int or null"),
+    Field("work_experience_years", "integer", True, "int or null"),
+    Field("letters_of_rec", "string", True, "string or null"),
+    Field("schools_applied", "array", False, "array of strings or []"),
+    Field("schools_accepted", "array", False, "array of strings or []"),
+    Field("schools_rejected", "array", False, "array of strings or []"),
+    Field("schools_waitlisted", "array", False, "array of strings or []"),
+    Field("funding_status", "string", True, "string or null"),
+]
+
+SCHEMA_VERSION = max(f.version for f in EXTRACTION_FIELDS)
+
+
+def fields_since(version: int) -> List[Field]:
+    """Fields added or changed after a schema version"""
+    return [f for f in EXTRACTION_FIELDS if f.version > version]
+
+
+def render_prompt_structure(fields: List[Field] = EXTRACTION_FIELDS) -> str:
+    """JSON structure block used inside the system prompt"""
+    lines = [f'  "{f.name}": {f.description}' for f in fields]
+    return "{\n" + ",\n".join(lines) + "\n}"
+
+
+def build_json_schema(fields: List[Field] = EXTRACTION_FIELDS) -> Dict:
+    """Strict JSON schema for structured outputs (every field required, nullable via a null type)"""
+    properties = {}
+    for f in fields:
+        if f.json_type == "array":
+            prop = {"type": "array", "items": {"type": "string"}}
+        else:
+            prop = {"type": [f.json_type, "null"] if f.nullable else f.json_type}
+        properties[f.name] = prop
+
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": [f.name for f in fields],
+        "additionalProperties": False
+    }
+
+
+def response_format(fields: List[Field] = EXTRACTION_FIELDS) -> Dict:
+    """response_format argument for chat.completions.create"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "admissions_record",
+            "strict": True,
+            "schema": build_json_schema(fields)
+        }
+    }
+
+
+def empty_record(fields: List[Field] = EXTRACTION_FIELDS) -> Dict:
+    """A valid record with every field empty"""
+    record = {}
+    for f in fields:
+        if f.json_type == "array":
+            record[f.name] = []
+        elif f.nullable:
+            record[f.name] = None
+        else:
+            record[f.name] = False
+    return record
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+def _is_string_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+TYPE_CHECKS = {
+    "number": _is_number,
+    "integer": _is_integer,
+    "string": lambda value: isinstance(value, str),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": _is_string_list,
+}
+
+
+def compile_validator(fields: List[Field] = EXTRACTION_FIELDS) -> Callable[[Dict], List[str]]:
+    """Build a validator once; it returns the list of problems found in a record (empty when valid)"""
+    checks = [(f.name, TYPE_CHECKS[f.json_type], f.nullable, f.description) for f in fields]
+    names = {f.name for f in fields}
+
+    def validate(record) -> List[str]:
+        if not isinstance(record, dict):
+            return ["response is not a JSON object"]
+
+        problems = []
+        for name, check, nullable, description in checks:
+            if name not in record:
+                problems.append(f"missing field {name}")
+                continue
+            value = record[name]
+            if value is None:
+                if not nullable:
+                    problems.append(f"{name} must not be null, expected {description}")
+            elif not check(value):
+                problems.append(f"{name} has invalid value {value!r}, expected {description}")
+
+        for name in record.keys() - names:
+            problems.append(f"unexpected field {name}")
+
+        return problems
+
+    return validate
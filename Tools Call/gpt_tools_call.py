@@ -1,56 +1,32 @@
-import os
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_batch
-from openai import AsyncOpenAI
+import sys
+import argparse
+from pathlib import Path
 from dotenv import load_dotenv
 import json
-from datetime import datetime
 import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict
 import time
 
-load_dotenv()
+from extraction_schema import EXTRACTION_FIELDS, Field, render_prompt_structure, response_format, compile_validator
+from backends import BACKENDS, RESPONSE_FORMAT, get_backend
+from db_writer import copy_records, add_field_columns, RecordWriter
+from pre_extractor import pre_extract, local_record, merge_pre_extraction
+from preprocessing import PreparedRequest, QuoteFilter, prepare_posts, token_report, summarize_tokens
+from metrics import RunMetrics
+from streaming import CsvAppender, count_rows, stream_posts, export_csv, export_parquet
 
-# Initialize async OpenAI client
-client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connect, release
 
-# Database connection params
-db_params = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
+load_dotenv()
 
-SYSTEM_PROMPT = """You are an expert at extracting structured admissions data from PhD economics forum posts.
+PROMPT_HEADER = """You are an expert at extracting structured admissions data from PhD economics forum posts.
 Extract the following fields from each post. If a field is not mentioned, use null. Try your best to place most relevant information in fields, the goal is to fill as much as possible while being correct.
 Return ONLY valid JSON with this exact structure:
-{
-  "undergrad_gpa": float or null,
-  "undergrad_gpa_out_of": float or null,
-  "grad_gpa": float or null,
-  "grad_gpa_out_of": float or null,
-  "gre_quant": int (130-170) or null,
-  "gre_verbal": int (130-170) or null,
-  "gre_writing": float (0-6) or null,
-  "undergrad_institution": string or null,
-  "grad_institution": string or null,
-  "undergrad_major": string or null,
-  "grad_major": string or null,
-  "math_courses": array of strings or [],
-  "phd_course_taken": boolean,
-  "research_experience": boolean or null,
-  "publications": int or null,
-  "work_experience_years": int or null,
-  "letters_of_rec": string or null,
-  "schools_applied": array of strings or [],
-  "schools_accepted": array of strings or [],
-  "schools_rejected": array of strings or [],
-  "schools_waitlisted": array of strings or [],
-  "funding_status": string or null
-}
+"""
+
+PROMPT_RULES = """
 Rules:
 - GPA can be on any scale, you can use your judgement here. Always include the "undergrad_gpa_out_of"/"grad_gpa_out_of" when including "undergrad_gpa"/"grad_gpa". If the gpa is less than 4 it is likely on the 4.0 scale and if above it is likely on another scale. Again use best context clues.
 - GRE Quant/Verbal must be between 130-170.
@@ -62,87 +38,153 @@ Rules:
 - Return ONLY the JSON object, no other text"""
 
 
-async def extract_single_post(post_id: int, post_content: str, semaphore: asyncio.Semaphore, retry_count: int = 0) -> Dict:
-    """Extract data from a single post with rate limiting and retry logic"""
-    async with semaphore:
+def build_system_prompt(fields: List[Field] = EXTRACTION_FIELDS) -> str:
+    return PROMPT_HEADER + render_prompt_structure(fields) + PROMPT_RULES
+
+
+SYSTEM_PROMPT = build_system_prompt()
+validate_record = compile_validator()
+MAX_REASKS = 1
+
+_specs = {}
+
+
+def extraction_spec(fields: List[Field] = None) -> tuple:
+    """(system prompt, response_format, validator) for all fields or a narrow subset, built once per subset"""
+    if fields is None:
+        return SYSTEM_PROMPT, RESPONSE_FORMAT, validate_record
+    key = tuple(fields)
+    if key not in _specs:
+        _specs[key] = (build_system_prompt(fields), response_format(fields), compile_validator(fields))
+    return _specs[key]
+
+
+def build_messages(post_content: str, fields: List[Field] = None) -> List[Dict]:
+    """Build the chat messages sent to the model for one post (only the given fields if set)"""
+    return [
+        {"role": "system", "content": extraction_spec(fields)[0]},
+        {"role": "user", "content": f"Extract admissions data from this post:\n\n{post_content}"}
+    ]
+
+
+def build_reask_messages(messages: List[Dict], raw_response: str, problems: List[str]) -> List[Dict]:
+    """Follow-up turn asking the model to fix only the fields that failed validation"""
+    problem_list = "\n".join(f"- {p}" for p in problems)
+    return messages + [
+        {"role": "assistant", "content": raw_response},
+        {"role": "user", "content": f"Your JSON failed validation:\n{problem_list}\nReturn the full corrected JSON object."}
+    ]
+
+
+def clamp_record(extracted_data: Dict) -> Dict:
+    """Clamp numeric fields to plausible ranges"""
+    # CLAMP gre_writing to valid range (0-6)
+    if extracted_data.get("gre_writing") is not None:
         try:
-            response = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"Extract admissions data from this post:\n\n{post_content}"}
-                ],
-                temperature=0,
-                max_completion_tokens=800
-            )
-            
-            extracted_text = response.choices[0].message.content.strip()
-            
-            # Strip Markdown
-            if extracted_text.startswith("```json"):
-                extracted_text = extracted_text.replace("```json", "").replace("```", "").strip()
-            elif extracted_text.startswith("```"):
-                extracted_text = extracted_text.strip("`").strip()
-            
-            # Handle incomplete JSON - find last complete brace
-            if not extracted_text.endswith('}'):
-                last_brace = extracted_text.rfind('}')
-                if last_brace > 0:
-                    extracted_text = extracted_text[:last_brace+1]
-            
-            # Parse JSON
-            extracted_data = json.loads(extracted_text)
-            extracted_data["original_post_id"] = post_id
-            
-            # CLAMP gre_writing to valid range (0-6)
-            if extracted_data.get("gre_writing") is not None:
-                try:
-                    gre_writing = float(extracted_data["gre_writing"])
-                    if gre_writing > 6.0:
-                        extracted_data["gre_writing"] = 6.0
-                    elif gre_writing < 0:
-                        extracted_data["gre_writing"] = None
-                except (ValueError, TypeError):
-                    extracted_data["gre_writing"] = None
-            
-            # CLAMP GPAs to reasonable range (0-100)
-            for gpa_field in ['undergrad_gpa', 'grad_gpa']:
-                if extracted_data.get(gpa_field) is not None:
-                    try:
-                        gpa_val = float(extracted_data[gpa_field])
-                        if gpa_val > 100.0 or gpa_val < 0:
-                            extracted_data[gpa_field] = None
-                    except (ValueError, TypeError):
-                        extracted_data[gpa_field] = None
-            
-            # CLAMP GPA out_of fields
-            for gpa_out_field in ['undergrad_gpa_out_of', 'grad_gpa_out_of']:
-                if extracted_data.get(gpa_out_field) is not None:
-                    try:
-                        gpa_out = float(extracted_data[gpa_out_field])
-                        if gpa_out > 100.0 or gpa_out < 0:
-                            extracted_data[gpa_out_field] = None
-                    except (ValueError, TypeError):
-                        extracted_data[gpa_out_field] = None
-            
-            # Cost calculation
-            prompt_tokens = response.usage.prompt_tokens
-            completion_tokens = response.usage.completion_tokens
-            cost = (prompt_tokens * 0.15 / 1_000_000) + (completion_tokens * 0.60 / 1_000_000)
-            
+            gre_writing = float(extracted_data["gre_writing"])
+            if gre_writing > 6.0:
+                extracted_data["gre_writing"] = 6.0
+            elif gre_writing < 0:
+                extracted_data["gre_writing"] = None
+        except (ValueError, TypeError):
+            extracted_data["gre_writing"] = None
+    
+    # CLAMP GPAs to reasonable range (0-100)
+    for gpa_field in ['undergrad_gpa', 'grad_gpa']:
+        if extracted_data.get(gpa_field) is not None:
+            try:
+                gpa_val = float(extracted_data[gpa_field])
+                if gpa_val > 100.0 or gpa_val < 0:
+                    extracted_data[gpa_field] = None
+            except (ValueError, TypeError):
+                extracted_data[gpa_field] = None
+    
+    # CLAMP GPA out_of fields
+    for gpa_out_field in ['undergrad_gpa_out_of', 'grad_gpa_out_of']:
+        if extracted_data.get(gpa_out_field) is not None:
+            try:
+                gpa_out = float(extracted_data[gpa_out_field])
+                if gpa_out > 100.0 or gpa_out < 0:
+                    extracted_data[gpa_out_field] = None
+            except (ValueError, TypeError):
+                extracted_data[gpa_out_field] = None
+    
+    return extracted_data
+
+
+def parse_extracted_text(extracted_text: str, post_id: int, fields: List[Field] = None) -> tuple:
+    """Parse and validate a structured-output response, returns (record, problems)"""
+    try:
+        extracted_data = json.loads(extracted_text)
+    except json.JSONDecodeError as e:
+        return None, [f"response is not valid JSON ({e.msg})"]
+    
+    problems = extraction_spec(fields)[2](extracted_data)
+    if problems:
+        return None, problems
+    
+    extracted_data["original_post_id"] = post_id
+    return clamp_record(extracted_data), []
+
+
+async def run_extraction(post_id: int, messages: List[Dict], backend, usage: Dict, completion=None,
+                         fields: List[Field] = None) -> Dict:
+    """Parse/validate completions for one post, re-asking for invalid output; completion may be prefetched"""
+    output_format = extraction_spec(fields)[1]
+    for attempt in range(MAX_REASKS + 1):
+        if completion is None:
+            call_start = time.perf_counter()
+            completion = await backend.complete(messages, output_format)
+            usage["latency"] += time.perf_counter() - call_start
+        usage["prompt_tokens"] += completion.prompt_tokens
+        usage["completion_tokens"] += completion.completion_tokens
+        usage["cost"] += backend.cost(completion)
+        usage["reasks"] = attempt
+        
+        extracted_text = completion.content.strip()
+        extracted_data, problems = parse_extracted_text(extracted_text, post_id, fields)
+        if not problems:
             return {
                 "success": True,
                 "data": extracted_data,
-                "cost": cost
+                **usage
             }
+        messages = build_reask_messages(messages, extracted_text, problems)
+        completion = None
+    
+    return {
+        "success": False,
+        "post_id": post_id,
+        "error": "SCHEMA_INVALID: " + "; ".join(problems),
+        "error_class": "SCHEMA_INVALID",
+        "raw_response": extracted_text[:300],
+        **usage
+    }
+
+
+def new_usage(retry_count: int = 0) -> Dict:
+    return {"latency": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0, "retries": retry_count, "reasks": 0}
+
+
+def failure(post_id: int, e: Exception, usage: Dict) -> Dict:
+    return {
+        "success": False,
+        "post_id": post_id,
+        "error": str(e),
+        "error_class": type(e).__name__,
+        **usage
+    }
+
+
+async def extract_single_post(post_id: int, post_content: str, semaphore: asyncio.Semaphore, retry_count: int = 0,
+                              backend_name: str = None, fields: List[Field] = None) -> Dict:
+    """Extract data from a single post with rate limiting, retry logic and re-asks for invalid output"""
+    async with semaphore:
+        usage = new_usage(retry_count)
+        try:
+            return await run_extraction(post_id, build_messages(post_content, fields), get_backend(backend_name),
+                                        usage, fields=fields)
             
-        except json.JSONDecodeError:
-            return {
-                "success": False,
-                "post_id": post_id,
-                "error": "JSON_PARSE_FAIL",
-                "raw_response": extracted_text[:300] if 'extracted_text' in locals() else 'N/A'
-            }
         except Exception as e:
             error_str = str(e)
             
@@ -150,156 +192,143 @@ async def extract_single_post(post_id: int, post_content: str, semaphore: asynci
             if '429' in error_str and retry_count < 3:
                 wait_time = (2 ** retry_count) * 3  # 3s, 6s, 12s
                 await asyncio.sleep(wait_time)
-                return await extract_single_post(post_id, post_content, semaphore, retry_count + 1)
+                return await extract_single_post(post_id, post_content, semaphore, retry_count + 1, backend_name, fields)
             
-            return {
-                "success": False,
-                "post_id": post_id,
-                "error": str(e)
-            }
+            return failure(post_id, e, usage)
 
 
-async def process_batch(posts_df: pd.DataFrame, max_concurrent: int = 10) -> tuple:
-    """Process batch with controlled concurrency"""
-    semaphore = asyncio.Semaphore(max_concurrent)
+async def extract_post_batch(items: List[tuple], semaphore: asyncio.Semaphore, backend_name: str = None,
+                             fields: List[Field] = None) -> List[Dict]:
+    """Extract several (post_id, text) items with one batched backend call, re-asks go out individually"""
+    backend = get_backend(backend_name)
+    async with semaphore:
+        batch_start = time.perf_counter()
+        try:
+            completions = await backend.complete_batch([build_messages(text, fields) for _, text in items],
+                                                       extraction_spec(fields)[1])
+        except Exception as e:
+            completions = [e] * len(items)
+        per_item_latency = (time.perf_counter() - batch_start) / len(items)
     
-    tasks = [
-        extract_single_post(row["id"], row["post_content"], semaphore)
-        for _, row in posts_df.iterrows()
-    ]
+    results = []
+    for (post_id, text), completion in zip(items, completions):
+        usage = new_usage()
+        usage["latency"] = per_item_latency
+        try:
+            if isinstance(completion, Exception):
+                raise completion
+            results.append(await run_extraction(post_id, build_messages(text, fields), backend, usage, completion,
+                                                fields))
+        except Exception as e:
+            results.append(failure(post_id, e, usage))
+    return results
+
+
+async def extract_requests(items: List[tuple], max_concurrent: int = 10, backend_name: str = None,
+                           workers: int = 1, pool: ProcessPoolExecutor = None, fields: List[Field] = None) -> List[Dict]:
+    """Extract (post_id, text) items in order, batched if the backend supports it and sharded over worker processes;
+    only the given fields are asked for if set"""
+    if not items:
+        return []
     
-    results = await asyncio.gather(*tasks)
+    backend = get_backend(backend_name)
+    limit = min(max_concurrent, backend.max_concurrent)
     
-    successes = [r["data"] for r in results if r["success"]]
-    errors = [{"post_id": r["post_id"], "error": r["error"]} for r in results if not r["success"]]
-    total_cost = sum(r.get("cost", 0) for r in results if r["success"])
+    if workers > 1 and pool is not None:
+        # The shards split the limit, so the backend never sees more calls in flight than it allows
+        shard_count = min(workers, limit)
+        shard_size = (len(items) + shard_count - 1) // shard_count
+        shards = [items[i:i+shard_size] for i in range(0, len(items), shard_size)]
+        futures = [
+            asyncio.wrap_future(pool.submit(extract_shard, shard, limit // len(shards), backend_name, fields))
+            for shard in shards
+        ]
+        return [r for shard_results in await asyncio.gather(*futures) for r in shard_results]
     
-    return successes, errors, total_cost
+    semaphore = asyncio.Semaphore(limit)
+    
+    if backend.max_batch_size > 1:
+        size = backend.max_batch_size
+        batches = await asyncio.gather(*[
+            extract_post_batch(items[i:i+size], semaphore, backend_name, fields) for i in range(0, len(items), size)
+        ])
+        return [r for batch in batches for r in batch]
+    
+    return await asyncio.gather(*[
+        extract_single_post(post_id, text, semaphore, backend_name=backend_name, fields=fields) for post_id, text in items
+    ])
+
 
+def extract_shard(items: List[tuple], max_concurrent: int, backend_name: str, fields: List[Field] = None) -> List[Dict]:
+    """Worker process entry point: extract one shard with the process's own backend instance"""
+    return asyncio.run(extract_requests(items, max_concurrent, backend_name, fields=fields))
 
-def sanitize_value(value, field_name):
-    """Convert unexpected types to database-safe values"""
-    # Arrays are fine for array fields
-    if field_name in ['math_courses', 'schools_applied', 'schools_accepted', 'schools_rejected', 'schools_waitlisted']:
-        if isinstance(value, list):
-            # Ensure all items in list are strings, not dicts
-            clean_list = []
-            for item in value:
-                if isinstance(item, dict):
-                    if 'name' in item:
-                        clean_list.append(str(item['name']))
-                    elif item:
-                        clean_list.append(str(list(item.values())[0]))
-                else:
-                    clean_list.append(str(item))
-            return clean_list
-        elif value is None:
-            return []
-        elif isinstance(value, dict):
-            if 'name' in value:
-                return [str(value['name'])]
-            elif value:
-                return [str(list(value.values())[0])]
-            else:
-                return []
-        else:
-            return [str(value)]
-    
-    # For other fields, flatten dicts/lists to strings
-    if isinstance(value, dict):
-        if 'name' in value:
-            return str(value['name'])
-        elif 'value' in value:
-            return str(value['value'])
-        elif value:
-            return str(list(value.values())[0])
-        else:
-            return None
-    elif isinstance(value, list) and value:
-        str_items = []
-        for item in value:
-            if isinstance(item, dict):
-                if 'name' in item:
-                    str_items.append(str(item['name']))
-                elif item:
-                    str_items.append(str(list(item.values())[0]))
-            else:
-                str_items.append(str(item))
-        return ', '.join(str_items) if str_items else None
-    elif isinstance(value, list) and not value:
+
+def remaining_fields(pre) -> List[Field]:
+    """Fields the model still has to extract after the rule-based ones (None for all of them)"""
+    if not pre.fields:
         return None
-    else:
-        return value
+    return [f for f in EXTRACTION_FIELDS if f.name not in pre.fields]
 
 
-def save_to_database(results: List[Dict], conn):
-    """Save results to database with sanitization"""
-    if not results:
-        return
-        
-    cursor = conn.cursor()
-    insert_query = """
-        INSERT INTO admissions_data (
-            original_post_id, undergrad_gpa, undergrad_gpa_out_of, grad_gpa, grad_gpa_out_of,
-            gre_quant, gre_verbal, gre_writing,
-            undergrad_institution, grad_institution, undergrad_major, grad_major,
-            math_courses, phd_course_taken, research_experience, publications,
-            work_experience_years, letters_of_rec,
-            schools_applied, schools_accepted, schools_rejected, schools_waitlisted,
-            funding_status
-        )
-        VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-        )
-    """
-    
-    data = [
-        (
-            sanitize_value(r.get("original_post_id"), "original_post_id"),
-            sanitize_value(r.get("undergrad_gpa"), "undergrad_gpa"),
-            sanitize_value(r.get("undergrad_gpa_out_of"), "undergrad_gpa_out_of"),
-            sanitize_value(r.get("grad_gpa"), "grad_gpa"),
-            sanitize_value(r.get("grad_gpa_out_of"), "grad_gpa_out_of"),
-            sanitize_value(r.get("gre_quant"), "gre_quant"),
-            sanitize_value(r.get("gre_verbal"), "gre_verbal"),
-            sanitize_value(r.get("gre_writing"), "gre_writing"),
-            sanitize_value(r.get("undergrad_institution"), "undergrad_institution"),
-            sanitize_value(r.get("grad_institution"), "grad_institution"),
-            sanitize_value(r.get("undergrad_major"), "undergrad_major"),
-            sanitize_value(r.get("grad_major"), "grad_major"),
-            sanitize_value(r.get("math_courses", []), "math_courses"),
-            sanitize_value(r.get("phd_course_taken"), "phd_course_taken"),
-            sanitize_value(r.get("research_experience"), "research_experience"),
-            sanitize_value(r.get("publications"), "publications"),
-            sanitize_value(r.get("work_experience_years"), "work_experience_years"),
-            sanitize_value(r.get("letters_of_rec"), "letters_of_rec"),
-            sanitize_value(r.get("schools_applied", []), "schools_applied"),
-            sanitize_value(r.get("schools_accepted", []), "schools_accepted"),
-            sanitize_value(r.get("schools_rejected", []), "schools_rejected"),
-            sanitize_value(r.get("schools_waitlisted", []), "schools_waitlisted"),
-            sanitize_value(r.get("funding_status"), "funding_status")
+async def process_batch(requests: List[PreparedRequest], max_concurrent: int = 10, metrics: RunMetrics = None,
+                        backend_name: str = None, workers: int = 1, pool: ProcessPoolExecutor = None) -> tuple:
+    """Process batch with controlled concurrency, only requests the rule-based pre-extractor cannot cover go to the model"""
+    llm_requests = []
+    llm_pres = []
+    local_successes = []
+    for request in requests:
+        pre = pre_extract(request.text)
+        if pre.needs_llm:
+            llm_requests.append(request)
+            llm_pres.append(pre)
+        elif pre.fields:
+            local_successes.append(local_record(request.post_id, pre, request.segment))
+    
+    # Requests are grouped by the fields left to ask for, so the prompt and schema leave out
+    # what the rules already resolved
+    groups = {}
+    for i, pre in enumerate(llm_pres):
+        fields = remaining_fields(pre)
+        groups.setdefault(None if fields is None else tuple(fields), []).append(i)
+    results = [None] * len(llm_requests)
+    for fields, indices in groups.items():
+        group_results = await extract_requests(
+            [(llm_requests[i].post_id, llm_requests[i].text) for i in indices],
+            max_concurrent, backend_name, workers, pool, None if fields is None else list(fields)
         )
-        for r in results
+        for i, r in zip(indices, group_results):
+            results[i] = r
+    
+    if metrics is not None:
+        for request, r in zip(llm_requests, results):
+            metrics.record_request(request.post_id, r)
+        metrics.record_routing(len(local_successes), len(requests) - len(llm_requests) - len(local_successes))
+    
+    successes = local_successes + [
+        dict(merge_pre_extraction(r["data"], pre), segment=request.segment)
+        for request, r, pre in zip(llm_requests, results, llm_pres) if r["success"]
     ]
-    execute_batch(cursor, insert_query, data, page_size=200)
-    conn.commit()
-    cursor.close()
+    errors = [{"post_id": r["post_id"], "error": r["error"]} for r in results if not r["success"]]
+    total_cost = sum(r.get("cost", 0) for r in results)
+    
+    return successes, errors, total_cost
 
 
-async def main():
-    start_time = time.time()
-    
-    # Load posts
-    conn = psycopg2.connect(**db_params)
-    df_all_posts = pd.read_sql("SELECT id, post_content FROM filtered_posts", conn)
-    
-    # Create table with generous field sizes to prevent overflow
+def save_to_database(results: List[Dict], conn):
+    """Save results to database through a single COPY"""
+    copy_records(conn, results)
+
+
+def create_admissions_table(conn):
+    """Drop and recreate admissions_data with generous field sizes to prevent overflow"""
     cursor = conn.cursor()
     cursor.execute("""
         DROP TABLE IF EXISTS admissions_data;
         CREATE TABLE admissions_data (
             id SERIAL PRIMARY KEY,
             original_post_id INTEGER,
+            segment INTEGER,
             undergrad_gpa DECIMAL(5,2),
             undergrad_gpa_out_of DECIMAL(5,1),
             grad_gpa DECIMAL(5,2),
@@ -322,84 +351,113 @@ async def main():
             schools_rejected TEXT[],
             schools_waitlisted TEXT[],
             funding_status TEXT,
+            schema_version INTEGER,
             extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         CREATE INDEX idx_post_id ON admissions_data(original_post_id);
     """)
     conn.commit()
     cursor.close()
+    # Fields added to the schema after this DDL was written
+    add_field_columns(conn)
+
+
+async def main(backend_name: str = None, workers: int = 1, parquet: bool = False):
+    start_time = time.time()
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    
+    # Posts are streamed from their own connection: the writer commits on conn,
+    # which would close a named cursor opened there
+    conn = connect()
+    read_conn = connect()
+    total_posts = count_rows(conn, "filtered_posts")
+    
+    create_admissions_table(conn)
     
     
     chunk_size = 100
-    total_chunks = (len(df_all_posts) + chunk_size - 1) // chunk_size
+    total_chunks = (total_posts + chunk_size - 1) // chunk_size
     
-    all_results = []
-    all_errors = []
+    posts_processed = 0
+    tokens_sent = 0
+    raw_tokens = 0
     total_cost = 0
+    quote_filter = QuoteFilter()
+    metrics = RunMetrics(total_posts)
+    writer = RecordWriter(conn).start()
+    # Per-request token counts before/after preprocessing, and failures, written as they come
+    token_log = CsvAppender("token_report.csv", ["request", "post_id", "raw_tokens", "tokens"])
+    error_log = CsvAppender("extraction_errors.csv", ["post_id", "error"])
     
-    for i in range(0, len(df_all_posts), chunk_size):
-        chunk = df_all_posts.iloc[i:i+chunk_size]
-        chunk_num = i // chunk_size + 1
-        
+    for chunk_num, chunk in enumerate(stream_posts(read_conn, chunk_size), 1):
         chunk_start = time.time()
         
-        results, errors, cost = await process_batch(chunk, max_concurrent=10)
+        requests = prepare_posts(chunk, quote_filter)
+        token_log.write(token_report(requests))
+        token_totals = summarize_tokens(requests)
+        tokens_sent += token_totals["tokens"]
+        raw_tokens += token_totals["raw_tokens"]
+        
+        results, errors, cost = await process_batch(requests, max_concurrent=10, metrics=metrics,
+                                                    backend_name=backend_name, workers=workers, pool=pool)
         
         chunk_time = time.time() - chunk_start
         total_cost += cost
         
-        if results:
-            save_to_database(results, conn)
+        await writer.write(results)
+        metrics.add_records(results)
+        error_log.write(errors)
         
-        all_results.extend(results)
-        all_errors.extend(errors)
-        
-        # Calculate ETA
-        elapsed = time.time() - start_time
-        posts_processed = i + len(chunk)
-        posts_remaining = len(df_all_posts) - posts_processed
-        if posts_processed > 0:
-            rate = posts_processed / elapsed
-            eta_seconds = posts_remaining / rate if rate > 0 else 0
-            eta_minutes = eta_seconds / 60
-        else:
-            eta_minutes = 0
-        
-        progress = (posts_processed / len(df_all_posts)) * 100
+        # Live throughput/ETA
+        posts_processed += len(chunk)
+        metrics.show_progress(posts_processed)
         
         # Small delay between chunks
         if chunk_num < total_chunks:
             await asyncio.sleep(2)
     
+    await writer.close()
+    if pool is not None:
+        pool.shutdown()
+    release(read_conn)
+    token_log.close()
+    error_log.close(keep_empty=False)
+    
     # Final results
     elapsed_total = time.time() - start_time
+    summary = metrics.close()
     
     
-    df_results = pd.read_sql("SELECT * FROM admissions_data ORDER BY id", conn)
-    
-    # Save CSV with consistent naming
+    # Save CSV with consistent naming, streamed by the server instead of loaded into a DataFrame
     csv_filename = "admissions_data_final.csv"
-    df_results.to_csv(csv_filename, index=False)
-    print(f"CSV saved: {csv_filename}")
+    export_csv(conn, csv_filename)
+    print(f"\nCSV saved: {csv_filename}")
+    if parquet:
+        export_parquet(conn, "admissions_data_final.parquet")
+        print("Parquet saved: admissions_data_final.parquet")
+    
+    print(f"Input tokens (est.): {tokens_sent:,} sent of {raw_tokens:,} in raw posts")
     
-    # Save errors if any
-    if all_errors:
-        error_file = "extraction_errors.csv"
-        pd.DataFrame(all_errors).to_csv(error_file, index=False)
     
+    latency = summary["latency"]
+    print(f"\nRequests: {summary['requests']:,} ({summary['failures']:,} failed, {summary['retries']:,} retries, "
+          f"{summary['reasks']:,} re-asks) | {summary['local_records']:,} records from rules only")
+    print(f"Tokens: {summary['prompt_tokens']:,} prompt / {summary['completion_tokens']:,} completion | cost ${summary['cost']:.2f}")
+    if latency["p50"] is not None:
+        print(f"Latency: p50 {latency['p50']:.2f}s | p95 {latency['p95']:.2f}s | p99 {latency['p99']:.2f}s")
     
-    print(f"\nField completeness:")
-    print(f"  Undergrad GPA: {df_results['undergrad_gpa'].notna().sum():,} ({df_results['undergrad_gpa'].notna().sum()/len(df_results)*100:.1f}%)")
-    print(f"  Grad GPA: {df_results['grad_gpa'].notna().sum():,} ({df_results['grad_gpa'].notna().sum()/len(df_results)*100:.1f}%)")
-    print(f"  GRE Quant: {df_results['gre_quant'].notna().sum():,} ({df_results['gre_quant'].notna().sum()/len(df_results)*100:.1f}%)")
-    print(f"  GRE Verbal: {df_results['gre_verbal'].notna().sum():,} ({df_results['gre_verbal'].notna().sum()/len(df_results)*100:.1f}%)")
-    print(f"  Undergrad institution: {df_results['undergrad_institution'].notna().sum():,} ({df_results['undergrad_institution'].notna().sum()/len(df_results)*100:.1f}%)")
-    print(f"  Math courses: {df_results['math_courses'].apply(lambda x: len(x) if x else 0).sum():,} total")
-    print(f"  Schools accepted: {df_results['schools_accepted'].apply(lambda x: len(x) if x else 0).sum():,} total")
-    print(f"  Schools rejected: {df_results['schools_rejected'].apply(lambda x: len(x) if x else 0).sum():,} total")
+    print(f"\nField completeness ({summary['records']:,} records):")
+    for field, pct in summary["field_completeness_pct"].items():
+        print(f"  {field}: {pct:.1f}%")
     
     
-    conn.close()
+    release(conn)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract structured admissions data from filtered_posts")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None,
+                        help="extraction backend (default: EXTRACTION_BACKEND or openai)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for bulk runs")
+    parser.add_argument("--parquet", action="store_true", help="also export admissions_data to Parquet (needs pyarrow)")
+    args = parser.parse_args()
+    asyncio.run(main(args.backend, args.workers, args.parquet))
\ No newline at end of file
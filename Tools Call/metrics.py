@@ -0,0 +1,137 @@
+"""
+Extraction run observability:
+Per-request latency, tokens, cost, retries and error class go to a JSON-lines log,
+with a live progress/ETA line, latency percentiles and incremental field completeness
+"""
+
+import sys
+import json
+import time
+from typing import List, Dict
+
+import numpy as np
+
+from extraction_schema import EXTRACTION_FIELDS
+
+METRICS_LOG = "extraction_metrics.jsonl"
+SUMMARY_FILE = "extraction_summary.json"
+
+
+class RunMetrics:
+    """Collects metrics for one extraction run"""
+
+    def __init__(self, total_posts: int, log_path: str = METRICS_LOG):
+        self.total_posts = total_posts
+        self.start_time = time.time()
+        self.log = open(log_path, "w", encoding="utf-8")
+
+        self.latencies = []
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.reasks = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.error_classes = {}
+        self.local_records = 0
+        self.skipped_requests = 0
+
+        self.records = 0
+        self.filled = {f.name: 0 for f in EXTRACTION_FIELDS}
+
+    def record_request(self, post_id: int, result: Dict):
+        """Log one model request from the result dict of extract_single_post"""
+        self.requests += 1
+        self.retries += result.get("retries", 0)
+        self.reasks += result.get("reasks", 0)
+        self.prompt_tokens += result.get("prompt_tokens", 0)
+        self.completion_tokens += result.get("completion_tokens", 0)
+        self.cost += result.get("cost", 0)
+        if result.get("latency") is not None:
+            self.latencies.append(result["latency"])
+
+        error_class = None
+        if not result["success"]:
+            self.failures += 1
+            error_class = result.get("error_class", "Unknown")
+            self.error_classes[error_class] = self.error_classes.get(error_class, 0) + 1
+
+        self.log.write(json.dumps({
+            "post_id": int(post_id),
+            "ts": time.time(),
+            "latency": result.get("latency"),
+            "prompt_tokens": result.get("prompt_tokens", 0),
+            "completion_tokens": result.get("completion_tokens", 0),
+            "cost": result.get("cost", 0),
+            "retries": result.get("retries", 0),
+            "reasks": result.get("reasks", 0),
+            "error_class": error_class
+        }) + "\n")
+
+    def record_routing(self, local_records: int, skipped_requests: int):
+        """Requests answered by the pre-extractor or skipped without a model call"""
+        self.local_records += local_records
+        self.skipped_requests += skipped_requests
+
+    def add_records(self, records: List[Dict]):
+        """Update field completeness with newly saved records"""
+        self.records += len(records)
+        for record in records:
+            for name in self.filled:
+                value = record.get(name)
+                if value is not None and value != []:
+                    self.filled[name] += 1
+
+    def completeness(self) -> Dict[str, float]:
+        if not self.records:
+            return {name: 0.0 for name in self.filled}
+        return {name: count / self.records * 100 for name, count in self.filled.items()}
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        if not self.latencies:
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(self.latencies, [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+    def show_progress(self, posts_processed: int):
+        """Live progress/ETA line, rewritten in place"""
+        elapsed = time.time() - self.start_time
+        rate = posts_processed / elapsed if elapsed > 0 else 0
+        eta_minutes = (self.total_posts - posts_processed) / rate / 60 if rate > 0 else 0
+        progress = posts_processed / self.total_posts * 100 if self.total_posts else 100
+        p95 = self.latency_percentiles()["p95"]
+
+        sys.stdout.write(
+            f"\r{progress:5.1f}% | {posts_processed:,}/{self.total_posts:,} posts | "
+            f"{rate * 60:.0f} posts/min | ETA {eta_minutes:.0f} min | "
+            f"p95 {p95 or 0:.1f}s | errors {self.failures:,} | ${self.cost:.2f}"
+        )
+        sys.stdout.flush()
+
+    def summary(self) -> Dict:
+        return {
+            "elapsed_seconds": time.time() - self.start_time,
+            "posts": self.total_posts,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_classes": self.error_classes,
+            "retries": self.retries,
+            "reasks": self.reasks,
+            "local_records": self.local_records,
+            "skipped_requests": self.skipped_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost,
+            "latency": self.latency_percentiles(),
+            "records": self.records,
+            "field_completeness_pct": self.completeness()
+        }
+
+    def close(self, summary_path: str = SUMMARY_FILE) -> Dict:
+        """Close the log and write the run summary"""
+        self.log.close()
+        summary = self.summary()
+        with open(summary_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
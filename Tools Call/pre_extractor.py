@@ -0,0 +1,209 @@
+"""
+Rule-based pre-extractor:
+Parses GPA and GRE scores written in rigid patterns ("GPA 3.8/4.0", "Q170 V160")
+before any LLM call, and decides whether a post still needs the model
+"""
+
+import re
+import csv
+from pathlib import Path
+from typing import NamedTuple, Dict
+
+MIN_CONFIDENCE = 0.8  # regex values below this are never used
+
+NUM = r"(\d{1,3}(?:\.\d{1,2})?)"
+
+GPA_WITH_SCALE = [
+    re.compile(r"\bc?gpa\s*(?:of|is|was|:|-|=)?\s*" + NUM + r"\s*(?:/|out of|on a)\s*" + NUM, re.I),
+    re.compile(NUM + r"\s*(?:/|out of)\s*" + NUM + r"\s*c?gpa\b", re.I),
+]
+GPA_NO_SCALE = [
+    re.compile(r"\bc?gpa\s*(?:of|is|was|:|-|=)?\s*([0-4]\.\d{1,2})\b(?!\s*(?:/|out of))", re.I),
+    re.compile(r"\b([0-4]\.\d{1,2})\s*c?gpa\b", re.I),
+]
+GRAD_CONTEXT = re.compile(r"(?<!under)grad\b|(?<!under)graduate|master|\bms\b|\bma\b|\bmsc\b|\bmphil\b", re.I)
+
+# GRE section labels and scores. A run of them ("Quant: 168 Verbal: 158", "165Q/160V/4.5AWA")
+# is read in the direction it starts with, so a score is never given to the neighbouring label
+GRE_LABELS = {
+    "q": "gre_quant", "quant": "gre_quant", "quantitative": "gre_quant",
+    "v": "gre_verbal", "verbal": "gre_verbal",
+    "aw": "gre_writing", "awa": "gre_writing", "writing": "gre_writing",
+}
+GRE_TOKEN = re.compile(
+    r"(?<![a-z])(?P<label>quantitative|quant|verbal|writing|awa|aw|q|v)(?![a-z])"
+    r"|(?<![\d.])(?P<score>1[3-6]\d|170|[0-6](?:\.[05])?)(?![\d.])",
+    re.I
+)
+GRE_SEPARATOR = re.compile(r"[\s:=\-,/;|()&]*|\s*,?\s*and\s+", re.I)
+# A section score left unpaired ("GRE 160 170 - q v") or an old 200-800 score ("800 on the old quant")
+# means the rules cannot tell which score is which, so all GRE fields are left to the model
+GRE_CUE = re.compile(r"\bgre\b|quant|verbal", re.I)
+OLD_GRE_SCORE = re.compile(
+    r"(?:\bgre\b|quant|verbal|\b[qv]\b)\D{0,25}\b(?:[2-7]\d0|800)\b|\b(?:[2-7]\d0|800)\b\D{0,25}(?:\bgre\b|quant|verbal|\b[qv]\b)",
+    re.I
+)
+GRE_TRIPLE = re.compile(r"\bgre\b[^0-9]{0,15}(1[3-6]\d|170)\s*[/,]\s*(1[3-6]\d|170)(?:\s*[/,]\s*([0-6](?:\.[05])?))?", re.I)
+
+# Fields the regexes cannot resolve and the cues that mean the post mentions them
+LLM_CUES = re.compile(
+    r"accept|admit|reject|waitlist|wait-list|\bapplied\b|applying|\boffer|"
+    r"major|minor|degree|\bba\b|\bbs\b|\bbsc\b|universit|college|institute|"
+    r"analysis|algebra|calculus|course|letter|\blor|recommend|research|publication|"
+    r"funding|fellowship|stipend|work experience|\bra\b",
+    re.I
+)
+# Forum shorthand for outcomes: "In at Harvard; out at Yale", "MIT yes, Harvard no", "Harvard: in!"
+OUTCOME_SHORTHAND = re.compile(
+    r"\b(?:in|out)\s+at\b|[:\-]\s*(?:in|out|yes|no)\b|\b(?:yes|no)\s*[,;.!]|\bgot in\b|\bdinged\b",
+    re.I
+)
+RANKINGS_FILE = Path(__file__).resolve().parent.parent / "cleaning-visualization" / "institution_rankings.csv"
+MIN_SCHOOL_ALIAS_CHARS = 3  # shorter aliases ("uk", "bc") are mostly not school names
+
+
+def load_school_names(path: Path = RANKINGS_FILE) -> re.Pattern:
+    """One pattern matching any ranked school alias, so posts naming a school go to the model"""
+    with open(path, encoding="utf-8") as f:
+        aliases = {row["alias"] for row in csv.DictReader(f) if len(row["alias"]) >= MIN_SCHOOL_ALIAS_CHARS}
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, sorted(aliases, key=len, reverse=True))) + r")\b", re.I)
+
+
+SCHOOL_NAMES = load_school_names()
+
+
+def needs_model(text: str) -> bool:
+    """Whether the text mentions anything the rules never resolve: schools, outcomes, courses,
+    graduate degrees, letters, research or funding"""
+    return any(pattern.search(text) for pattern in (LLM_CUES, SCHOOL_NAMES, OUTCOME_SHORTHAND, GRAD_CONTEXT))
+
+
+class PreExtraction(NamedTuple):
+    fields: Dict[str, float]  # field -> value, only values at or above MIN_CONFIDENCE
+    confidence: Dict[str, float]  # field -> confidence for every parsed value
+    needs_llm: bool
+
+
+def _gpa(text: str, candidates: Dict, confidence: Dict):
+    for pattern in GPA_WITH_SCALE:
+        for match in pattern.finditer(text):
+            if GRAD_CONTEXT.search(text[max(0, match.start() - 20):match.start()]):
+                continue
+            gpa, out_of = float(match.group(1)), float(match.group(2))
+            if 0 < gpa <= out_of <= 100:
+                candidates["undergrad_gpa"] = gpa
+                candidates["undergrad_gpa_out_of"] = out_of
+                confidence["undergrad_gpa"] = confidence["undergrad_gpa_out_of"] = 0.95
+                return
+
+    for pattern in GPA_NO_SCALE:
+        for match in pattern.finditer(text):
+            if GRAD_CONTEXT.search(text[max(0, match.start() - 20):match.start()]):
+                continue
+            gpa = float(match.group(1))
+            if 0 < gpa <= 4.0:
+                # Prompt rule: a GPA under 4 without a scale is on the 4.0 scale
+                candidates["undergrad_gpa"] = gpa
+                candidates["undergrad_gpa_out_of"] = 4.0
+                confidence["undergrad_gpa"] = 0.85
+                confidence["undergrad_gpa_out_of"] = 0.8
+                return
+
+
+def _gre_runs(text: str):
+    """Runs of GRE labels and scores separated only by punctuation, as (kind, value) lists"""
+    runs = []
+    end = None
+    for match in GRE_TOKEN.finditer(text):
+        token = ("label", GRE_LABELS[match.group("label").lower()]) if match.group("label") else ("score", match.group("score"))
+        if end is None or not GRE_SEPARATOR.fullmatch(text, end, match.start()):
+            runs.append([])
+        runs[-1].append(token)
+        end = match.end()
+    return runs
+
+
+def _gre_pairs(run):
+    """(field, score) pairs of a run: label-score if it starts with a label, score-label if with a score;
+    scores that pair with no label come out as (None, score)"""
+    first = run[0][0]
+    for i in range(0, len(run) - 1, 2):
+        (kind_a, a), (kind_b, b) = run[i], run[i + 1]
+        fits = kind_a == first and kind_b != first
+        if fits:
+            field, score = (a, b) if first == "label" else (b, a)
+            fits = (field == "gre_writing") == ("." in score or len(score) == 1)
+        if not fits:
+            # A token that pairs with neither side ("GPA 3.8/4.0, Q170 V160") starts a new run after it
+            if kind_a == "score":
+                yield None, a
+            yield from _gre_pairs(run[i + 1:])
+            return
+        yield field, score
+    if len(run) % 2 and run[-1][0] == "score":
+        yield None, run[-1][1]
+
+
+def _gre(text: str, candidates: Dict, confidence: Dict):
+    values = {}
+    unpaired = set()
+    for run in _gre_runs(text):
+        labeled = any(kind == "label" for kind, _ in run)
+        for field, score in _gre_pairs(run):
+            if field is None:
+                # Only section scores count, and only in a GRE context: "applied to 150 schools" is not one
+                if score.isdigit() and len(score) == 3 and (labeled or GRE_CUE.search(text)):
+                    unpaired.add(int(score))
+                continue
+            values.setdefault(field, set()).add(float(score) if field == "gre_writing" else int(score))
+    for field, scores in values.items():
+        if len(scores) == 1:
+            candidates[field] = scores.pop()
+            confidence[field] = 0.95
+        else:
+            # Conflicting scores (e.g. two attempts) are left to the model
+            confidence[field] = 0.4
+
+    match = GRE_TRIPLE.search(text)
+    if match:
+        for field, group in (("gre_quant", 1), ("gre_verbal", 2), ("gre_writing", 3)):
+            if field in confidence or match.group(group) is None:
+                continue
+            value = match.group(group)
+            candidates[field] = float(value) if field == "gre_writing" else int(value)
+            confidence[field] = 0.85
+        unpaired -= {int(match.group(1)), int(match.group(2))}
+
+    if unpaired or OLD_GRE_SCORE.search(text):
+        for field in ("gre_quant", "gre_verbal", "gre_writing"):
+            candidates.pop(field, None)
+            confidence[field] = min(confidence.get(field, 0.4), 0.4)
+
+
+def pre_extract(post_content: str) -> PreExtraction:
+    """Run the rules over a post"""
+    text = str(post_content or "")
+    candidates = {}
+    confidence = {}
+
+    _gpa(text, candidates, confidence)
+    _gre(text, candidates, confidence)
+
+    fields = {k: v for k, v in candidates.items() if confidence.get(k, 0) >= MIN_CONFIDENCE}
+    unresolved = len(fields) < len(confidence)
+    return PreExtraction(fields, confidence, unresolved or needs_model(text))
+
+
+def local_record(post_id: int, pre: PreExtraction, segment: int = 1) -> Dict:
+    """Admissions record built only from the rule-based fields"""
+    record = {"original_post_id": post_id, "segment": segment}
+    record.update(pre.fields)
+    return record
+
+
+def merge_pre_extraction(record: Dict, pre: PreExtraction) -> Dict:
+    """Fill fields the model left empty with rule-based values"""
+    for field, value in pre.fields.items():
+        if record.get(field) is None:
+            record[field] = value
+    return record
@@ -0,0 +1,166 @@
+"""
+Prompt-size minimization before extraction:
+Strips quoted earlier replies, signatures and forum boilerplate, splits long
+multi-profile posts into one request per profile and reports token counts
+"""
+
+import re
+import math
+from typing import NamedTuple, List, Dict
+
+from pre_extractor import needs_model
+
+QUOTE_CITATION = re.compile(
+    r"(?:On \d{1,2}/\d{1,2}/\d{2,4} at \d{1,2}:\d{2}\s*[AP]M,\s*)?[\w.\-]+ said:\s*", re.I
+)
+BOILERPLATE = [
+    re.compile(r"https?://\S+|www\.\S+", re.I),
+    re.compile(r"\bEdited (?:\w+ \d{1,2}, \d{4}|\d{1,2}/\d{1,2}/\d{2,4})(?: by [\w.\-]+)?", re.I),
+    re.compile(r"\b(?:Share this post|Link to (?:post|comment)|Report post|Multi-?quote|Expand)\b", re.I),
+    re.compile(r"\bPosted (?:\w+ \d{1,2}, \d{4}|\d{1,2}/\d{1,2}/\d{2,4})(?: \(edited\))?", re.I),
+]
+# A sign-off starts a sentence or line ("...results. Cheers!"), not mid-sentence
+SIGNATURE = re.compile(
+    r"(?:^|(?<=[.!?\n]))\s*(?:--\s|cheers\b|regards\b|best,|thanks in advance|thanks!|thank you!|good luck\b)", re.I
+)
+MAX_SIGNATURE_CHARS = 200
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+MIN_QUOTED_SENTENCE_CHARS = 30
+
+SEGMENT_MARKER = re.compile(r"(?:^|\s)(?:profile|applicant|candidate)\s*#?\s*\d+\s*[:\-)]", re.I)
+MIN_SEGMENT_POST_CHARS = 1500
+
+
+class PreparedRequest(NamedTuple):
+    key: str  # post id, with a segment suffix for multi-profile posts
+    post_id: int
+    segment: int  # position of the request within its post, from 1; stored with the record it produces
+    text: str
+    raw_tokens: int  # estimated tokens of the whole original post
+    tokens: int  # estimated tokens of this request's text
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English text)"""
+    return math.ceil(len(text) / 4)
+
+
+def _sentence_key(sentence: str) -> str:
+    return re.sub(r"\W+", " ", sentence.lower()).strip()
+
+
+class QuoteFilter:
+    """Drops sentences already posted earlier in the same thread, i.e. quoted replies
+
+    Posts must arrive grouped by thread (see POSTS_SQL): only the current thread's sentences are
+    kept, so memory is bounded by the longest thread rather than the corpus
+    """
+
+    def __init__(self):
+        self.thread_key = None
+        self.seen = set()
+
+    def strip(self, thread_key: str, text: str) -> str:
+        if thread_key != self.thread_key:
+            self.thread_key, self.seen = thread_key, set()
+        seen = self.seen
+        text = QUOTE_CITATION.sub(" ", text)
+
+        kept = []
+        for sentence in SENTENCE_SPLIT.split(text):
+            key = _sentence_key(sentence)
+            if len(key) >= MIN_QUOTED_SENTENCE_CHARS and key in seen:
+                continue
+            kept.append(sentence)
+
+        for sentence in kept:
+            key = _sentence_key(sentence)
+            if len(key) >= MIN_QUOTED_SENTENCE_CHARS:
+                seen.add(key)
+
+        return " ".join(kept)
+
+
+def strip_boilerplate(text: str) -> str:
+    """Remove forum chrome, links and a short trailing signature"""
+    for pattern in BOILERPLATE:
+        text = pattern.sub(" ", text)
+
+    # Only cut a final sign-off: short, no numbers, and no school or outcome the model would extract
+    for match in SIGNATURE.finditer(text):
+        tail = text[match.start():]
+        if len(tail) <= MAX_SIGNATURE_CHARS and not re.search(r"\d", tail) and not needs_model(tail):
+            text = text[:match.start()]
+            break
+
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def segment_post(text: str) -> List[str]:
+    """Split a long post that lists several numbered profiles into one segment per profile"""
+    if len(text) < MIN_SEGMENT_POST_CHARS:
+        return [text]
+
+    starts = [m.start() for m in SEGMENT_MARKER.finditer(text)]
+    if len(starts) < 2:
+        return [text]
+
+    preamble = text[:starts[0]].strip()
+    bounds = starts + [len(text)]
+    segments = [text[bounds[i]:bounds[i + 1]].strip() for i in range(len(starts))]
+    # The preamble usually describes the cycle or schools shared by every profile
+    if preamble:
+        segments = [f"{preamble} {segment}" for segment in segments]
+    return segments
+
+
+def prepare_post(post_id: int, post_content: str, thread_key: str, quote_filter: QuoteFilter) -> List[PreparedRequest]:
+    """Preprocess one post into its extraction requests (none if nothing new is left)"""
+    raw_text = str(post_content or "")
+    raw_tokens = estimate_tokens(raw_text)
+
+    text = strip_boilerplate(quote_filter.strip(thread_key, raw_text))
+    if not text:
+        return []
+
+    segments = segment_post(text)
+    if len(segments) == 1:
+        return [PreparedRequest(str(post_id), post_id, 1, text, raw_tokens, estimate_tokens(text))]
+
+    return [
+        PreparedRequest(f"{post_id}-{i}", post_id, i, segment, raw_tokens, estimate_tokens(segment))
+        for i, segment in enumerate(segments, 1)
+    ]
+
+
+def split_key(key: str) -> tuple:
+    """(post id, segment) of a request key"""
+    post_id, _, segment = key.partition("-")
+    return int(post_id), int(segment or 1)
+
+
+def prepare_posts(posts_df, quote_filter: QuoteFilter) -> List[PreparedRequest]:
+    """Preprocess posts grouped by thread in id order; quote detection needs earlier posts of a thread seen first"""
+    requests = []
+    for post_id, post_content, thread_url in zip(posts_df["id"], posts_df["post_content"], posts_df["thread_url"]):
+        requests.extend(prepare_post(int(post_id), post_content, thread_url, quote_filter))
+    return requests
+
+
+def summarize_tokens(requests: List[PreparedRequest]) -> Dict:
+    """Total estimated input tokens before and after preprocessing"""
+    raw_tokens = sum({r.post_id: r.raw_tokens for r in requests}.values())
+    tokens = sum(r.tokens for r in requests)
+    return {
+        "raw_tokens": raw_tokens,
+        "tokens": tokens,
+        "reduction_pct": (1 - tokens / raw_tokens) * 100 if raw_tokens else 0.0
+    }
+
+
+def token_report(requests: List[PreparedRequest]) -> List[Dict]:
+    """Per-request token counts before and after preprocessing"""
+    return [
+        {"request": r.key, "post_id": r.post_id, "raw_tokens": r.raw_tokens, "tokens": r.tokens}
+        for r in requests
+    ]
@@ -0,0 +1,119 @@
+"""
+Field-level incremental re-extraction:
+Rows of admissions_data produced under an older schema version are re-asked only
+for the fields added or changed since (see Field.version in extraction_schema)
+with a narrow prompt, and the answers are merged into the rows in place
+"""
+
+import time
+import asyncio
+import argparse
+
+import pandas as pd
+
+from extraction_schema import SCHEMA_VERSION, fields_since
+from backends import BACKENDS, get_backend
+from db_writer import add_field_columns, update_fields
+from gpt_tools_call import connect, release, build_messages, extract_single_post
+from preprocessing import estimate_tokens
+from streaming import stream_requests
+
+# Rows carry the segment of the request that produced them; rows written before segments
+# were stored have none and are left to a full run
+STALE_ROWS_SQL = """
+    SELECT id, original_post_id, COALESCE(schema_version, 1) AS version, segment
+    FROM admissions_data
+    WHERE COALESCE(schema_version, 1) < %s
+    ORDER BY id
+"""
+
+
+def request_texts(requests, post_ids: set) -> dict:
+    """Preprocessed request texts by (post id, segment)"""
+    return {(r.post_id, r.segment): r.text for r in requests if r.post_id in post_ids}
+
+
+def plan_reextraction(stale: pd.DataFrame, texts: dict) -> tuple:
+    """Group stale rows by schema version into (fields, [(row id, post id, text)]), plus unmatched row ids"""
+    groups = {}
+    unmatched = []
+    for row_id, post_id, version, segment in stale.itertuples(index=False):
+        text = None if pd.isna(segment) else texts.get((int(post_id), int(segment)))
+        if text is None:
+            unmatched.append(int(row_id))
+            continue
+        version = int(version)
+        if version not in groups:
+            groups[version] = (fields_since(version), [])
+        groups[version][1].append((int(row_id), int(post_id), text))
+    return groups, unmatched
+
+
+def prompt_tokens(items, fields=None) -> int:
+    """Estimated input tokens of the requests with a narrow (fields) or full prompt"""
+    return sum(estimate_tokens(m["content"]) for _, _, text in items for m in build_messages(text, fields))
+
+
+async def main(backend_name: str = None, max_concurrent: int = 10, dry_run: bool = False):
+    start_time = time.time()
+
+    conn = connect()
+    add_field_columns(conn)
+
+    stale = pd.read_sql(STALE_ROWS_SQL, conn, params=(SCHEMA_VERSION,))
+    if stale.empty:
+        print(f"admissions_data is up to date with schema version {SCHEMA_VERSION}")
+        release(conn)
+        return
+
+    # Quote detection needs the whole thread history, so every post is prepared
+    texts = request_texts(stream_requests(conn), set(stale["original_post_id"]))
+    groups, unmatched = plan_reextraction(stale, texts)
+
+    for version, (fields, items) in sorted(groups.items()):
+        narrow, full = prompt_tokens(items, fields), prompt_tokens(items)
+        print(f"v{version} -> v{SCHEMA_VERSION}: {len(items):,} rows, fields {', '.join(f.name for f in fields)} | "
+              f"input tokens (est.) {narrow:,} vs {full:,} for a full re-extraction")
+    if unmatched:
+        print(f"{len(unmatched):,} rows no longer match their post's requests and need a full run")
+    if dry_run:
+        release(conn)
+        return
+
+    semaphore = asyncio.Semaphore(min(max_concurrent, get_backend(backend_name).max_concurrent))
+    all_errors = []
+    total_cost = 0
+    rows_updated = 0
+
+    for version, (fields, items) in sorted(groups.items()):
+        results = await asyncio.gather(*[
+            extract_single_post(post_id, text, semaphore, backend_name=backend_name, fields=fields)
+            for _, post_id, text in items
+        ])
+        total_cost += sum(r.get("cost", 0) for r in results)
+
+        rows = [(row_id, r["data"]) for (row_id, _, _), r in zip(items, results) if r["success"]]
+        update_fields(conn, rows, fields)
+        rows_updated += len(rows)
+        all_errors.extend(
+            {"row_id": row_id, "post_id": r["post_id"], "error": r["error"]}
+            for (row_id, _, _), r in zip(items, results) if not r["success"]
+        )
+
+    release(conn)
+
+    if all_errors:
+        pd.DataFrame(all_errors).to_csv("reextraction_errors.csv", index=False)
+
+    print(f"\nUpdated {rows_updated:,} rows to schema version {SCHEMA_VERSION} "
+          f"({len(all_errors):,} failed) in {(time.time() - start_time) / 60:.1f} min | cost ${total_cost:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract only the fields added or changed since each row's schema version")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None,
+                        help="extraction backend (default: EXTRACTION_BACKEND or openai)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan and token estimate")
+    args = parser.parse_args()
+    asyncio.run(main(args.backend, args.concurrency, args.dry_run))
@@ -0,0 +1,120 @@
+"""
+Memory-bounded database I/O for extraction runs:
+Posts are read in chunks through a server-side (named) cursor, per-request reports
+are appended to CSV as they are produced and table exports stream via COPY ... TO STDOUT
+"""
+
+import os
+import csv
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Dict
+
+import pandas as pd
+
+from extraction_schema import EXTRACTION_FIELDS
+from preprocessing import PreparedRequest, QuoteFilter, prepare_posts
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import stream_frames, copy_out_csv
+
+# Grouped by thread so QuoteFilter only holds one thread's sentences at a time
+POSTS_SQL = "SELECT id, post_content, thread_url FROM filtered_posts ORDER BY thread_url, id"
+EXPORT_SQL = "SELECT * FROM admissions_data ORDER BY id"
+
+# Arrow types of the admissions_data columns, TEXT[] columns stay Postgres array literals ({a,"b c"})
+ARROW_TYPES = {
+    "number": "float64",
+    "integer": "int64",
+    "string": "string",
+    "boolean": "bool",
+    "array": "string",
+}
+
+
+def count_rows(conn, table: str) -> int:
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+
+def stream_posts(conn, chunk_size: int = 100, query: str = POSTS_SQL) -> Iterator[pd.DataFrame]:
+    """Yield posts as DataFrame chunks from a named cursor, only one chunk is held client side
+
+    The cursor lives in its own transaction, so conn must not be committed while iterating
+    """
+    return stream_frames(conn, query, chunk_size, name="stream_posts")
+
+
+def stream_requests(conn, chunk_size: int = 1000) -> Iterator[PreparedRequest]:
+    """Yield the prepared requests of every post, chunks share one QuoteFilter so quotes are caught across them"""
+    quote_filter = QuoteFilter()
+    for chunk in stream_posts(conn, chunk_size):
+        yield from prepare_posts(chunk, quote_filter)
+
+
+class CsvAppender:
+    """CSV report written row by row instead of collected until the end of the run"""
+
+    def __init__(self, path: str, columns: List[str]):
+        self.path = path
+        self.rows = 0
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=columns, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, rows: List[Dict]):
+        self.writer.writerows(rows)
+        self.rows += len(rows)
+
+    def close(self, keep_empty: bool = True):
+        self.file.close()
+        if not keep_empty and not self.rows:
+            os.remove(self.path)
+
+
+def export_csv(conn, path: str, query: str = EXPORT_SQL):
+    """Stream a query result to a CSV file with COPY, rows never pass through pandas"""
+    copy_out_csv(conn, query, path)
+
+
+def admissions_arrow_schema() -> Dict[str, str]:
+    types = {"id": "int64", "original_post_id": "int64", "segment": "int64"}
+    types.update({f.name: ARROW_TYPES[f.json_type] for f in EXTRACTION_FIELDS})
+    types.update({"schema_version": "int64", "extracted_at": "timestamp[us]"})
+    return types
+
+
+def export_parquet(conn, path: str, query: str = EXPORT_SQL, block_size: int = 1 << 24):
+    """Stream admissions_data to Parquet: COPY to a spooled CSV, then convert block by block (needs pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)") from e
+
+    column_types = {name: pa.type_for_alias(alias) for name, alias in admissions_arrow_schema().items()}
+    fd, spool = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        export_csv(conn, spool, query)
+        reader = pa_csv.open_csv(
+            spool,
+            read_options=pa_csv.ReadOptions(block_size=block_size),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                true_values=["t"],
+                false_values=["f"],
+                strings_can_be_null=True,  # COPY writes NULL as an empty unquoted field
+                quoted_strings_can_be_null=False
+            )
+        )
+        with pq.ParquetWriter(path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+    finally:
+        os.remove(spool)
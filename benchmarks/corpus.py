@@ -0,0 +1,321 @@
+"""
+Synthetic corpus for the benchmarks, deterministic for a seed and sized to any scale:
+forum pages in the markup scraping.py parses, forum_posts rows and admissions_data records
+
+Posts mix applicant profiles (GPA, GRE, courses, schools and outcomes, written the ways
+forum users write them) with the noise the filters exist for: thanks and congrats replies,
+questions, off-topic threads and reposts. admissions_data records are drawn from the same
+profiles, with the names as extracted (ranked aliases, unranked schools, misspellings)
+
+    python benchmarks/corpus.py 100000 --out corpus        # forum_posts.csv and admissions_data.csv
+    python benchmarks/corpus.py 10000 --out corpus --html  # plus the forum and thread pages
+
+forum_posts.csv has the columns scraping.py writes, so raw_data_upload.py can load it into a
+scratch database to run the pipeline itself on synthetic data
+"""
+
+import html
+import random
+import argparse
+from datetime import datetime, timedelta
+from itertools import chain
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+RANKINGS_FILE = ROOT / "cleaning-visualization" / "institution_rankings.csv"
+
+SEED = 42
+FORUM_BASE = "https://www.urch.com"
+THREADS_PER_FORUM_PAGE = 25
+POSTS_PER_THREAD_PAGE = 25
+MAX_POSTS_PER_THREAD = 60
+SCRAPED_AT = datetime(2025, 3, 1)
+
+SCRAPED_COLUMNS = ["thread_title", "thread_url", "author", "page", "post"]
+POST_COLUMNS = ["id", "thread_title", "thread_url", "author", "page", "post_content", "scraped_at"]
+ADMISSIONS_COLUMNS = [
+    "id", "original_post_id", "undergrad_gpa", "undergrad_gpa_out_of", "grad_gpa", "grad_gpa_out_of",
+    "gre_quant", "gre_verbal", "gre_writing", "undergrad_institution", "grad_institution",
+    "undergrad_major", "grad_major", "math_courses", "phd_course_taken", "research_experience",
+    "publications", "work_experience_years", "letters_of_rec", "schools_applied", "schools_accepted",
+    "schools_rejected", "schools_waitlisted", "funding_status", "schema_version"
+]
+
+# Share of posts by kind; the rest are profiles
+NOISE_SHARES = {"reply": 0.45, "question": 0.20, "offtopic": 0.05, "repost": 0.03}
+
+UNRANKED_SCHOOLS = [
+    "Some State College", "a small liberal arts college", "top 20 school", "t10 lac", "LSE",
+    "univesity of toronto", "Universty of Michgan", "Bocconi", "Peking University", "IIT Delhi",
+    "University of Sao Paulo", "local state school", "Univ of Chicago", "UC Berkely"
+]
+MAJORS = ["Economics", "Econ", "Math", "Mathematics and Economics", "Physics", "Finance", "B.B.A",
+          "Eco & Finance", "Computer Science", "Statistics", "Political Science", "Applied Math"]
+GRAD_MAJORS = ["MA Economics", "MSc Economics", "Master in Finance", "MS Statistics", "MPhil Economics"]
+COURSES = ["Calc I-III", "Calculus", "AP BC", "Linear Algebra", "lin alg", "Real Analysis",
+           "Intro to Proofs", "Topology", "Probability", "Mathematical Statistics", "ODE",
+           "Measure Theory", "Abstract Algebra", "Numerical Methods"]
+LETTERS = ["two professors and my RA supervisor", "3 academic letters", "Prof. Smith and two economists",
+           "one from my boss, two from professors", "federal reserve economist", "my thesis advisor",
+           "2 professors, 1 employer", "three strong academic letters"]
+FUNDING = ["full funding", "funded offer", "tuition waiver only", "no funding", "fellowship", "TA funding"]
+RESEARCH = ["RA at the Fed for two years", "senior thesis", "RA for a professor", "summer research program",
+            "two years as a research assistant at a think tank", "worked on a working paper with my advisor"]
+
+PROFILE_TITLES = ["Profile evaluation - {year} applicant", "{year} PhD Economics admissions results",
+                  "Chances for top 20? ({year})", "Where should I apply? {year} cycle",
+                  "Results thread {year}: post your profile", "Fall {year} admissions - my results"]
+OFFTOPIC_TITLES = ["Apartment for rent near campus", "Roommate wanted for fall", "TOEFL only question",
+                   "Selling GRE prep books", "Sublet available in Cambridge", "Tutoring for GRE math"]
+REPLIES = ["Congrats! Good luck with the rest of your decisions.", "Thanks for sharing, this is really helpful.",
+           "Wow, congratulations! Awesome results.", "Good luck everyone, the wait is killing me lol",
+           "Nice, best of luck!", "Thank you so much for posting this, great thread.",
+           "haha same here, still waiting on everything"]
+QUESTIONS = ["What are my chances with a {gpa} GPA and {q} quant? Should I retake the GRE?",
+             "How important is real analysis for top programs? Does anyone know?",
+             "Should I apply to more schools or fewer? Which ones are safeties?",
+             "Is it worth doing an MA first? What did you do?",
+             "When do the top schools usually send out decisions? Has anyone heard from {school}?"]
+CONNECTORS = ["Overall I'm happy with how it went.", "Happy to answer questions.",
+              "Hope this helps future applicants.", "Still deciding between my offers.",
+              "Any advice on choosing would be appreciated."]
+
+
+def load_names():
+    """(undergraduate, PhD) school names: the ranked aliases cleaning resolves"""
+    rankings = pd.read_csv(RANKINGS_FILE)
+    undergrad = rankings.loc[rankings["rankings"] == "undergrad", "alias"].tolist()
+    phd = rankings.loc[rankings["rankings"] == "phd", "alias"].tolist()
+    return undergrad, phd
+
+
+def name_as_written(rng: random.Random, name: str) -> str:
+    """A ranked alias the way a post writes it: title case, shouting, or lower case"""
+    roll = rng.random()
+    if roll < 0.6:
+        return name.title()
+    if roll < 0.7 and len(name) <= 5:
+        return name.upper()
+    return name
+
+
+class Profile:
+    """One applicant, rendered both as post text and as an extracted admissions_data record"""
+
+    def __init__(self, rng: random.Random, undergrad_names: List[str], phd_names: List[str]):
+        self.gpa_out_of = rng.choices([4.0, 4.3, 10.0, 100.0], weights=[80, 5, 10, 5])[0]
+        self.gpa = round(self.gpa_out_of * rng.uniform(0.72, 1.0), 2)
+        self.grad_gpa = round(rng.uniform(3.3, 4.0), 2) if rng.random() < 0.3 else None
+        self.old_gre = rng.random() < 0.1
+        if self.old_gre:
+            self.quant = rng.randrange(650, 801, 10)
+            self.verbal = rng.randrange(400, 801, 10)
+        else:
+            self.quant = rng.randint(155, 170)
+            self.verbal = rng.randint(145, 170)
+        self.writing = rng.choice([3.5, 4.0, 4.5, 5.0, 5.5, 6.0])
+        self.has_gre = rng.random() < 0.85
+
+        self.undergrad = (name_as_written(rng, rng.choice(undergrad_names)) if rng.random() < 0.8
+                          else rng.choice(UNRANKED_SCHOOLS))
+        self.grad = rng.choice(["LSE", "NYU", "Duke", "Toronto", "UPF", "Barcelona GSE"]) if self.grad_gpa else None
+        self.major = rng.choice(MAJORS)
+        self.grad_major = rng.choice(GRAD_MAJORS) if self.grad else None
+        self.courses = rng.sample(COURSES, rng.randint(0, 6))
+        self.research = rng.choice(RESEARCH) if rng.random() < 0.6 else None
+        self.letters = rng.choice(LETTERS) if rng.random() < 0.7 else None
+        self.funding = rng.choice(FUNDING) if rng.random() < 0.4 else None
+        self.publications = rng.choice([0, 0, 0, 1, 2]) if rng.random() < 0.2 else None
+        self.work_years = rng.randint(1, 5) if rng.random() < 0.25 else None
+
+        applied = [name_as_written(rng, name) for name in rng.sample(phd_names, rng.randint(3, 15))]
+        self.applied = applied
+        self.accepted = applied[:rng.randint(0, 3)]
+        rest = applied[len(self.accepted):]
+        self.waitlisted = rest[:rng.randint(0, 1)]
+        self.rejected = rest[len(self.waitlisted):]
+
+    def gre_text(self, rng: random.Random) -> str:
+        if not self.has_gre:
+            return ""
+        style = rng.randrange(3)
+        if style == 0 and not self.old_gre:
+            return f"GRE: {self.quant}/{self.verbal}/{self.writing}"
+        if style == 1:
+            return f"GRE {self.quant}Q, {self.verbal}V, {self.writing} AWA"
+        return f"GRE quant {self.quant}, verbal {self.verbal}, writing {self.writing}"
+
+    def post(self, rng: random.Random) -> str:
+        """The profile as a results post, as a list of fields or as prose"""
+        gpa = f"{self.gpa}/{self.gpa_out_of:g}"
+        if rng.random() < 0.5:
+            lines = [
+                f"Undergrad Institution: {self.undergrad}",
+                f"Major: {self.major}",
+                f"GPA: {gpa}",
+                f"Grad: {self.grad_major} at {self.grad}, GPA {self.grad_gpa}/4.0" if self.grad else "",
+                self.gre_text(rng),
+                f"Math courses: {', '.join(self.courses)}" if self.courses else "",
+                f"Research experience: {self.research}" if self.research else "",
+                f"Letters of recommendation: {self.letters}" if self.letters else "",
+                f"Applied to: {', '.join(self.applied)}",
+                f"Accepted: {', '.join(self.accepted) or 'none'}",
+                f"Waitlisted: {', '.join(self.waitlisted)}" if self.waitlisted else "",
+                f"Rejected: {', '.join(self.rejected)}" if self.rejected else "",
+                f"Funding: {self.funding}" if self.funding else "",
+            ]
+            return "\n".join(line for line in lines if line) + "\n" + rng.choice(CONNECTORS)
+
+        sentences = [
+            f"I graduated from {self.undergrad} with a {self.major} degree and a {gpa} GPA.",
+            f"I then did a {self.grad_major} at {self.grad} (GPA {self.grad_gpa})." if self.grad else "",
+            f"My {self.gre_text(rng)}." if self.has_gre else "",
+            f"For math I took {', '.join(self.courses)}." if self.courses else "",
+            f"Research: {self.research}." if self.research else "",
+            f"Letters came from {self.letters}." if self.letters else "",
+            f"I applied to {len(self.applied)} programs.",
+            f"I was admitted to {', '.join(self.accepted)}" + (f" with {self.funding}." if self.funding else ".")
+            if self.accepted else "No acceptances this year unfortunately.",
+            f"Waitlisted at {', '.join(self.waitlisted)}." if self.waitlisted else "",
+            f"Rejected from {', '.join(self.rejected)}." if self.rejected else "",
+            rng.choice(CONNECTORS),
+        ]
+        return " ".join(s for s in sentences if s)
+
+    def record(self, record_id: int, post_id: int) -> tuple:
+        """The admissions_data row an extraction of the post would produce"""
+        gre = self.has_gre
+        return (
+            record_id, post_id, self.gpa, self.gpa_out_of, self.grad_gpa, 4.0 if self.grad_gpa else None,
+            float(self.quant) if gre else None, float(self.verbal) if gre else None, self.writing if gre else None,
+            self.undergrad, self.grad, self.major, self.grad_major, list(self.courses),
+            self.grad is not None, None if self.research is None else True, self.publications,
+            self.work_years, self.letters, list(self.applied), list(self.accepted), list(self.rejected),
+            list(self.waitlisted), self.funding, 1
+        )
+
+
+def admissions_data(n: int, seed: int = SEED) -> pd.DataFrame:
+    """n admissions_data records, as cleaning reads them from Postgres (NUMERIC as floats)"""
+    rng = random.Random(seed)
+    undergrad_names, phd_names = load_names()
+    rows = [Profile(rng, undergrad_names, phd_names).record(i + 1, i + 1) for i in range(n)]
+    return pd.DataFrame.from_records(rows, columns=ADMISSIONS_COLUMNS)
+
+
+def noise_post(rng: random.Random, kind: str, undergrad_names: List[str]) -> str:
+    if kind == "reply":
+        return rng.choice(REPLIES)
+    return rng.choice(QUESTIONS).format(gpa=round(rng.uniform(3.2, 4.0), 2), q=rng.randint(155, 170),
+                                        school=rng.choice(undergrad_names).title())
+
+
+def forum_posts(n: int, seed: int = SEED) -> pd.DataFrame:
+    """n forum_posts rows grouped into threads and thread pages, as raw_data_upload.py stores them"""
+    rng = random.Random(seed)
+    undergrad_names, phd_names = load_names()
+    kinds = list(NOISE_SHARES) + ["profile"]
+    weights = list(NOISE_SHARES.values()) + [1 - sum(NOISE_SHARES.values())]
+
+    rows = []
+    profiles = []
+    thread_id = 0
+    while len(rows) < n:
+        thread_id += 1
+        offtopic = rng.random() < NOISE_SHARES["offtopic"]
+        title = (rng.choice(OFFTOPIC_TITLES) if offtopic
+                 else rng.choice(PROFILE_TITLES).format(year=rng.randint(2010, 2025)))
+        slug = "-".join(title.lower().replace("(", "").replace(")", "").replace(":", "").replace("?", "").split())
+        url = f"{FORUM_BASE}/forums/topic/{100000 + thread_id}-{slug}/"
+        for position in range(min(rng.randint(1, MAX_POSTS_PER_THREAD), n - len(rows))):
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "repost" and profiles:
+                content = rng.choice(profiles)
+            elif kind in ("reply", "question"):
+                content = noise_post(rng, kind, undergrad_names)
+            else:
+                content = Profile(rng, undergrad_names, phd_names).post(rng)
+                profiles.append(content)
+                if len(profiles) > 1000:
+                    profiles.pop(rng.randrange(len(profiles)))
+            rows.append((len(rows) + 1, title, url, f"user{rng.randint(1, max(n // 5, 10))}",
+                         position // POSTS_PER_THREAD_PAGE + 1, content,
+                         SCRAPED_AT + timedelta(seconds=len(rows))))
+    return pd.DataFrame.from_records(rows, columns=POST_COLUMNS)
+
+
+PAGE_HEAD = """<!DOCTYPE html><html lang="en-US"><head><meta charset="utf-8"><title>{title} - Urch Forums</title>
+<link rel="stylesheet" href="/static/css/framework.css"><script src="/static/js/app.js"></script></head>
+<body class="ipsApp"><div id="ipsLayout_header"><nav class="ipsNavBar">""" + "".join(
+    f'<a href="/forums/section/{i}/" class="ipsNavBar_item">Section {i}</a>' for i in range(20)
+) + """</nav></div><div id="ipsLayout_body"><main id="ipsLayout_mainArea">"""
+PAGE_FOOT = """</main></div><footer id="ipsLayout_footer"><ul class="ipsList_inline">""" + "".join(
+    f'<li><a href="/help/{i}/">Help topic {i}</a></li>' for i in range(15)
+) + "</ul></footer></body></html>"
+
+
+def pagination(next_url: str) -> str:
+    return f'<ul class="ipsPagination"><li><a rel="next" href="{next_url}">Next</a></li></ul>' if next_url else ""
+
+
+def forum_pages(posts: pd.DataFrame) -> Iterator[Tuple[str, str]]:
+    """(url, html) of the forum listing pages linking every thread of posts"""
+    threads = posts.drop_duplicates("thread_url")[["thread_title", "thread_url"]].to_records(index=False)
+    pages = range(0, len(threads), THREADS_PER_FORUM_PAGE)
+    for number, start in enumerate(pages, 1):
+        items = "".join(
+            f'<li class="ipsDataItem" data-rowid="{start + i}"><div class="ipsDataItem_main">'
+            f'<h4 class="ipsDataItem_title"><a href="{html.escape(url[len(FORUM_BASE):])}">{html.escape(title)}</a></h4>'
+            f'<p class="ipsType_light">Started by user{start + i}</p></div></li>'
+            for i, (title, url) in enumerate(threads[start:start + THREADS_PER_FORUM_PAGE])
+        )
+        next_url = f"/forums/?page={number + 1}" if number < len(pages) else None
+        yield (f"{FORUM_BASE}/forums/?page={number}",
+               PAGE_HEAD.format(title="PhD Economics") + f'<ol class="ipsDataList">{items}</ol>'
+               + pagination(next_url) + PAGE_FOOT)
+
+
+def thread_pages(posts: pd.DataFrame) -> Iterator[Tuple[str, str]]:
+    """(url, html) of every thread page, each with its posts as comment articles"""
+    for (url, page), group in posts.groupby(["thread_url", "page"], sort=False):
+        articles = "".join(
+            f'<article class="ipsComment" id="elComment_{post_id}" data-comment-id="{post_id}">'
+            f'<aside class="ipsComment_author"><h3><a href="/profile/{html.escape(author)}/">{html.escape(author)}</a></h3>'
+            f'<span class="ipsType_light">Members</span></aside><div class="ipsComment_content">'
+            + "".join(f"<p>{html.escape(line)}</p>" for line in content.split("\n"))
+            + '</div></article>'
+            for post_id, author, content in zip(group["id"], group["author"], group["post_content"])
+        )
+        page_url = url if page == 1 else f"{url}page/{page}/"
+        yield page_url, (PAGE_HEAD.format(title=html.escape(group["thread_title"].iloc[0]))
+                         + f'<div class="ipsComment_list">{articles}</div>' + PAGE_FOOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic forum and admissions corpus")
+    parser.add_argument("rows", type=int, help="forum posts and admissions records to generate")
+    parser.add_argument("--out", default="corpus", help="output folder")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--html", action="store_true", help="also write the forum and thread pages")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    posts = forum_posts(args.rows, args.seed)
+    posts.rename(columns={"post_content": "post"})[SCRAPED_COLUMNS].to_csv(out / "forum_posts.csv", index=False)
+    admissions_data(args.rows, args.seed).to_csv(out / "admissions_data.csv", index=False)
+
+    if args.html:
+        (out / "html").mkdir(exist_ok=True)
+        pages = 0
+        for pages, (_, page) in enumerate(chain(forum_pages(posts), thread_pages(posts)), 1):
+            (out / "html" / f"page_{pages:07d}.html").write_text(page, encoding="utf-8")
+        print(f"{pages:,} pages")
+    print(f"Wrote {args.rows:,} forum posts and admissions records to {out}")
+
+
+if __name__ == "__main__":
+    main()
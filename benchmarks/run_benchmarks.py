@@ -0,0 +1,295 @@
+"""
+Timing and memory benchmarks for the pipeline stages, on the synthetic corpus of corpus.py:
+
+    html_parsing  forum and thread pages through scraping.py's parsers (BeautifulSoup)
+    filtering     forum_posts rows through filtering.filter_posts
+    extraction    posts through preprocessing, the rule-based pre-extractor, the mock
+                  backend in place of the LLM, response parsing and the COPY encoding
+    cleaning      admissions_data records through cleaning.clean_frame
+    dashboard     the dashboard's summary and placement queries for a set of filters,
+                  on the pooled, prepared-statement path (needs --database)
+
+Inputs are built before the clock starts. Each benchmark is timed --repeat times (median and
+best are kept) and run once more under tracemalloc for its peak Python allocation. Results go
+to benchmarks/results/<time>-<rows>.json with the commit and machine they were measured on
+
+    python benchmarks/run_benchmarks.py                           # 10k rows, no database
+    python benchmarks/run_benchmarks.py --rows 1000000 --repeat 1 cleaning filtering
+    python benchmarks/run_benchmarks.py --database admissions_bench  # adds the dashboard queries
+    python benchmarks/run_benchmarks.py --compare                 # against the last run at the same scale
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+
+--database names a scratch database on the DB_* server: its admissions_data, cleaned and
+outcome tables are replaced by the synthetic ones. With --compare, a benchmark whose median
+time or peak memory grew by more than --threshold is reported and the exit code is 1
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from pathlib import Path
+from typing import Callable, NamedTuple, List, Dict
+
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+for folder in ("Scraping", "Filtering", "Tools Call", "cleaning-visualization"):
+    sys.path.insert(0, str(ROOT / folder))
+sys.path.insert(0, str(ROOT))
+
+from corpus import SEED, forum_posts, admissions_data, forum_pages, thread_pages
+from scraping import parse_forum_page, parse_thread_page
+from filtering import filter_posts
+from preprocessing import QuoteFilter, prepare_posts
+from gpt_tools_call import process_batch, create_admissions_table
+from db_writer import encode_record
+from cleaning import clean_frame, CLEANING_RULES_HASH
+from cleaned_writer import copy_frame, write_cleaned_table
+from shared.db import connection, close_pools
+
+ROWS = 10000
+REPEAT = 3
+THRESHOLD = 0.2
+MB = 1024 ** 2
+
+# Sidebar settings a dashboard session goes through: none, each filter kind, and all at once
+NO_FILTERS = {
+    'gpa_range': (0.0, 4.0), 'gre_quant_range': (130, 170), 'gre_verbal_range': (130, 170),
+    'undergrad_rank': None, 'econ_major': False, 'has_grad_program': False, 'has_calculus': False,
+    'has_linear_algebra': False, 'has_real_analysis': False, 'has_research': False
+}
+FILTER_SETS = [
+    NO_FILTERS,
+    {**NO_FILTERS, 'gpa_range': (3.5, 4.0)},
+    {**NO_FILTERS, 'gre_quant_range': (160, 170), 'gre_verbal_range': (150, 170)},
+    {**NO_FILTERS, 'undergrad_rank': [1, 2]},
+    {**NO_FILTERS, 'has_calculus': True, 'has_linear_algebra': True, 'has_real_analysis': True},
+    {**NO_FILTERS, 'has_research': True, 'econ_major': True, 'has_grad_program': True},
+    {**NO_FILTERS, 'gpa_range': (3.7, 4.0), 'gre_quant_range': (165, 170), 'undergrad_rank': [1],
+     'has_real_analysis': True, 'has_research': True},
+]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable  # (rows, seed) -> input, built outside the timing
+    run: Callable  # input -> rows processed
+    database: bool = False
+
+
+def html_input(rows: int, seed: int) -> List[tuple]:
+    posts = forum_posts(rows, seed)
+    return [("forum", page) for _, page in forum_pages(posts)] + [("thread", page) for _, page in thread_pages(posts)]
+
+
+def parse_pages(pages: List[tuple]) -> int:
+    posts = 0
+    for kind, page in pages:
+        soup = BeautifulSoup(page, "html.parser")
+        if kind == "forum":
+            parse_forum_page(soup)
+        else:
+            posts += len(parse_thread_page(soup))
+    return posts
+
+
+def run_filtering(posts) -> int:
+    filter_posts(posts.copy())
+    return len(posts)
+
+
+def run_extraction(posts) -> int:
+    """Every post, not just the filtered ones, so the work grows with the corpus"""
+    requests = prepare_posts(posts, QuoteFilter())
+    successes, _, _ = asyncio.run(process_batch(requests, 64, backend_name="mock"))
+    for record in successes:
+        encode_record(record)
+    return len(posts)
+
+
+def run_cleaning(records) -> int:
+    clean_frame(records.copy())
+    return len(records)
+
+
+def dashboard_input(rows: int, seed: int) -> List[dict]:
+    """Load the synthetic records into the scratch database, cleaned as cleaning.py writes them"""
+    # The dashboard module calls st.* on import, which warns outside `streamlit run`
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+    import visualization  # noqa: F401
+
+    records = admissions_data(rows, seed)
+    cleaned, outcomes = clean_frame(records.copy())
+    with connection() as conn:
+        create_admissions_table(conn)
+        copy_frame(conn, records, "admissions_data")
+        conn.commit()
+        write_cleaned_table(conn, cleaned, outcomes, CLEANING_RULES_HASH)
+        cursor = conn.cursor()
+        cursor.execute("ANALYZE admissions_data_cleaned")
+        conn.commit()
+        cursor.close()
+    return FILTER_SETS
+
+
+def run_dashboard(filter_sets: List[dict]) -> int:
+    from visualization import build_sql_query, get_placement_by_tier, run_query
+
+    for filters in filter_sets:
+        run_query(*build_sql_query(filters))
+        get_placement_by_tier(filters)
+    return 2 * len(filter_sets)
+
+
+BENCHMARKS = [
+    Benchmark("html_parsing", html_input, parse_pages),
+    Benchmark("filtering", forum_posts, run_filtering),
+    Benchmark("extraction", forum_posts, run_extraction),
+    Benchmark("cleaning", admissions_data, run_cleaning),
+    Benchmark("dashboard", dashboard_input, run_dashboard, database=True),
+]
+
+
+def measure(benchmark: Benchmark, rows: int, seed: int, repeat: int, memory: bool = True) -> Dict:
+    data = benchmark.setup(rows, seed)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processed = benchmark.run(data)
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        benchmark.run(data)
+        peak = tracemalloc.get_traced_memory()[1] / MB
+        tracemalloc.stop()
+
+    seconds = statistics.median(times)
+    return {
+        "benchmark": benchmark.name,
+        "rows": processed,
+        "seconds": seconds,
+        "best_seconds": min(times),
+        "rows_per_sec": processed / seconds if seconds > 0 else 0.0,
+        "peak_mb": peak,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(run: Dict) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    path = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{run['scale']}.json"
+    path.write_text(json.dumps(run, indent=2))
+    return path
+
+
+def latest_result(scale: int, exclude: Path = None) -> Path:
+    """Most recent saved run at the same scale, None when there is none"""
+    candidates = sorted(p for p in RESULTS_DIR.glob(f"*-{scale}.json") if p != exclude)
+    return candidates[-1] if candidates else None
+
+
+def compare(run: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print the change against the baseline per benchmark; returns the regressed benchmarks"""
+    before = {r["benchmark"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline['created_at']} (commit {baseline.get('commit')}, {baseline['scale']:,} rows):")
+    print(f"{'benchmark':<14}{'seconds':>10}{'was':>10}{'change':>9}{'peak MB':>10}{'was':>10}{'change':>9}")
+    for result in run["results"]:
+        old = before.get(result["benchmark"])
+        if old is None:
+            print(f"{result['benchmark']:<14}{result['seconds']:>10.3f}{'-':>10}")
+            continue
+        time_change = result["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        memory_change = (result["peak_mb"] / old["peak_mb"] - 1
+                         if result["peak_mb"] is not None and old.get("peak_mb") else None)
+        regressed = time_change > threshold or (memory_change is not None and memory_change > threshold)
+        if regressed:
+            regressions.append(result["benchmark"])
+        memory = (f"{result['peak_mb']:>10.1f}{old['peak_mb']:>10.1f}{memory_change:>+9.0%}"
+                  if memory_change is not None else "")
+        print(f"{result['benchmark']:<14}{result['seconds']:>10.3f}{old['seconds']:>10.3f}{time_change:>+9.0%}"
+              f"{memory}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    names = [benchmark.name for benchmark in BENCHMARKS]
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on a synthetic corpus")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"benchmarks to run (default: all of {', '.join(names)})")
+    parser.add_argument("--rows", type=int, default=ROWS, help="forum posts / admissions records to generate")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per benchmark")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--database", help="scratch database for the dashboard benchmark (its tables are replaced)")
+    parser.add_argument("--compare", nargs="?", const="latest", metavar="RESULT",
+                        help="result file to compare against (default: the last run at the same scale)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown or memory growth reported as a regression")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(names)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    selected = [b for b in BENCHMARKS if not args.benchmarks or b.name in args.benchmarks]
+    if args.database:
+        # shared.db has loaded the .env of the working directory
+        if args.database == os.environ.get("DB_NAME"):
+            parser.error(f"{args.database} is the pipeline's database, its tables would be replaced")
+        os.environ["DB_NAME"] = args.database
+    else:
+        skipped = [b.name for b in selected if b.database]
+        if skipped:
+            print(f"Skipping {', '.join(skipped)} (no --database)")
+        selected = [b for b in selected if not b.database]
+
+    run = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "scale": args.rows,
+        "seed": args.seed,
+        "results": [],
+    }
+    for benchmark in selected:
+        result = measure(benchmark, args.rows, args.seed, args.repeat, not args.no_memory)
+        run["results"].append(result)
+        peak = f", peak {result['peak_mb']:.1f} MB" if result["peak_mb"] is not None else ""
+        print(f"{benchmark.name}: {result['seconds']:.3f}s ({result['rows_per_sec']:,.0f} rows/s){peak}")
+    close_pools()
+
+    path = save_results(run)
+    print(f"Saved {path.relative_to(ROOT)}")
+
+    if args.compare:
+        baseline_path = latest_result(args.rows, exclude=path) if args.compare == "latest" else Path(args.compare)
+        if baseline_path is None:
+            print(f"No earlier run at {args.rows:,} rows to compare against")
+            return
+        regressions = compare(run, json.loads(baseline_path.read_text()), args.threshold)
+        if regressions:
+            print(f"\nSlower or larger by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
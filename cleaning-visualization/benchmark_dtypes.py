@@ -0,0 +1,83 @@
+"""
+Memory report for the compact dtypes of the cleaned DataFrame:
+admissions_data replicated 1x, 10x and 100x is cleaned with and without
+CLEANED_DTYPES / OUTCOME_DTYPES, and the deep memory use of both is compared
+column by column (values are checked to be unchanged by the casts)
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from cleaning import connect, release, clean_frame, create_alias_table
+from cleaned_writer import CLEANED_DTYPES, memory_report
+
+SCALES = [1, 10, 100]
+MB = 1024 ** 2
+
+
+def value_mismatches(untyped, typed):
+    """Rows per typed column whose value changed in the cast (nulls compare equal)"""
+    mismatches = {}
+    for col, dtype in CLEANED_DTYPES.items():
+        if col not in typed:
+            continue
+        if dtype == 'category':
+            a = untyped[col].map(str, na_action='ignore').astype(object)
+            b = typed[col].astype(object)
+            same = (a == b) | (a.isna() & b.isna())
+        else:
+            a = pd.to_numeric(untyped[col], errors='coerce').astype(float).to_numpy()
+            b = typed[col].astype(float).to_numpy()
+            same = np.isclose(a, b, rtol=1e-6, equal_nan=True)
+        mismatches[col] = int((~np.asarray(same)).sum())
+    return mismatches
+
+
+def main():
+    scales = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else SCALES
+
+    conn = connect()
+    base = pd.read_sql("SELECT * FROM admissions_data", conn)
+    create_alias_table(conn)
+
+    untyped, untyped_outcomes = clean_frame(base, conn, typed=False)
+    typed, typed_outcomes = clean_frame(base, conn)
+    release(conn)
+
+    mismatches = value_mismatches(untyped, typed)
+    changed = {col: count for col, count in mismatches.items() if count}
+    print(f"Values on {len(base):,} rows: {'unchanged' if not changed else changed}")
+
+    report = memory_report(untyped, typed)
+    report[['before_bytes', 'after_bytes']] = report[['before_bytes', 'after_bytes']] / MB
+    print("\nadmissions_data_cleaned (MB):")
+    print(report.rename(columns={'before_bytes': 'before_mb', 'after_bytes': 'after_mb'}).round(3).to_string())
+
+    rows = []
+    for scale in scales:
+        frames = memory_report(pd.concat([untyped] * scale, ignore_index=True),
+                               pd.concat([typed] * scale, ignore_index=True)).loc['total']
+        outcomes = memory_report(pd.concat([untyped_outcomes] * scale, ignore_index=True),
+                                 pd.concat([typed_outcomes] * scale, ignore_index=True)).loc['total']
+        rows.append({
+            'scale': f'{scale}x',
+            'rows': len(base) * scale,
+            'cleaned_before_mb': frames['before_bytes'] / MB,
+            'cleaned_after_mb': frames['after_bytes'] / MB,
+            'outcomes_before_mb': outcomes['before_bytes'] / MB,
+            'outcomes_after_mb': outcomes['after_bytes'] / MB,
+            'reduction': 1 - (frames['after_bytes'] + outcomes['after_bytes'])
+                         / (frames['before_bytes'] + outcomes['before_bytes']),
+        })
+
+    print("\nTotals:")
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+    if changed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
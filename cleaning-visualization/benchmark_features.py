@@ -0,0 +1,77 @@
+"""
+Parity check and benchmark for the vectorized feature engineering in cleaning.py:
+add_features must give the same values as the row-wise add_features_rowwise,
+then both are timed on admissions_data replicated 1x, 10x and 100x
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import connect, release, add_features, add_features_rowwise
+
+FEATURE_COLUMNS = [
+    'undergrad_gpa_std', 'grad_gpa_std', 'attended_grad_program',
+    'taken_calculus', 'taken_linear_algebra', 'taken_real_analysis',
+    'gre_quant_std', 'gre_verbal_std', 'gmat_quant', 'gmat_verbal', 'gmat_writing',
+    'undergrad_econ_related', 'academic_lor', 'research_lor', 'professional_lor',
+    'got_phd_offer', 'phd_course_taken', 'research_experience',
+]
+SCALES = [1, 10, 100]
+
+
+def feature_mismatches(expected, actual):
+    """Rows per feature column where the two results differ (nulls compare equal)"""
+    mismatches = {}
+    for col in FEATURE_COLUMNS:
+        a = pd.to_numeric(expected[col], errors='coerce').astype(float).to_numpy()
+        b = pd.to_numeric(actual[col], errors='coerce').astype(float).to_numpy()
+        same = (a == b) | (np.isnan(a) & np.isnan(b))
+        mismatches[col] = int((~same).sum())
+    return mismatches
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    scales = [int(s) for s in sys.argv[1].split(',')] if len(sys.argv) > 1 else SCALES
+
+    conn = connect()
+    base = pd.read_sql("SELECT * FROM admissions_data", conn)
+    release(conn)
+
+    expected = add_features_rowwise(base)
+    actual = add_features(base)
+    mismatches = feature_mismatches(expected, actual)
+    print(f"Parity on {len(base):,} rows:")
+    for col, count in mismatches.items():
+        print(f"  {col}: {'ok' if count == 0 else f'{count:,} rows differ'}")
+
+    rows = []
+    for scale in scales:
+        df = pd.concat([base] * scale, ignore_index=True)
+        _, rowwise_time = timed(add_features_rowwise, df)
+        _, vectorized_time = timed(add_features, df)
+        rows.append({
+            'scale': f'{scale}x',
+            'rows': len(df),
+            'rowwise_s': rowwise_time,
+            'vectorized_s': vectorized_time,
+            'speedup': rowwise_time / vectorized_time if vectorized_time > 0 else np.nan,
+        })
+
+    print("\nTiming:")
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+    if any(mismatches.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
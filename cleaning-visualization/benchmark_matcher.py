@@ -0,0 +1,70 @@
+"""
+Parity check and benchmark for the indexed institution matcher in cleaning.py:
+every institution string in admissions_data is matched against both rankings with
+match_university and the linear-scan match_university_scan
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import (connect, release, GLOBAL_UNDERGRAD_RANKINGS, PHD_ECON_RANKINGS,
+                      match_university, match_university_scan)
+
+SCHOOL_COLUMNS = ['schools_applied', 'schools_accepted', 'schools_rejected', 'schools_waitlisted']
+
+
+def institution_names(df):
+    """Every institution string as it is passed to the matcher (repeats included)"""
+    names = list(df['undergrad_institution'].dropna()) + list(df['grad_institution'].dropna())
+    for col in SCHOOL_COLUMNS:
+        names.extend(df[col].explode().dropna())
+    return [str(name) for name in names]
+
+
+def time_lookups(func, names, rankings):
+    """Results and per-lookup latencies in microseconds"""
+    results = []
+    latencies = np.empty(len(names))
+    for i, name in enumerate(names):
+        start = time.perf_counter()
+        results.append(func(name, rankings))
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return results, latencies
+
+
+def main():
+    conn = connect()
+    df = pd.read_sql("SELECT * FROM admissions_data", conn)
+    release(conn)
+
+    names = institution_names(df)
+    print(f"{len(names):,} institution strings ({len(set(names)):,} unique)")
+
+    rows = []
+    mismatches = 0
+    for label, rankings in (('undergrad', GLOBAL_UNDERGRAD_RANKINGS), ('phd', PHD_ECON_RANKINGS)):
+        expected, scan_us = time_lookups(match_university_scan, names, rankings)
+        actual, index_us = time_lookups(match_university, names, rankings)
+        differing = sum(e != a for e, a in zip(expected, actual))
+        mismatches += differing
+        rows.append({
+            'rankings': label,
+            'mismatches': differing,
+            'scan_mean_us': scan_us.mean(),
+            'scan_p99_us': np.percentile(scan_us, 99),
+            'index_mean_us': index_us.mean(),
+            'index_p99_us': np.percentile(index_us, 99),
+            'speedup': scan_us.sum() / index_us.sum(),
+        })
+
+    print(pd.DataFrame(rows).round(2).to_string(index=False))
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark and parity check for the compiled rule matchers in cleaning.py:
+random texts built from each rule set's own patterns are scored with the one-pass
+RuleMatcher and with the original pattern-by-pattern checks (no database needed)
+"""
+
+import sys
+import time
+import random
+
+import numpy as np
+import pandas as pd
+
+from cleaning import (RANK_TEXT_RULES, CALCULUS_PATTERNS, LINEAR_ALGEBRA_PATTERNS, REAL_ANALYSIS_PATTERNS,
+                      ACADEMIC_LOR_PATTERNS, PROFESSIONAL_LOR_PATTERNS, ECON_MAJOR_PATTERNS,
+                      RANK_TEXT_MATCHER, COURSE_MATCHER, LOR_MATCHER, ECON_MATCHER,
+                      extract_rank_from_text, extract_rank_from_text_scan,
+                      has_calculus, has_linear_algebra, has_real_analysis, categorize_lor, is_econ_related)
+
+TEXTS = 50000
+FILLER = ['university', 'state', 'of', 'the', 'course', 'intro', 'top', 'tier', 'lac', 'public', '1', '#', 'r', '-']
+
+
+def random_texts(patterns, n, seed=0):
+    """Texts mixing 0-3 patterns with filler words, so both hits and overlaps occur"""
+    rng = random.Random(seed)
+    patterns = sorted(set(patterns))
+    texts = []
+    for _ in range(n):
+        parts = rng.sample(patterns, rng.randint(0, 3)) + rng.sample(FILLER, rng.randint(1, 5))
+        rng.shuffle(parts)
+        texts.append(rng.choice([' ', '', ', ']).join(parts))
+    return texts
+
+
+def courses_scan(text):
+    return (has_calculus(text), has_linear_algebra(text), has_real_analysis(text))
+
+
+def courses_compiled(text):
+    found = COURSE_MATCHER.labels(text)
+    return tuple(int(name in found) for name in ('taken_calculus', 'taken_linear_algebra', 'taken_real_analysis'))
+
+
+def lor_compiled(text):
+    found = LOR_MATCHER.labels(text)
+    academic = int('academic' in found)
+    return {'academic_lor': academic, 'research_lor': 0, 'professional_lor': 1 - academic}
+
+
+# (rule set, patterns, original per-text check, one-pass per-text check, one-pass column check)
+CASES = [
+    ('rank_from_text', [p for rule in RANK_TEXT_RULES for patterns in rule[1:] for p in patterns],
+     extract_rank_from_text_scan, extract_rank_from_text, RANK_TEXT_MATCHER.first_column),
+    ('math_courses', CALCULUS_PATTERNS + LINEAR_ALGEBRA_PATTERNS + REAL_ANALYSIS_PATTERNS,
+     courses_scan, courses_compiled, COURSE_MATCHER.flags_column),
+    ('letters_of_rec', ACADEMIC_LOR_PATTERNS + PROFESSIONAL_LOR_PATTERNS,
+     categorize_lor, lor_compiled, LOR_MATCHER.flags_column),
+    ('undergrad_major', ECON_MAJOR_PATTERNS,
+     is_econ_related, lambda text: int(bool(ECON_MATCHER.labels(text))), ECON_MATCHER.flags_column),
+]
+
+
+def timed(func, texts):
+    start = time.perf_counter()
+    results = [func(text) for text in texts]
+    return results, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else TEXTS
+
+    rows = []
+    for i, (name, patterns, scan, compiled, column) in enumerate(CASES):
+        texts = random_texts(patterns, n, seed=i)
+        expected, scan_s = timed(scan, texts)
+        actual, compiled_s = timed(compiled, texts)
+        # Column-wise on a column with repeats, as free-text fields are in admissions_data
+        repeated = pd.Series(texts[:max(n // 10, 1)] * 10)
+        start = time.perf_counter()
+        column(repeated)
+        column_s = time.perf_counter() - start
+        rows.append({
+            'rule_set': name,
+            'patterns': len(set(patterns)),
+            'mismatches': sum(e != a for e, a in zip(expected, actual)),
+            'scan_us': scan_s / n * 1e6,
+            'compiled_us': compiled_s / n * 1e6,
+            'speedup': scan_s / compiled_s if compiled_s > 0 else np.nan,
+            'column_us': column_s / len(repeated) * 1e6,
+        })
+
+    report = pd.DataFrame(rows)
+    print(f"{n:,} texts per rule set, mean microseconds per text:")
+    print(report.round(2).to_string(index=False))
+
+    if report['mismatches'].any():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Bulk writer for admissions_data_cleaned:
+Columns are encoded for the COPY text format whole-column at a time (NaN -> NULL,
+lists -> Postgres array literals), streamed into a staging table and swapped in
+with a rename in one transaction, so readers never see a missing or partial table.
+The hash of the rules that produced the rows is kept as the table comment, and
+incremental runs replace only changed rows. The applicant_school_outcome fact table
+(one row per applicant, listed school and outcome) is written alongside.
+CLEANED_DTYPES and OUTCOME_DTYPES are the matching compact pandas dtypes
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import copy_in, copy_out_csv
+
+TABLE = "admissions_data_cleaned"
+STAGING_TABLE = f"{TABLE}_staging"
+CHANGES_TABLE = f"{TABLE}_changes"
+# Per-school fact table derived from the schools_* arrays, rebuilt and merged with the cleaned table
+OUTCOME_TABLE = "applicant_school_outcome"
+OUTCOME_STAGING_TABLE = f"{OUTCOME_TABLE}_staging"
+OUTCOME_CHANGES_TABLE = f"{OUTCOME_TABLE}_changes"
+NULL = "\\N"
+
+# Feature columns added to the admissions_data columns, in table order. Flags stay 0/1
+# SMALLINT rather than BOOLEAN so SQL such as "taken_calculus = 1" keeps working
+FEATURE_COLUMN_TYPES = [
+    ("undergrad_gpa_std", "DECIMAL(3,2)"),
+    ("grad_gpa_std", "DECIMAL(3,2)"),
+    ("attended_grad_program", "SMALLINT"),
+    ("taken_calculus", "SMALLINT"),
+    ("taken_linear_algebra", "SMALLINT"),
+    ("taken_real_analysis", "SMALLINT"),
+    ("gre_quant_std", "SMALLINT"),
+    ("gre_verbal_std", "SMALLINT"),
+    ("gmat_quant", "SMALLINT"),
+    ("gmat_verbal", "SMALLINT"),
+    ("gmat_writing", "DECIMAL(3,1)"),
+    ("undergrad_econ_related", "SMALLINT"),
+    ("academic_lor", "SMALLINT"),
+    ("research_lor", "SMALLINT"),
+    ("professional_lor", "SMALLINT"),
+    ("got_phd_offer", "SMALLINT"),
+    ("undergrad_rank", "SMALLINT"),
+    ("phd_accepted_rank", "SMALLINT"),
+]
+
+# applicant_id is admissions_data.id; institution_id is institution_rankings.institution_id,
+# NULL when the school is not in the rankings (school keeps the name as listed)
+OUTCOME_COLUMN_TYPES = [
+    ("applicant_id", "INTEGER"),
+    ("institution_id", "INTEGER"),
+    ("outcome", "TEXT"),
+    ("rank", "SMALLINT"),
+    ("school", "TEXT"),
+]
+
+FLAG = "Int8"
+SCORE = "float32"
+NAME = "category"
+
+# pandas dtypes of the cleaned rows, applied by clean_frame. Nullable integer and boolean
+# dtypes keep missing values without falling back to float64 or object columns; columns
+# not listed (ids, free text, arrays, timestamps) keep the dtype they were read with
+CLEANED_DTYPES = {
+    "undergrad_gpa": SCORE,
+    "undergrad_gpa_out_of": SCORE,
+    "grad_gpa": SCORE,
+    "grad_gpa_out_of": SCORE,
+    "gre_quant": "Int16",
+    "gre_verbal": "Int16",
+    "gre_writing": SCORE,
+    "undergrad_institution": NAME,
+    "grad_institution": NAME,
+    "undergrad_major": NAME,
+    "grad_major": NAME,
+    "phd_course_taken": "boolean",
+    "research_experience": "boolean",
+    "publications": "Int16",
+    "work_experience_years": "Int16",
+    "funding_status": NAME,
+    "schema_version": "Int16",
+    "undergrad_gpa_std": SCORE,
+    "grad_gpa_std": SCORE,
+    "attended_grad_program": FLAG,
+    "taken_calculus": FLAG,
+    "taken_linear_algebra": FLAG,
+    "taken_real_analysis": FLAG,
+    "gre_quant_std": "Int16",
+    "gre_verbal_std": "Int16",
+    "gmat_quant": "Int16",
+    "gmat_verbal": "Int16",
+    "gmat_writing": SCORE,
+    "undergrad_econ_related": FLAG,
+    "academic_lor": FLAG,
+    "research_lor": FLAG,
+    "professional_lor": FLAG,
+    "got_phd_offer": FLAG,
+    "undergrad_rank": FLAG,
+    "phd_accepted_rank": FLAG,
+}
+
+OUTCOME_DTYPES = {
+    "applicant_id": "Int32",
+    "institution_id": "Int32",
+    "outcome": NAME,
+    "rank": FLAG,
+    "school": NAME,
+}
+
+def apply_dtypes(df: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """Cast the columns of df listed in dtypes; numbers are coerced and integers rounded first"""
+    df = df.copy()
+    for col, dtype in dtypes.items():
+        if col not in df:
+            continue
+        values = df[col]
+        if dtype == NAME:
+            values = values.map(str, na_action="ignore").astype(dtype)
+        else:
+            values = pd.to_numeric(values, errors="coerce")
+            if dtype not in (SCORE, "boolean"):
+                values = values.round()
+            values = values.astype(dtype)
+        df[col] = values
+    return df
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Deep memory use per column of the same rows before and after apply_dtypes"""
+    report = pd.DataFrame({
+        "before_dtype": before.dtypes.astype(str),
+        "after_dtype": after.dtypes.reindex(before.columns).astype(str),
+        "before_bytes": before.memory_usage(deep=True, index=False),
+        "after_bytes": after.memory_usage(deep=True, index=False).reindex(before.columns),
+    })
+    report.loc["total"] = ["", "", report["before_bytes"].sum(), report["after_bytes"].sum()]
+    report["reduction"] = 1 - report["after_bytes"] / report["before_bytes"]
+    return report
+
+
+# information_schema data_type -> encoding
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+NUMBER_TYPES = {"numeric", "real", "double precision"}
+
+# COPY text format escapes, backslash first
+COPY_ESCAPES = [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r"), ("\x00", "")]
+
+
+def escape_copy_column(text: pd.Series) -> pd.Series:
+    for old, new in COPY_ESCAPES:
+        text = text.str.replace(old, new, regex=False)
+    return text
+
+
+def array_literal(items) -> str:
+    """Postgres array literal, every element quoted and None as NULL"""
+    quoted = ("NULL" if item is None else '"' + str(item).replace("\\", "\\\\").replace('"', '\\"') + '"'
+              for item in items)
+    return "{" + ",".join(quoted) + "}"
+
+
+def encode_column(series: pd.Series, data_type: str) -> pd.Series:
+    """One column as COPY text fields, nulls as \\N"""
+    if data_type == "ARRAY":
+        text = series.map(lambda v: array_literal(list(v)) if isinstance(v, (list, np.ndarray)) else None)
+        return escape_copy_column(text).fillna(NULL)
+
+    if data_type in INTEGER_TYPES or data_type in NUMBER_TYPES:
+        values = pd.to_numeric(series, errors="coerce")
+        # float32 columns print at their own precision (3.7, not 3.700000047683716)
+        values = values.astype(np.float32 if values.dtype == np.float32 else float)
+        null = ~np.isfinite(values.to_numpy())
+        if data_type in INTEGER_TYPES:
+            text = values.fillna(0).round().astype(np.int64).astype(str)
+        else:
+            text = values.astype(str)
+        return text.mask(null, NULL)
+
+    if data_type == "boolean":
+        # 1/0 and numpy bools hash like True/False
+        return series.map({True: "t", False: "f"}).fillna(NULL)
+
+    # object even when every value is null (or the column is categorical)
+    return escape_copy_column(series.map(str, na_action="ignore").astype(object)).fillna(NULL)
+
+
+def column_types(conn, table: str) -> dict:
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s",
+        (table,)
+    )
+    types = dict(cursor.fetchall())
+    cursor.close()
+    return types
+
+
+def copy_frame(conn, df: pd.DataFrame, table: str, chunk_size: int = 50000, types: dict = None):
+    """COPY a DataFrame into an existing table, chunk by chunk (does not commit)"""
+    types = types or column_types(conn, table)
+    columns = list(df.columns)
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        fields = [encode_column(chunk[col], types[col]) for col in columns]
+        lines = fields[0].str.cat(fields[1:], sep="\t") if len(fields) > 1 else fields[0]
+        copy_in(conn, table, "\n".join(lines) + "\n", columns)
+
+
+def cleaned_rules_hash(conn):
+    """Rules hash recorded on admissions_data_cleaned, None when the table does not exist"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT obj_description(to_regclass(%s), 'pg_class')", (TABLE,))
+    comment = cursor.fetchone()[0]
+    cursor.close()
+    return comment
+
+
+def create_outcome_table(cursor, table: str):
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(f"CREATE TABLE {table} (" + ", ".join(f"{name} {sql_type}" for name, sql_type in OUTCOME_COLUMN_TYPES) + ")")
+
+
+def create_staging_table(conn, source: str = "admissions_data"):
+    """Empty staging tables: source columns plus the feature columns, and school outcomes"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    cursor.execute(f"CREATE TABLE {STAGING_TABLE} AS SELECT * FROM {source} WHERE 1=0")
+    cursor.execute(
+        f"ALTER TABLE {STAGING_TABLE} "
+        + ", ".join(f"ADD COLUMN {name} {sql_type}" for name, sql_type in FEATURE_COLUMN_TYPES)
+    )
+    create_outcome_table(cursor, OUTCOME_STAGING_TABLE)
+    conn.commit()
+    cursor.close()
+
+
+def swap_in_staging(conn, rules_hash: str = None):
+    """Index the filled staging tables and rename them over the cleaned and outcome tables"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE INDEX ON {STAGING_TABLE} (id)")
+        cursor.execute(f"CREATE INDEX ON {OUTCOME_STAGING_TABLE} (institution_id, outcome)")
+        cursor.execute(f"CREATE INDEX ON {OUTCOME_STAGING_TABLE} (applicant_id)")
+        cursor.execute(f"COMMENT ON TABLE {STAGING_TABLE} IS %s", (rules_hash,))
+        # DROP and RENAME commit together; concurrent readers wait on the lock instead of failing
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE} CASCADE")
+        cursor.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO {TABLE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {OUTCOME_TABLE} CASCADE")
+        cursor.execute(f"ALTER TABLE {OUTCOME_STAGING_TABLE} RENAME TO {OUTCOME_TABLE}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def write_cleaned_table(conn, df: pd.DataFrame, outcomes: pd.DataFrame, rules_hash: str = None,
+                        source: str = "admissions_data"):
+    """Build the cleaned and outcome tables under staging names, then swap them in atomically"""
+    create_staging_table(conn, source)
+    try:
+        copy_frame(conn, df, STAGING_TABLE)
+        copy_frame(conn, outcomes, OUTCOME_STAGING_TABLE)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    swap_in_staging(conn, rules_hash)
+
+
+def create_changes_table(conn):
+    """Empty tables collecting recomputed rows until merge_changes (filled from any connection)"""
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {CHANGES_TABLE}")
+    cursor.execute(f"CREATE UNLOGGED TABLE {CHANGES_TABLE} (LIKE {TABLE})")
+    cursor.execute(f"DROP TABLE IF EXISTS {OUTCOME_CHANGES_TABLE}")
+    cursor.execute(f"CREATE UNLOGGED TABLE {OUTCOME_CHANGES_TABLE} (LIKE {OUTCOME_TABLE})")
+    conn.commit()
+    cursor.close()
+
+
+def merge_changes(conn, source: str = "admissions_data"):
+    """Replace the cleaned rows and school outcomes of the ids in the changes table and drop
+    those deleted from the source, in one transaction"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {TABLE} c USING {CHANGES_TABLE} n WHERE c.id = n.id")
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {CHANGES_TABLE}")
+        cursor.execute(f"DELETE FROM {TABLE} c WHERE NOT EXISTS (SELECT 1 FROM {source} a WHERE a.id = c.id)")
+        cursor.execute(f"DELETE FROM {OUTCOME_TABLE} o USING {CHANGES_TABLE} n WHERE o.applicant_id = n.id")
+        cursor.execute(f"INSERT INTO {OUTCOME_TABLE} SELECT * FROM {OUTCOME_CHANGES_TABLE}")
+        cursor.execute(f"DELETE FROM {OUTCOME_TABLE} o WHERE NOT EXISTS (SELECT 1 FROM {source} a WHERE a.id = o.applicant_id)")
+        cursor.execute(f"DROP TABLE {CHANGES_TABLE}, {OUTCOME_CHANGES_TABLE}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def export_cleaned_csv(conn, path: str):
+    """Stream the cleaned table to CSV with COPY"""
+    copy_out_csv(conn, f"SELECT * FROM {TABLE} ORDER BY id", path)
@@ -1,504 +1,52 @@
 
 import pandas as pd
 import numpy as np
-import psycopg2
 from psycopg2.extras import execute_batch
 from dotenv import load_dotenv
 import os
 import re
+import sys
+import time
+import argparse
+import hashlib
+import itertools
+from collections import Counter
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
 
-load_dotenv()
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connect, release, stream_frames, table_version
+from shared.snapshot import write_snapshot
 
-db_params = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
+from pattern_matcher import RuleMatcher
+from rankings import load_rankings, rankings_file_hash, sync_institution_rankings
+from cleaned_writer import (TABLE, STAGING_TABLE, CHANGES_TABLE, FEATURE_COLUMN_TYPES,
+                            OUTCOME_TABLE, OUTCOME_STAGING_TABLE, OUTCOME_CHANGES_TABLE, OUTCOME_COLUMN_TYPES,
+                            column_types, copy_frame, cleaned_rules_hash, create_staging_table, swap_in_staging,
+                            create_changes_table, merge_changes, export_cleaned_csv,
+                            CLEANED_DTYPES, OUTCOME_DTYPES, apply_dtypes)
 
+load_dotenv()
 
-GLOBAL_UNDERGRAD_RANKINGS = {
-
-    'harvard': 1,
-    'harvard university': 1,
-    'massachusetts institute of technology': 1,
-    'mit': 1,
-    'stanford': 1,
-    'stanford university': 1,
-    'university of chicago': 1,
-    'chicago': 1,
-    'uchicago': 1,
-    'princeton': 1,
-    'princeton university': 1,
-    'university of california berkeley': 1,
-    'berkeley': 1,
-    'uc berkeley': 1,
-    'ucb': 1,
-    'cal': 1,
-    'yale': 1,
-    'yale university': 1,
-    'london school of economics and political science': 1,
-    'lse': 1,
-    'london school of economics': 1,
-    'university of oxford': 1,
-    'oxford': 1,
-    'oxford university': 1,
-    'university of cambridge': 1,
-    'cambridge': 1,
-    'cambridge university': 1,
-
-    'columbia': 2,
-    'columbia university': 2,
-    'northwestern': 2,
-    'northwestern university': 2,
-    'university of california los angeles': 2,
-    'ucla': 2,
-    'university of pennsylvania': 2,
-    'penn': 2,
-    'upenn': 2,
-    'wharton': 2,
-    'new york university': 2,
-    'nyu': 2,
-    'nyu stern': 2,
-    'stern': 2,
-    'national university of singapore': 2,
-    'nus': 2,
-    'university commerciale luigi bocconi': 2,
-    'bocconi': 2,
-    'bocconi university': 2,
-    'bocconi uni': 2,
-    'boccuni': 2,
-    'tsinghua': 2,
-    'tsinghua university': 2,
-    'ucl': 2,
-    'university college london': 2,
-    'peking': 2,
-    'peking university': 2,
-    'pku': 2,
-
-    'university of toronto': 3,
-    'toronto': 3,
-    'utoronto': 3,
-    'u of t': 3,
-    'uoft': 3,
-    'university of michigan ann arbor': 3,
-    'university of michigan': 3,
-    'michigan': 3,
-    'umich': 3,
-    'michigan ross': 3,
-    'boston': 3,
-    'boston university': 3,
-    'bu': 3,
-    'university of british columbia': 3,
-    'ubc': 3,
-    'british columbia': 3,
-    'duke': 3,
-    'duke university': 3,
-    'university of california san diego': 3,
-    'ucsd': 3,
-    'uc san diego': 3,
-    'cornell': 3,
-    'cornell university': 3,
-    'hong kong university of science and technology': 3,
-    'hkust': 3,
-    'eth zurich swiss federal institute of technology': 3,
-    'eth zurich': 3,
-    'eth': 3,
-    'swiss federal institute of technology': 3,
-    'university of tokyo': 3,
-    'tokyo': 3,
-    'fudan': 3,
-    'fudan university': 3,
-    'london business school': 3,
-    'lbs': 3,
-    'university of hong kong': 3,
-    'hku': 3,
-    'university pompeu fabra': 3,
-    'universitat pompeu fabra': 3,
-    'upf': 3,
-    'pompeu fabra': 3,
-    'imperial college london': 3,
-    'imperial': 3,
-    'imperial college': 3,
-    'university of warwick': 3,
-    'warwick': 3,
-    'chinese university of hong kong': 3,
-    'cuhk': 3,
-    'seoul national university': 3,
-    'seoul national': 3,
-    'snu': 3,
-    'australian national university': 3,
-    'anu': 3,
-    'university of new south wales': 3,
-    'unsw': 3,
-    'shanghai jiao tong university': 3,
-    'shanghai jiao tong': 3,
-    'sjtu': 3,
-    'monash': 3,
-    'monash university': 3,
-    'nanyang technological university': 3,
-    'nanyang': 3,
-    'ntu singapore': 3,
-    'ntu': 3,
-    'brown': 3,
-    'brown university': 3,
-    'university of melbourne': 3,
-    'melbourne': 3,
-    'korea university': 3,
-    'university of zurich': 3,
-    'zurich': 3,
-    'uzh': 3,
-    'zhejiang': 3,
-    'zhejiang university': 3,
-    'university of sydney': 3,
-    'sydney': 3,
-    'yonsei': 3,
-    'yonsei university': 3,
-
-    'university of minnesota twin cities': 4,
-    'university of minnesota': 4,
-    'minnesota': 4,
-    'umn': 4,
-    'ludwig maximilians universität münchen': 4,
-    'lmu munich': 4,
-    'lmu': 4,
-    'munich': 4,
-    'tilburg': 4,
-    'tilburg university': 4,
-    'erasmus university rotterdam': 4,
-    'erasmus': 4,
-    'erasmus rotterdam': 4,
-    'paris school of economics': 4,
-    'pse': 4,
-    'university of texas at austin': 4,
-    'texas': 4,
-    'ut austin': 4,
-    'ut-austin': 4,
-    'california institute of technology': 4,
-    'caltech': 4,
-    'stockholm school of economics': 4,
-    'sse': 4,
-    'stockholm sse': 4,
-    'rheinische friedrich wilhelms universität bonn': 4,
-    'university of bonn': 4,
-    'bonn': 4,
-    'bonn university': 4,
-    'university of manchester': 4,
-    'manchester': 4,
-    'university of wisconsin madison': 4,
-    'wisconsin': 4,
-    'uw madison': 4,
-    'uw-madison': 4,
-    'wisconsin madison': 4,
-    'johns hopkins university': 4,
-    'johns hopkins': 4,
-    'jhu': 4,
-    'university of amsterdam': 4,
-    'amsterdam': 4,
-    'university of illinois at urbana champaign': 4,
-    'illinois': 4,
-    'uiuc': 4,
-    'illinois urbana-champaign': 4,
-    'illinois urbana champaign': 4,
-    'singapore management university': 4,
-    'smu singapore': 4,
-    'universität mannheim': 4,
-    'mannheim': 4,
-    'mannheim university': 4,
-    'carnegie mellon university': 4,
-    'carnegie mellon': 4,
-    'cmu': 4,
-    'cmu tepper': 4,
-    'tepper': 4,
-    'kaist': 4,
-    'université toulouse 1 capitole': 4,
-    'toulouse': 4,
-    'tse': 4,
-    'toulouse school of economics': 4,
-    'university of california davis': 4,
-    'uc davis': 4,
-    'davis': 4,
-    'university of queensland': 4,
-    'queensland': 4,
-    'uq': 4,
-    'dartmouth': 4,
-    'dartmouth college': 4,
-    'ku leuven': 4,
-    'leuven': 4,
-    'catholic university of leuven': 4,
-    'université psl': 4,
-    'psl': 4,
-    'paris sciences et lettres': 4,
-    'universidad carlos iii de madrid': 4,
-    'uc3m': 4,
-    'carlos iii': 4,
-    'universidad carlos iii': 4,
-    'kyoto': 4,
-    'kyoto university': 4,
-    'hec paris': 4,
-    'copenhagen business school': 4,
-    'cbs': 4,
-    'university of edinburgh': 4,
-    'edinburgh': 4,
-    'city university of hong kong': 4,
-    'cityu': 4,
-    'michigan state university': 4,
-    'michigan state': 4,
-    'msu': 4,
-    'university of southern california': 4,
-    'usc': 4,
-    'mcgill': 4,
-    'mcgill university': 4,
-    'humboldt universität zu berlin': 4,
-    'humboldt': 4,
-    'humboldt university': 4,
-    'national taiwan university': 4,
-    'ntu taiwan': 4,
-    'universitat autònoma de barcelona': 4,
-    'uab': 4,
-    'autonomous barcelona': 4,
-    'université catholique de louvain': 4,
-    'uc louvain': 4,
-    'louvain': 4,
-    'university of copenhagen': 4,
-    'copenhagen': 4,
-    'pennsylvania state university': 4,
-    'penn state': 4,
-    'psu': 4,
-    'university of nottingham': 4,
-    'nottingham': 4,
-    'waseda': 4,
-    'waseda university': 4,
-    'queen mary university of london': 4,
-    'queen mary': 4,
-    'qmul': 4,
-    'ohio state university': 4,
-    'ohio state': 4,
-    'osu': 4,
-}
 
-
-PHD_ECON_RANKINGS = {
-
-    'mit': 1, 'massachusetts institute of technology': 1,
-    'harvard': 1, 'harvard university': 1,
-    'stanford': 1, 'stanford university': 1, 'stanford gsb': 1,
-    'princeton': 1, 'princeton university': 1,
-    'berkeley': 1, 'uc berkeley': 1, 'ucb': 1, 'cal': 1, 'university of california berkeley': 1,
-    'yale': 1, 'yale university': 1,
-    'university of chicago': 1, 'uchicago': 1, 'chicago booth': 1, 'booth': 1,
-    'northwestern': 1, 'northwestern university': 1, 'northwestern kellogg': 1, 'kellogg': 1,
-    'columbia': 1, 'columbia university': 1,
-    'nyu': 1, 'new york university': 1, 'nyu stern': 1,
-    
-    'penn': 2, 'upenn': 2, 'university of pennsylvania': 2, 'wharton': 2, 'upenn wharton': 2,
-    'michigan': 2, 'umich': 2, 'university of michigan': 2, 'michigan ross': 2,
-    'ucsd': 2, 'uc san diego': 2, 'university of california san diego': 2,
-    'ucla': 2, 'university of california los angeles': 2, 'ucla anderson': 2,
-    'wisconsin': 2, 'uw madison': 2, 'uw-madison': 2, 'university of wisconsin madison': 2, 'wisconsin madison': 2,
-    'minnesota': 2, 'umn': 2, 'university of minnesota': 2,
-    'duke': 2, 'duke university': 2,
-    'caltech': 2, 'california institute of technology': 2,
-    'lse': 2, 'london school of economics': 2, 'london school of economics and political science': 2,
-    'oxford': 2, 'university of oxford': 2, 'oxford university': 2, 'nuffield': 2, 'nuffield college': 2,
-    
-    'cornell': 3, 'cornell university': 3,
-    'brown': 3, 'brown university': 3,
-    'boston university': 3, 'bu': 3,
-    'johns hopkins': 3, 'jhu': 3, 'johns hopkins university': 3,
-    'maryland': 3, 'umd': 3, 'university of maryland': 3, 'maryland college park': 3,
-    'rochester': 3, 'university of rochester': 3,
-    'texas': 3, 'ut austin': 3, 'university of texas austin': 3, 'ut-austin': 3,
-    'ohio state': 3, 'osu': 3, 'ohio state university': 3,
-    'penn state': 3, 'psu': 3, 'pennsylvania state university': 3,
-    'carnegie mellon': 3, 'cmu': 3, 'carnegie mellon university': 3, 'cmu tepper': 3, 'tepper': 3,
-    'usc': 3, 'university of southern california': 3, 'usc price': 3,
-    'georgia tech': 3, 'georgia institute of technology': 3, 'georgiatech': 3, 'gt': 3,
-    'arizona': 3, 'university of arizona': 3,
-    'vanderbilt': 3, 'vanderbilt university': 3,
-    'georgetown': 3, 'georgetown university': 3,
-    'emory': 3, 'emory university': 3,
-    'virginia': 3, 'uva': 3, 'university of virginia': 3,
-    'unc': 3, 'university of north carolina': 3, 'unc chapel hill': 3, 'unc-ch': 3, 'north carolina chapel hill': 3,
-    'washington university': 3, 'wustl': 3, 'washu': 3, 'wash u': 3, 'washington university in st louis': 3, 'washington university st louis': 3,
-    'rice': 3, 'rice university': 3,
-    'notre dame': 3, 'university of notre dame': 3,
-    'texas a&m': 3, 'tamu': 3, 'texas a&m university': 3,
-    'indiana': 3, 'iu': 3, 'indiana university': 3, 'indiana bloomington': 3,
-    'michigan state': 3, 'msu': 3, 'michigan state university': 3,
-    'pittsburgh': 3, 'pitt': 3, 'university of pittsburgh': 3,
-    'ucsb': 3, 'uc santa barbara': 3, 'university of california santa barbara': 3, 'santa barbara': 3,
-    'uc irvine': 3, 'uci': 3, 'irvine': 3, 'university of california irvine': 3,
-    'uc davis': 3, 'davis': 3, 'university of california davis': 3,
-    'illinois': 3, 'uiuc': 3, 'university of illinois': 3, 'illinois urbana-champaign': 3, 'illinois urbana champaign': 3,
-    'washington': 3, 'uw': 3, 'university of washington': 3, 'uw seattle': 3,
-    'rutgers': 3, 'rutgers university': 3,
-    'boston college': 3, 'bc': 3,
-    'brandeis': 3, 'brandeis university': 3,
-    'tufts': 3, 'tufts university': 3,
-    
-    'cambridge': 3, 'university of cambridge': 3, 'cambridge university': 3,
-    'ucl': 3, 'university college london': 3,
-    'warwick': 3, 'warwick university': 3, 'university of warwick': 3,
-    'bocconi': 3, 'bocconi university': 3, 'bocconi uni': 3, 'boccuni': 3,
-    'tilburg': 3, 'tilburg university': 3,
-    'upf': 3, 'pompeu fabra': 3, 'universitat pompeu fabra': 3,
-    'barcelona gse': 3, 'bgse': 3, 'barcelona graduate school of economics': 3, 'barcelona graduate school': 3, 'barcelona school of economics': 3,
-    'tse': 3, 'toulouse': 3, 'toulouse school of economics': 3,
-    'stockholm school of economics': 3, 'sse': 3, 'stockholm sse': 3,
-    'mannheim': 3, 'mannheim university': 3, 'university of mannheim': 3,
-    'bonn': 3, 'bonn university': 3, 'university of bonn': 3, 'bonn graduate school': 3,
-    'zurich': 3, 'university of zurich': 3, 'uzh': 3,
-    'erasmus': 3, 'erasmus university': 3, 'erasmus rotterdam': 3, 'erasmus university rotterdam': 3,
-    'tinbergen': 3, 'tinbergen institute': 3,
-    'uc3m': 3, 'carlos iii': 3, 'universidad carlos iii': 3,
-    'cemfi': 3, 'cemfi madrid': 3,
-    'sciences po': 3, 'sciences po paris': 3,
-    'paris school of economics': 3, 'pse': 3,
-    'maastricht': 3, 'maastricht university': 3,
-    'frankfurt': 3, 'goethe university frankfurt': 3, 'gsefm': 3, 'frankfurt gsefm': 3,
-    
-    'toronto': 3, 'university of toronto': 3, 'utoronto': 3, 'u of t': 3, 'uoft': 3,
-    'ubc': 3, 'british columbia': 3, 'university of british columbia': 3,
-    'mcgill': 3, 'mcgill university': 3,
-    'western': 3, 'western ontario': 3, 'western university': 3, 'university of western ontario': 3, 'uwo': 3,
-    'queens': 3, "queen's": 3, "queen's university": 3, 'queens university': 3,
-    
-    
-    'university of illinois chicago': 4, 'illinois chicago': 4, 'uic': 4, 
-    'university of illinois at chicago': 4, 'ui chicago': 4,
-    
-    'asu': 4, 'arizona state': 4, 'arizona state university': 4,
-    'florida': 4, 'uf': 4, 'university of florida': 4,
-    'purdue': 4, 'purdue university': 4,
-    'colorado': 4, 'cu boulder': 4, 'university of colorado': 4, 'colorado boulder': 4, 'cu-boulder': 4,
-    'north carolina state': 4, 'nc state': 4, 'ncsu': 4,
-    'iowa state': 4, 'iowa state university': 4,
-    'kansas': 4, 'university of kansas': 4,
-    'virginia tech': 4, 'vt': 4, 'virginia polytechnic': 4,
-    'oregon': 4, 'university of oregon': 4, 'uo': 4,
-    'oregon state': 4, 'oregon state university': 4,
-    'utah': 4, 'university of utah': 4,
-    'connecticut': 4, 'uconn': 4, 'university of connecticut': 4,
-    'delaware': 4, 'university of delaware': 4,
-    'massachusetts': 4, 'umass': 4, 'umass amherst': 4, 'university of massachusetts': 4,
-    'stony brook': 4, 'stony brook university': 4, 'suny stony brook': 4,
-    'suny buffalo': 4, 'buffalo': 4, 'university at buffalo': 4,
-    'lehigh': 4, 'lehigh university': 4,
-    'clark': 4, 'clark university': 4,
-    'temple': 4, 'temple university': 4,
-    'american': 4, 'american university': 4,
-    'george washington': 4, 'gwu': 4, 'george washington university': 4, 'gw': 4,
-    'george mason': 4, 'gmu': 4, 'george mason university': 4,
-    'cuny': 4, 'cuny graduate center': 4, 'city university of new york': 4,
-    'fordham': 4, 'fordham university': 4,
-    'southern methodist': 4, 'smu': 4, 'southern methodist university': 4,
-    'tulane': 4, 'tulane university': 4,
-    'miami': 4, 'university of miami': 4,
-    'alabama': 4, 'university of alabama': 4,
-    'georgia': 4, 'uga': 4, 'university of georgia': 4,
-    'kentucky': 4, 'university of kentucky': 4, 'uk': 4,
-    'south carolina': 4, 'university of south carolina': 4,
-    'tennessee': 4, 'university of tennessee': 4,
-    'missouri': 4, 'university of missouri': 4,
-    'nebraska': 4, 'university of nebraska': 4,
-    'oklahoma': 4, 'university of oklahoma': 4,
-    'houston': 4, 'university of houston': 4,
-    'binghamton': 4, 'binghamton university': 4, 'suny binghamton': 4,
-    'syracuse': 4, 'syracuse university': 4,
-    'drexel': 4, 'drexel university': 4,
-    'wayne state': 4, 'wayne state university': 4,
-    'iowa': 4, 'university of iowa': 4,
-    'cincinnati': 4, 'university of cincinnati': 4,
-    'clemson': 4, 'clemson university': 4,
-    'florida state': 4, 'fsu': 4, 'florida state university': 4,
-    'wyoming': 4, 'university of wyoming': 4,
-    'arkansas': 4, 'university of arkansas': 4,
-    'new mexico': 4, 'unm': 4, 'university of new mexico': 4,
-    'riverside': 4, 'uc riverside': 4, 'ucr': 4, 'university of california riverside': 4,
-    'santa cruz': 4, 'ucsc': 4, 'uc santa cruz': 4, 'university of california santa cruz': 4,
-    'washington state': 4, 'wsu': 4, 'washington state university': 4,
-    
-    'mcmaster': 4, 'mcmaster university': 4,
-    'simon fraser': 4, 'sfu': 4, 'simon fraser university': 4,
-    'waterloo': 4, 'university of waterloo': 4, 'uwaterloo': 4,
-    'calgary': 4, 'university of calgary': 4, 'ucalgary': 4,
-    'alberta': 4, 'university of alberta': 4, 'ualberta': 4,
-    'victoria': 4, 'university of victoria': 4, 'uvic': 4,
-    'carleton': 4, 'carleton university': 4,
-    'ottawa': 4, 'university of ottawa': 4, 'uottawa': 4,
-    'york': 4, 'york university': 4,
-    'concordia': 4, 'concordia university': 4,
-    'wilfrid laurier': 4, 'laurier': 4, 'wlu': 4,
-    'dalhousie': 4, 'dalhousie university': 4, 'dal': 4,
-    'laval': 4, 'laval university': 4, 'université laval': 4, 'universite laval': 4,
-    'montreal': 4, 'université de montréal': 4, 'universite de montreal': 4, 'umontreal': 4,
-    
-    'imperial': 4, 'imperial college': 4, 'imperial college london': 4,
-    'edinburgh': 4, 'university of edinburgh': 4,
-    'bristol': 4, 'university of bristol': 4,
-    'essex': 4, 'university of essex': 4,
-    'nottingham': 4, 'university of nottingham': 4,
-    'manchester': 4, 'university of manchester': 4,
-    'queen mary': 4, 'qmul': 4, 'queen mary university': 4, 'queen mary university london': 4,
-    'kings': 4, "king's college": 4, "king's college london": 4, 'kcl': 4,
-    'sussex': 4, 'university of sussex': 4,
-    'lbs': 4, 'london business school': 4,
-    'insead': 4,
-    'eui': 4, 'european university institute': 4,
-    'aalto': 4, 'aalto university': 4, 'aalto school of business': 4,
-    'ceu': 4, 'central european university': 4,
-    'copenhagen': 4, 'university of copenhagen': 4,
-    'aarhus': 4, 'aarhus university': 4, 'aarhus bss': 4,
-    'vienna': 4, 'university of vienna': 4, 'wu wien': 4,
-    'stockholm university': 4,
-    'uppsala': 4, 'uppsala university': 4,
-    'helsinki': 4, 'university of helsinki': 4,
-    'amsterdam': 4, 'university of amsterdam': 4,
-    'vrije universiteit': 4, 'vu amsterdam': 4,
-    'groningen': 4, 'university of groningen': 4,
-    'utrecht': 4, 'utrecht university': 4,
-    'leiden': 4, 'leiden university': 4,
-    'geneva': 4, 'university of geneva': 4,
-    'lausanne': 4, 'university of lausanne': 4,
-    'basel': 4, 'university of basel': 4,
-    'bern': 4, 'university of bern': 4,
-    'munich': 4, 'lmu munich': 4, 'ludwig maximilian university': 4,
-    'humboldt': 4, 'humboldt university': 4,
-    'berlin': 4, 'tu berlin': 4, 'technical university of berlin': 4,
-    'cologne': 4, 'university of cologne': 4,
-    'heidelberg': 4, 'heidelberg university': 4,
-    'saarland': 4, 'saarland university': 4,
-    'bologna': 4, 'university of bologna': 4,
-    'louvain': 4, 'ku leuven': 4, 'catholic university of leuven': 4, 'uc louvain': 4,
-    'ghent': 4, 'ghent university': 4,
-    'paris': 4, 'sorbonne': 4, 'université paris': 4, 'universite paris': 4, 'paris 1': 4, 'pantheon sorbonne': 4,
-    'qem': 4,
-    'nova': 4, 'nova sbe': 4, 'nova school of business': 4,
-    'norwegian school of economics': 4, 'nhh': 4,
-    
-    'nus': 4, 'national university of singapore': 4,
-    'smu singapore': 4, 'singapore management university': 4,
-    'hku': 4, 'university of hong kong': 4,
-    'hkust': 4, 'hong kong university of science and technology': 4,
-    'cuhk': 4, 'chinese university of hong kong': 4,
-    'tokyo': 4, 'university of tokyo': 4,
-    'kyoto': 4, 'kyoto university': 4,
-    'seoul': 4, 'seoul national university': 4, 'snu': 4,
-    'yonsei': 4, 'yonsei university': 4,
-    'anu': 4, 'australian national university': 4,
-    'melbourne': 4, 'university of melbourne': 4,
-    'sydney': 4, 'university of sydney': 4,
-    'unsw': 4, 'university of new south wales': 4,
-    'monash': 4, 'monash university': 4,
-}
+# Rankings live in institution_rankings.csv (see rankings.py); the matchers use them as {alias: rank} dicts
+RANKING_TABLES = load_rankings()
+GLOBAL_UNDERGRAD_RANKINGS = RANKING_TABLES['undergrad'].to_dict()
+PHD_ECON_RANKINGS = RANKING_TABLES['phd'].to_dict()
+RANKINGS_BY_LABEL = {'undergrad': GLOBAL_UNDERGRAD_RANKINGS, 'phd': PHD_ECON_RANKINGS}
 
 
 def normalize_name(name):
     if pd.isna(name) or not name:
         return ''
-    name = str(name).lower().strip()
+    return _normalize_text(str(name))
+
+
+@lru_cache(maxsize=None)
+def _normalize_text(name):
+    # The same few hundred school strings repeat thousands of times, so results are memoized
+    name = name.lower().strip()
     
     name = name.replace('université', 'university')
     name = name.replace('universite', 'university')
@@ -515,8 +63,89 @@ def normalize_name(name):
     return name
 
 
+STOP_WORDS = {'of', 'the', 'at', 'in', 'and', 'for'}
+AMBIGUOUS_WORDS = {'chicago', 'illinois', 'columbia', 'washington', 'texas'}
+
+
+class InstitutionMatcher:
+    """Prebuilt index over a rankings dict for match_university
+
+    Key word sets are computed once and an inverted word -> key index limits the
+    fuzzy step to keys sharing a word with the name; candidates are checked in
+    dict order, so the first matching key wins exactly as in a linear scan
+    """
+
+    def __init__(self, rankings):
+        self.rankings = rankings
+        self.keys = []  # (key, key words, rank, ambiguous single word or None) in dict order
+        self.index = {}
+        for key, rank in rankings.items():
+            key_words = frozenset(key.split()) - STOP_WORDS
+            if len(key) <= 2 or len(key_words) == 0:
+                continue
+            ambiguous = next(iter(key_words)) if len(key_words) == 1 and key_words <= AMBIGUOUS_WORDS else None
+            for word in key_words:
+                self.index.setdefault(word, []).append(len(self.keys))
+            self.keys.append((key, key_words, rank, ambiguous))
+
+    def resolve(self, name):
+        """(matched rankings key, rank), or (None, None)"""
+        if pd.isna(name) or not name:
+            return None, None
+        
+        normalized = normalize_name(name)
+        
+        if normalized in self.rankings:
+            return normalized, self.rankings[normalized]
+        
+        if len(normalized) <= 2:
+            return None, None
+        
+        normalized_words = set(normalized.split()) - STOP_WORDS
+        candidates = sorted({i for word in normalized_words for i in self.index.get(word, ())})
+        
+        for i in candidates:
+            key, key_words, rank, ambiguous = self.keys[i]
+            if ambiguous is not None:
+                # Ambiguous single words only match a name that is exactly that word
+                if len(normalized_words) == 1:
+                    return key, rank
+                continue
+            if key_words <= normalized_words:
+                return key, rank
+        
+        return None, None
+
+    def match(self, name):
+        return self.resolve(name)[1]
+
+
+# Matchers and fuzzy indexes are cached by rankings label; any other dict gets an uncached one
+_matchers = {}
+
+
+def rankings_label(all_rankings):
+    """Label of one of the loaded rankings dicts, None for any other dict"""
+    return next((label for label, rankings in RANKINGS_BY_LABEL.items() if rankings is all_rankings), None)
+
+
+def get_matcher(all_rankings):
+    """Matcher for a rankings dict, built on first use"""
+    label = rankings_label(all_rankings)
+    if label is None:
+        return InstitutionMatcher(all_rankings)
+    if label not in _matchers:
+        _matchers[label] = InstitutionMatcher(all_rankings)
+    return _matchers[label]
+
+
 def match_university(name, all_rankings):
     """Try to match university to rankings with flexible matching"""
+    return get_matcher(all_rankings).match(name)
+
+
+def match_university_scan(name, all_rankings):
+    """Linear-scan reference for match_university, kept for benchmarks"""
     if pd.isna(name) or not name:
         return None
     
@@ -560,10 +189,190 @@ def match_university(name, all_rankings):
     return None
 
 
+# Fuzzy fallback for names the exact/word matcher misses (typos, variants):
+# trigram similarity between the distinctive part of the name and of each key
+FUZZY_MIN_SIMILARITY = 0.6  # accept the best candidate at or above this
+FUZZY_WORD_SIMILARITY = 0.4  # every distinctive word, on either side, needs a counterpart at least this similar
+FUZZY_AUDIT_BELOW = 0.75  # accepted matches below this, and near misses, go to the audit report
+FUZZY_AUDIT_MIN = 0.25
+FUZZY_TOP_K = 3
+GENERIC_WORDS = STOP_WORDS | {'university', 'college', 'institute', 'school', 'uni', 'univ'}
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_similarity(a, b):
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+# Misspellings of these are generic too ('univeristy', 'colege', 'schol')
+GENERIC_WORD_TRIGRAMS = [trigrams(word) for word in ('university', 'college', 'institute', 'school')]
+
+
+@lru_cache(maxsize=None)
+def name_core(normalized):
+    """Normalized name without generic words, including misspelled ones ('univeristy of michigan' -> 'michigan')"""
+    words = [
+        word for word in normalized.split()
+        if word not in GENERIC_WORDS
+        and all(trigram_similarity(trigrams(word), generic) < 0.4 for generic in GENERIC_WORD_TRIGRAMS)
+    ]
+    return ' '.join(words)
+
+
+def fold_name(name):
+    """Lowercased name with punctuation as spaces, generic words kept ('boston college' vs 'boston university')"""
+    return ' '.join(re.sub(r'[^\w&]+', ' ', str(name).lower()).split())
+
+
+def words_correspond(words, other_words):
+    """Every word in either list has a similar word in the other: 'california' alone is not 'california davis'"""
+    return all(
+        any(trigram_similarity(a, b) >= FUZZY_WORD_SIMILARITY for b in theirs)
+        for ours, theirs in ((words, other_words), (other_words, words))
+        for a in ours
+    )
+
+
+class TrigramIndex:
+    """Inverted trigram index over the cores of a rankings dict's keys
+
+    A lookup only scores keys sharing at least one trigram with the name, so it
+    grows with the matching keys rather than with the whole rankings dict. Every
+    key is indexed; keys with the same core ('boston college', 'boston university')
+    are told apart by the similarity of the whole names
+    """
+
+    def __init__(self, rankings, label, min_similarity=FUZZY_MIN_SIMILARITY):
+        self.label = label
+        self.min_similarity = min_similarity
+        self.entries = []  # (key, rank, core trigrams, core word trigrams, whole-name trigrams) in dict order
+        self.index = {}
+        self.audit = {}
+        for key, rank in rankings.items():
+            core = name_core(normalize_name(key))
+            if len(core) < 3:
+                continue
+            grams = trigrams(core)
+            for gram in grams:
+                self.index.setdefault(gram, []).append(len(self.entries))
+            self.entries.append((key, rank, grams, [trigrams(word) for word in core.split()], trigrams(fold_name(key))))
+
+    def candidates(self, name, k=FUZZY_TOP_K):
+        """Top-k (key, rank, similarity) whose words correspond to the name's, best first, ties broken by
+        whole-name similarity then dict order; names made only of ambiguous words are never looked up"""
+        core = name_core(normalize_name(name))
+        if len(core) < 3 or set(core.split()) <= AMBIGUOUS_WORDS:
+            return []
+        query = trigrams(core)
+        query_words = [trigrams(word) for word in core.split()]
+        whole = trigrams(fold_name(name))
+        shared = Counter(i for gram in query for i in self.index.get(gram, ()))
+        scored = sorted(
+            (-count / (len(query) + len(self.entries[i][2]) - count), -trigram_similarity(whole, self.entries[i][4]), i)
+            for i, count in shared.items()
+        )
+        top = (
+            (self.entries[i][0], self.entries[i][1], -similarity)
+            for similarity, _, i in scored if words_correspond(query_words, self.entries[i][3])
+        )
+        return list(itertools.islice(top, k))
+
+    def resolve(self, name):
+        """(key, rank) of the best candidate if it clears min_similarity, else (None, None); weak or near matches are audited"""
+        if pd.isna(name) or not name:
+            return None, None
+        candidates = self.candidates(name)
+        if not candidates:
+            return None, None
+        key, rank, similarity = candidates[0]
+        accepted = similarity >= self.min_similarity
+        if FUZZY_AUDIT_MIN <= similarity < FUZZY_AUDIT_BELOW:
+            self.audit[str(name)] = {
+                'rankings': self.label,
+                'name': str(name),
+                'matched_key': key,
+                'similarity': round(similarity, 3),
+                'rank': rank,
+                'accepted': accepted,
+                'alternatives': '; '.join(f'{k} ({s:.2f})' for k, _, s in candidates[1:]),
+            }
+        return (key, rank) if accepted else (None, None)
+
+    def match(self, name):
+        return self.resolve(name)[1]
+
+
+_fuzzy_indexes = {}
+
+
+def get_fuzzy_index(all_rankings):
+    label = rankings_label(all_rankings)
+    if label is None:
+        return TrigramIndex(all_rankings, '')
+    if label not in _fuzzy_indexes:
+        _fuzzy_indexes[label] = TrigramIndex(all_rankings, label)
+    return _fuzzy_indexes[label]
+
+
+def fuzzy_audit_report():
+    """Low-confidence fuzzy matches and near misses seen so far"""
+    rows = [row for index in _fuzzy_indexes.values() for row in index.audit.values()]
+    return pd.DataFrame(rows, columns=['rankings', 'name', 'matched_key', 'similarity', 'rank', 'accepted', 'alternatives'])
+
+
+# Build the indexes at import
+get_matcher(GLOBAL_UNDERGRAD_RANKINGS)
+get_matcher(PHD_ECON_RANKINGS)
+get_fuzzy_index(GLOBAL_UNDERGRAD_RANKINGS)
+get_fuzzy_index(PHD_ECON_RANKINGS)
+
+
+# Ordered (rank, patterns[, unless_patterns]) rules for ranking a school from free text:
+# the first rule with a pattern in the text wins
+RANK_TEXT_RULES = [
+    (2, ['ivy'], ['public']),
+    (1, ['top 5', 'top-5', '#1', '#2', '#3', '#4', '#5']),
+    (2, ['top 10', 'top-10', 't10 ', 'top10']),
+    (3, ['top 15', 'top-15', 'top 20', 'top-20', 't15 ', 't20 ', 'top15', 'top20']),
+    (4, ['top 25', 'top-25', 'top 30', 'top-30', 't25 ', 't30 ', 'top25', 'top30', 'top 35', 'top-35', 'top 40', 'top-40', 't40 ', 'top40']),
+    (5, ['top 50', 'top-50', 't50 ', 'top50', 'top 75', 'top-75', 'top 100', 'top-100', 't100 ', 'top100']),
+    (2, ['tier 1', 'tier-1', 'tier1', 't1 ', ' t1', 't-1', '1st tier', 'first tier', '1st-tier', 'tier i ']),
+    (3, ['tier 2', 'tier-2', 'tier2', 't2 ', ' t2', 't-2', '2nd tier', 'second tier', '2nd-tier', 'tier ii ']),
+    (4, ['tier 3', 'tier-3', 'tier3', 't3 ', ' t3', 't-3', '3rd tier', 'third tier', '3rd-tier', 'tier iii ']),
+    (5, ['tier 4', 'tier-4', 'tier4', 't4 ', ' t4', 't-4', '4th tier', 'fourth tier', '4th-tier']),
+    (5, ['flagship']),
+    (4, ['big 10', 'big ten', 'big10', 'b10 ', 'b1g', 'big-10']),
+    (4, ['public ivy', 'public-ivy']),
+    (4, ['t10 lac', 'top 10 lac', 'top-10 lac', 'top10 lac']),
+    (5, ['t20 lac', 'top 20 lac', 'top-20 lac', 't15 lac', 'top15 lac', 'top20 lac']),
+    (5, ['r1', 'r-1', ' r1 ']),
+    (3, ['canadian top 3', 'top 3 canadian', 'canada top 3']),
+    (4, ['canadian top 5', 'top 5 canadian', 'top canadian']),
+    (4, ['t3 canadian', 't2 canadian']),
+    (3, ['best university', 'best in', '#1 in', 'leading university']),
+    (4, ['top public', 'top state', 'best public']),
+    (5, ['elite', 'prestigious', 'reputable', 'well-known']),
+]
+RANK_TEXT_MATCHER = RuleMatcher(RANK_TEXT_RULES)
+
+
 def extract_rank_from_text(text):
     if pd.isna(text) or not text:
         return None
     
+    return RANK_TEXT_MATCHER.first(str(text).lower())
+
+
+def extract_rank_from_text_scan(text):
+    """Reference pattern-by-pattern version of extract_rank_from_text, kept for parity checks"""
+    if pd.isna(text) or not text:
+        return None
+    
     text_lower = str(text).lower()
     
     if 'ivy' in text_lower and 'public' not in text_lower:
@@ -624,17 +433,44 @@ def extract_rank_from_text(text):
 
 
 def rank_university_undergrad(name):
+    # Rank cues ('top 5 in economics') come before the fuzzy match, which would read them as a school name
     rank = match_university(name, GLOBAL_UNDERGRAD_RANKINGS)
     if rank is None:
         rank = extract_rank_from_text(name)
+    if rank is None:
+        rank = get_fuzzy_index(GLOBAL_UNDERGRAD_RANKINGS).match(name)
     return rank
 
 
 def rank_university_phd(name):
     rank = match_university(name, PHD_ECON_RANKINGS)
+    if rank is None:
+        rank = get_fuzzy_index(PHD_ECON_RANKINGS).match(name)
     return rank
 
 
+def institution_of(name):
+    """Institution id of a school name: from its PhD rankings match, else its undergrad rankings match
+
+    Only alias and exact matches count; a fuzzy match can rank a school but never
+    names the institution, so per-school joins do not merge different schools. The
+    name as written is tried as an alias first, as normalize_name drops the trailing
+    'college' that tells Boston College from Boston University
+    """
+    if pd.isna(name) or not name:
+        return None
+    tables = (('phd', PHD_ECON_RANKINGS), ('undergrad', GLOBAL_UNDERGRAD_RANKINGS))
+    written = ' '.join(str(name).lower().split())
+    for label, rankings in tables:
+        if written in rankings:
+            return RANKING_TABLES[label].institution_id(written)
+    for label, rankings in tables:
+        key, _ = get_matcher(rankings).resolve(name)
+        if key is not None:
+            return RANKING_TABLES[label].institution_id(key)
+    return None
+
+
 def rank_undergrad_institution(institution):
     if pd.isna(institution) or str(institution).strip() == '':
         return None
@@ -673,6 +509,140 @@ def rank_phd_schools(schools):
     return min(ranks) if ranks else None
 
 
+# Resolved institution names are persisted per CLEANING_RULES_HASH (stored in the rankings_hash
+# column), so any change to normalize_name, the matchers or the rankings starts a fresh cache
+ALIAS_COLUMNS = ['raw_name', 'normalized_name', 'undergrad_rank', 'phd_rank', 'institution_id']
+
+
+def resolve_institutions(names):
+    """Alias rows (normalized name, undergrad and PhD rank, institution id) for unique raw names, in one pass"""
+    rows = [
+        (name, normalize_name(name), rank_university_undergrad(name), rank_university_phd(name), institution_of(name))
+        for name in names
+    ]
+    return pd.DataFrame(rows, columns=ALIAS_COLUMNS)
+
+
+def create_alias_table(conn):
+    """Create or upgrade institution_alias; main() runs this once before any partition is cleaned"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS institution_alias (
+            raw_name TEXT,
+            rankings_hash TEXT,
+            normalized_name TEXT,
+            undergrad_rank INTEGER,
+            phd_rank INTEGER,
+            PRIMARY KEY (raw_name, rankings_hash)
+        );
+        ALTER TABLE institution_alias ADD COLUMN IF NOT EXISTS institution_id INTEGER;
+    """)
+    conn.commit()
+    cursor.close()
+
+
+def load_institution_aliases(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT raw_name, normalized_name, undergrad_rank, phd_rank, institution_id "
+        "FROM institution_alias WHERE rankings_hash = %s",
+        (CLEANING_RULES_HASH,)
+    )
+    aliases = pd.DataFrame(cursor.fetchall(), columns=ALIAS_COLUMNS)
+    cursor.close()
+    return aliases
+
+
+def save_institution_aliases(conn, aliases):
+    cursor = conn.cursor()
+    data = [
+        (row.raw_name, CLEANING_RULES_HASH, row.normalized_name,
+         None if pd.isna(row.undergrad_rank) else int(row.undergrad_rank),
+         None if pd.isna(row.phd_rank) else int(row.phd_rank),
+         None if pd.isna(row.institution_id) else int(row.institution_id))
+        for row in aliases.itertuples(index=False)
+    ]
+    execute_batch(cursor, """
+        INSERT INTO institution_alias (raw_name, rankings_hash, normalized_name, undergrad_rank, phd_rank, institution_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT DO NOTHING
+    """, data, page_size=1000)
+    conn.commit()
+    cursor.close()
+
+
+def institution_aliases(names, conn=None):
+    """Alias table indexed by raw name; names already resolved in institution_alias are reused"""
+    known = load_institution_aliases(conn) if conn is not None else pd.DataFrame(columns=ALIAS_COLUMNS)
+    missing = pd.Index(names).unique().difference(known['raw_name'])
+    resolved = resolve_institutions(missing)
+    if conn is not None and len(resolved):
+        save_institution_aliases(conn, resolved)
+    frames = [frame for frame in (known, resolved) if len(frame)]
+    aliases = pd.concat(frames, ignore_index=True) if frames else resolved
+    return aliases.set_index('raw_name')
+
+
+# schools_* column -> applicant_school_outcome.outcome
+SCHOOL_OUTCOMES = {
+    'schools_applied': 'applied',
+    'schools_accepted': 'accepted',
+    'schools_rejected': 'rejected',
+    'schools_waitlisted': 'waitlisted',
+}
+
+
+def institution_names(df):
+    """Non-blank undergrad institutions and listed schools as matcher keys (str)"""
+    undergrad = df['undergrad_institution'].dropna().map(str)
+    schools = [school_names(df[column]) for column in SCHOOL_OUTCOMES]
+    names = pd.concat([undergrad[undergrad.str.strip() != ''], *schools], ignore_index=True)
+    return names.unique()
+
+
+def school_names(schools):
+    """One row per non-blank school, indexed by the applicant row (mirrors rank_phd_schools)"""
+    schools = schools.explode().dropna().map(str)
+    return schools[schools.str.strip() != '']
+
+
+def school_outcomes(df, aliases):
+    """applicant_school_outcome rows: one per applicant, listed school and outcome"""
+    frames = [
+        pd.DataFrame({
+            'applicant_id': df.loc[schools.index, 'id'].to_numpy(),
+            'school': schools.to_numpy(),
+            'outcome': outcome,
+        })
+        for column, outcome in SCHOOL_OUTCOMES.items()
+        for schools in [school_names(df[column])]
+    ]
+    outcomes = pd.concat(frames, ignore_index=True).drop_duplicates(['applicant_id', 'school', 'outcome'])
+    outcomes['institution_id'] = aliases['institution_id'].reindex(outcomes['school']).to_numpy()
+    outcomes['rank'] = aliases['phd_rank'].reindex(outcomes['school']).to_numpy()
+    return outcomes[['applicant_id', 'institution_id', 'outcome', 'rank', 'school']].reset_index(drop=True)
+
+
+def rank_columns(df, aliases):
+    """undergrad_rank and phd_accepted_rank from the alias table, ranks mapped back by factorized codes"""
+    institution = df['undergrad_institution'].map(str, na_action='ignore')
+    codes, uniques = pd.factorize(institution)
+    ranks = aliases['undergrad_rank'].reindex(uniques).to_numpy(dtype=float)
+    # Unmatched institutions fall to the lowest tier, blanks stay unranked
+    ranks = np.where(np.isnan(ranks), 5, ranks)
+    ranks = np.where(pd.Index(uniques).str.strip() == '', np.nan, ranks)
+    undergrad_rank = np.full(len(df), np.nan)
+    undergrad_rank[codes >= 0] = ranks[codes[codes >= 0]]
+
+    schools = school_names(df['schools_accepted'])
+    codes, uniques = pd.factorize(schools)
+    school_ranks = pd.Series(aliases['phd_rank'].reindex(uniques).to_numpy(dtype=float)[codes], index=schools.index)
+    school_ranks = school_ranks[school_ranks > 0]
+    phd_accepted_rank = school_ranks.groupby(level=0).min().reindex(df.index)
+
+    return pd.Series(undergrad_rank, index=df.index), phd_accepted_rank
+
+
 def standardize_gpa(gpa, gpa_out_of):
     if pd.isna(gpa) or pd.isna(gpa_out_of):
         return None
@@ -692,6 +662,21 @@ def has_grad_program(row):
     return 1 if (has_grad_gpa or has_grad_inst) else 0
 
 
+CALCULUS_PATTERNS = ['calc', 'calculus', 'ap', 'bc']
+LINEAR_ALGEBRA_PATTERNS = ['linear', 'lin ', 'matrix', 'vector', 'matrices']
+REAL_ANALYSIS_PATTERNS = [
+    'real', 'mathematical analysis', 'metric spaces', 'advanced analytic',
+    'grad level analysis', 'intro to proofs', 'analysis', ' ra ', ' ra,',
+    'analysis 1', 'analysis 2', 'analysis 3', 'analysis 4',
+    'analysis i', 'analysis ii', 'analysis iii', 'analysis iv', 'analytic'
+]
+COURSE_MATCHER = RuleMatcher([
+    ('taken_calculus', CALCULUS_PATTERNS),
+    ('taken_linear_algebra', LINEAR_ALGEBRA_PATTERNS),
+    ('taken_real_analysis', REAL_ANALYSIS_PATTERNS),
+])
+
+
 def has_calculus(math_courses):
     if math_courses is None:
         return 0
@@ -705,8 +690,7 @@ def has_calculus(math_courses):
             return 0
         courses_str = str(math_courses).lower()
     
-    patterns = ['calc', 'calculus', 'ap', 'bc']
-    return 1 if any(p in courses_str for p in patterns) else 0
+    return 1 if any(p in courses_str for p in CALCULUS_PATTERNS) else 0
 
 
 def has_linear_algebra(math_courses):
@@ -722,8 +706,7 @@ def has_linear_algebra(math_courses):
             return 0
         courses_str = str(math_courses).lower()
     
-    patterns = ['linear', 'lin ', 'matrix', 'vector', 'matrices']
-    return 1 if any(p in courses_str for p in patterns) else 0
+    return 1 if any(p in courses_str for p in LINEAR_ALGEBRA_PATTERNS) else 0
 
 
 def has_real_analysis(math_courses):
@@ -739,102 +722,46 @@ def has_real_analysis(math_courses):
             return 0
         courses_str = str(math_courses).lower()
     
-    patterns = [
-        'real', 'mathematical analysis', 'metric spaces', 'advanced analytic',
-        'grad level analysis', 'intro to proofs', 'analysis', ' ra ', ' ra,',
-        'analysis 1', 'analysis 2', 'analysis 3', 'analysis 4',
-        'analysis i', 'analysis ii', 'analysis iii', 'analysis iv', 'analytic'
-    ]
-    
-    return 1 if any(p in courses_str for p in patterns) else 0
+    return 1 if any(p in courses_str for p in REAL_ANALYSIS_PATTERNS) else 0
+
+
+# Old-scale (200-800) GRE section scores -> 130-170 scale, one row per breakpoint:
+# a score maps to new_score of the highest old_min it reaches. Swap the file for the
+# official ETS concordance tables without touching code
+GRE_CONCORDANCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gre_concordance.csv')
+
+
+def load_gre_concordance(path=GRE_CONCORDANCE_FILE):
+    """{section: (ascending old_min breakpoints, new scores)}"""
+    table = pd.read_csv(path).sort_values(['section', 'old_min'])
+    return {
+        section: (rows['old_min'].to_numpy(), rows['new_score'].to_numpy())
+        for section, rows in table.groupby('section')
+    }
+
+
+GRE_CONCORDANCE = load_gre_concordance()
+
+# Which test a reported section score belongs to: scores in [bound i-1, bound i) get SCORE_SCALES[i]
+SCORE_SCALE_BOUNDS = np.array([6, 52, 130, 801])
+SCORE_SCALES = np.array(['', 'gmat', '', 'gre', ''])
+
+
+def score_scale(scores):
+    """'gmat' for 6-51, 'gre' for 130-800, '' otherwise"""
+    return SCORE_SCALES[np.searchsorted(SCORE_SCALE_BOUNDS, scores, side='right')]
+
+
+def convert_gre_scores(scores, section):
+    """GRE section scores to the 130-170 scale, whole arrays at once; scores already on it pass through"""
+    scores = np.asarray(scores)
+    breakpoints, new_scores = GRE_CONCORDANCE[section]
+    positions = np.clip(np.searchsorted(breakpoints, scores, side='right') - 1, 0, None)
+    return np.where((scores >= 130) & (scores <= 170), scores, new_scores[positions])
 
 
 def convert_old_gre_to_new(score, is_quant=True):
-    score = int(score)
-    
-    if 130 <= score <= 170:
-        return score
-
-    if is_quant:
-        if score >= 800:
-            return 170
-        elif score >= 760:
-            return 169
-        elif score >= 740:
-            return 168
-        elif score >= 720:
-            return 167
-        elif score >= 700:
-            return 166
-        elif score >= 680:
-            return 165
-        elif score >= 660:
-            return 164
-        elif score >= 640:
-            return 163
-        elif score >= 620:
-            return 162
-        elif score >= 600:
-            return 161
-        elif score >= 580:
-            return 160
-        elif score >= 560:
-            return 159
-        elif score >= 540:
-            return 158
-        elif score >= 520:
-            return 157
-        elif score >= 500:
-            return 156
-        elif score >= 480:
-            return 155
-        elif score >= 460:
-            return 154
-        elif score >= 440:
-            return 153
-        elif score >= 420:
-            return 152
-        elif score >= 400:
-            return 151
-        else:
-            return 150
-    else:
-        if score >= 800:
-            return 170
-        elif score >= 730:
-            return 169
-        elif score >= 700:
-            return 168
-        elif score >= 670:
-            return 167
-        elif score >= 640:
-            return 166
-        elif score >= 610:
-            return 165
-        elif score >= 580:
-            return 164
-        elif score >= 550:
-            return 163
-        elif score >= 520:
-            return 162
-        elif score >= 500:
-            return 161
-        elif score >= 470:
-            return 160
-        elif score >= 450:
-            return 159
-        elif score >= 430:
-            return 158
-        elif score >= 410:
-            return 157
-        elif score >= 390:
-            return 156
-        elif score >= 370:
-            return 155
-        elif score >= 350:
-            return 154
-        else:
-            return 153
+    return int(convert_gre_scores(int(score), 'quant' if is_quant else 'verbal'))
 
 
 def process_gre_gmat(row):
@@ -869,18 +796,49 @@ def process_gre_gmat(row):
     return pd.Series(result)
 
 
+ECON_MAJOR_PATTERNS = [
+    'economics', 'accounting', 'finance', 'actuarial', 'business',
+    'econ', 'eco', 'b.b.a', 'bba', 'commerce', 'management'
+]
+ECON_MATCHER = RuleMatcher([('undergrad_econ_related', ECON_MAJOR_PATTERNS)])
+
+
 def is_econ_related(major):
     if pd.isna(major) or str(major).strip() == '':
         return 0
     
     major_lower = str(major).lower()
     
-    patterns = [
-        'economics', 'accounting', 'finance', 'actuarial', 'business',
-        'econ', 'eco', 'b.b.a', 'bba', 'commerce', 'management'
-    ]
-    
-    return 1 if any(p in major_lower for p in patterns) else 0
+    return 1 if any(p in major_lower for p in ECON_MAJOR_PATTERNS) else 0
+
+
+ACADEMIC_LOR_PATTERNS = [
+    'professor', 'prof ', ' prof,', 'prof.', 'associate prof', 'assistant prof',
+    'lecturer', 'instructor', 'dean', 'chair', 'hod', 'director',
+    'advisor', 'adviser', 'thesis advisor', 'supervisor',
+    'phd', 'dphil', 'postdoc',
+    'course', 'class', 'undergraduate', 'graduate', 'masters',
+    'university', 'college', 'alma mater'
+    ' ra ', 'research assistant', 'research supervisor', 'research advisor', 'research prof',
+    'thesis', 'dissertation',
+    'fed', 'federal reserve',
+    'think tank', 'research institute', 'imf', 'oecd', 'ecb',
+    'co-author', 'co-write',
+    'pre-doc', 'predoc', 'pre-doctoral'
+]
+
+PROFESSIONAL_LOR_PATTERNS = [
+    'boss', 'supervisor', 'manager', 'director',
+    'ceo', 'cfo', 'vp', 'partner', 'cbo', 'cso',
+    'employer', 'work', 'company', 'firm', 'industry', 'client',
+    'government', 'agency', 'military',
+    'medical', 'law', 'engineering', 'cs',
+    'non-academic', 'professional'
+]
+LOR_MATCHER = RuleMatcher([
+    ('academic', ACADEMIC_LOR_PATTERNS),
+    ('professional', PROFESSIONAL_LOR_PATTERNS),
+])
 
 
 def categorize_lor(lor_text):
@@ -889,32 +847,8 @@ def categorize_lor(lor_text):
     
     text = str(lor_text).lower()
     
-    academic_patterns = [
-        'professor', 'prof ', ' prof,', 'prof.', 'associate prof', 'assistant prof',
-        'lecturer', 'instructor', 'dean', 'chair', 'hod', 'director',
-        'advisor', 'adviser', 'thesis advisor', 'supervisor',
-        'phd', 'dphil', 'postdoc',
-        'course', 'class', 'undergraduate', 'graduate', 'masters',
-        'university', 'college', 'alma mater'
-        ' ra ', 'research assistant', 'research supervisor', 'research advisor', 'research prof',
-        'thesis', 'dissertation',
-        'fed', 'federal reserve',
-        'think tank', 'research institute', 'imf', 'oecd', 'ecb',
-        'co-author', 'co-write',
-        'pre-doc', 'predoc', 'pre-doctoral'
-    ]
-    
-    professional_patterns = [
-        'boss', 'supervisor', 'manager', 'director',
-        'ceo', 'cfo', 'vp', 'partner', 'cbo', 'cso',
-        'employer', 'work', 'company', 'firm', 'industry', 'client',
-        'government', 'agency', 'military',
-        'medical', 'law', 'engineering', 'cs',
-        'non-academic', 'professional'
-    ]
-    
-    academic_score = sum(1 for p in academic_patterns if p in text)
-    professional_score = sum(1 for p in professional_patterns if p in text)
+    academic_score = sum(1 for p in ACADEMIC_LOR_PATTERNS if p in text)
+    professional_score = sum(1 for p in PROFESSIONAL_LOR_PATTERNS if p in text)
     
     if academic_score == 0 and professional_score == 0:
         return {'academic_lor': 0, 'research_lor': 0, 'professional_lor': 1}
@@ -957,10 +891,120 @@ def determine_phd_offer(row):
         return None
 
 
-def main():
-    conn = psycopg2.connect(**db_params)
-    df = pd.read_sql("SELECT * FROM admissions_data", conn)
-    
+
+# Vectorized feature engineering: same results as the row-wise functions above,
+# computed per column with NumPy masks instead of one Python call per row
+
+
+def to_float(series):
+    """Numeric column as float64, DECIMAL values arrive as Decimal objects"""
+    return pd.to_numeric(series, errors='coerce').astype(float)
+
+
+def standardize_gpa_vec(gpa, gpa_out_of):
+    index = gpa.index
+    gpa = to_float(gpa).to_numpy()
+    gpa_out_of = to_float(gpa_out_of).to_numpy()
+    valid = ~np.isnan(gpa) & ~np.isnan(gpa_out_of) & (gpa_out_of != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.round(gpa / gpa_out_of * 4.0, 2)
+    return pd.Series(np.where(valid, std, np.nan), index=index)
+
+
+def has_text(series):
+    """Non-null and not blank after str()"""
+    return series.notna() & series.astype(str).str.strip().ne('')
+
+
+def has_content_vec(series):
+    """determine_phd_offer's has_content: non-empty list, or non-blank string"""
+    lengths = series.map(len, na_action='ignore')
+    is_str = series.map(type).eq(str)
+    if is_str.any():
+        lengths[is_str] = series[is_str].str.strip().str.len()
+    return lengths.fillna(0).gt(0)
+
+
+def course_text_vec(math_courses):
+    """Lowercased course string per row, as built by has_calculus and friends ('' when empty)"""
+    lengths = math_courses.map(len, na_action='ignore').fillna(0)
+    items = math_courses.explode()
+    # Null items inside a non-empty list are kept as 'none' like str(None); empty lists explode to NaN and are dropped
+    keep = lengths.loc[items.index].to_numpy() > 0
+    items = items[keep].map(str).str.lower()
+    text = items.groupby(level=0, sort=False).agg(' '.join)
+    return text.reindex(math_courses.index, fill_value='')
+
+
+def process_gre_gmat_vec(df):
+    quant = to_float(df['gre_quant']).to_numpy()
+    verbal = to_float(df['gre_verbal']).to_numpy()
+    writing = to_float(df['gre_writing']).to_numpy()
+
+    result = pd.DataFrame(index=df.index)
+    for name, values in (('quant', quant), ('verbal', verbal)):
+        present = ~np.isnan(values) & (values != 0)
+        scores = np.trunc(np.where(present, values, 0)).astype(int)
+        scale = np.where(present, score_scale(scores), '')
+        is_gmat = scale == 'gmat'
+        result[f'gre_{name}_std'] = np.where(scale == 'gre', convert_gre_scores(scores, name), np.nan)
+        result[f'gmat_{name}'] = np.where(is_gmat, scores, np.nan)
+        if name == 'quant':
+            result['gmat_writing'] = np.where(is_gmat & ~np.isnan(writing), writing, np.nan)
+
+    return result[['gre_quant_std', 'gre_verbal_std', 'gmat_quant', 'gmat_verbal', 'gmat_writing']]
+
+
+def categorize_lor_vec(lor_text):
+    text = lor_text.where(lor_text.notna(), '').astype(str).str.lower()
+    nonblank = has_text(lor_text)
+    academic = LOR_MATCHER.flags_column(text)['academic'].astype(bool)
+    # Any non-blank letter without an academic cue counts as professional, with or without a professional cue
+    return pd.DataFrame({
+        'academic_lor': (nonblank & academic).astype(int),
+        'research_lor': 0,
+        'professional_lor': (nonblank & ~academic).astype(int),
+    }, index=lor_text.index)
+
+
+def determine_phd_offer_vec(df):
+    accepted = has_content_vec(df['schools_accepted'])
+    other = (has_content_vec(df['schools_applied']) | has_content_vec(df['schools_waitlisted'])
+             | has_content_vec(df['schools_rejected']))
+    return pd.Series(np.select([accepted, other], [1, 0], default=np.nan), index=df.index)
+
+
+def add_features(df):
+    """Derived feature columns, vectorized"""
+    df = df.copy()
+    df['undergrad_gpa_std'] = standardize_gpa_vec(df['undergrad_gpa'], df['undergrad_gpa_out_of'])
+    df['grad_gpa_std'] = standardize_gpa_vec(df['grad_gpa'], df['grad_gpa_out_of'])
+    df['attended_grad_program'] = (df['grad_gpa'].notna() | has_text(df['grad_institution'])).astype(int)
+
+    courses = COURSE_MATCHER.flags_column(course_text_vec(df['math_courses']))
+    df['taken_calculus'] = courses['taken_calculus']
+    df['taken_linear_algebra'] = courses['taken_linear_algebra']
+    df['taken_real_analysis'] = courses['taken_real_analysis']
+
+    df = pd.concat([df, process_gre_gmat_vec(df)], axis=1)
+
+    major = df['undergrad_major'].where(df['undergrad_major'].notna(), '').astype(str).str.lower()
+    df['undergrad_econ_related'] = ECON_MATCHER.flags_column(major)['undergrad_econ_related']
+
+    lor = categorize_lor_vec(df['letters_of_rec'])
+    df['academic_lor'] = lor['academic_lor']
+    df['research_lor'] = lor['research_lor']
+    df['professional_lor'] = lor['professional_lor']
+
+    df['got_phd_offer'] = determine_phd_offer_vec(df)
+    df['phd_course_taken'] = df['phd_course_taken'].map({True: 1, False: 0})
+    df['research_experience'] = df['research_experience'].map({True: 1, False: 0})
+    return df
+
+
+def add_features_rowwise(df):
+    """Reference row-wise implementation of add_features, kept for parity checks"""
+    df = df.copy()
     df['undergrad_gpa_std'] = df.apply(lambda row: standardize_gpa(row['undergrad_gpa'], row['undergrad_gpa_out_of']), axis=1)
     df['grad_gpa_std'] = df.apply(lambda row: standardize_gpa(row['grad_gpa'], row['grad_gpa_out_of']), axis=1)
     df['attended_grad_program'] = df.apply(has_grad_program, axis=1)
@@ -982,76 +1026,156 @@ def main():
     df['got_phd_offer'] = df.apply(determine_phd_offer, axis=1)
     df['phd_course_taken'] = df['phd_course_taken'].apply(lambda x: 1 if x == True else (0 if x == False else None))
     df['research_experience'] = df['research_experience'].apply(lambda x: 1 if x == True else (0 if x == False else None))
+    return df
+
+
+# Cleaned rows are reused while the code and data that produced them are unchanged: any edit to
+# these files makes the next run rebuild the whole table
+RULE_SOURCES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('cleaning.py', 'pattern_matcher.py', 'cleaned_writer.py', 'rankings.py',
+                 'institution_rankings.csv', 'gre_concordance.csv')
+]
+
+
+def rules_hash(paths=RULE_SOURCES):
+    digest = hashlib.md5()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+CLEANING_RULES_HASH = rules_hash()
+
+# Rows added, re-extracted or updated in place (reextract_fields bumps schema_version) since the last run
+CHANGED_ROWS_SQL = """
+    SELECT a.* FROM admissions_data a
+    LEFT JOIN admissions_data_cleaned c ON c.id = a.id
+    WHERE c.id IS NULL
+       OR c.extracted_at IS DISTINCT FROM a.extracted_at
+       OR c.schema_version IS DISTINCT FROM a.schema_version
+    ORDER BY a.id
+"""
+
+
+def clean_frame(df, conn=None, typed=True):
+    """admissions_data rows -> (admissions_data_cleaned rows, applicant_school_outcome rows),
+    cast to CLEANED_DTYPES and OUTCOME_DTYPES unless typed is False"""
+    df = add_features(df)
     
-    df['undergrad_rank'] = df['undergrad_institution'].apply(rank_undergrad_institution)
-    df['phd_accepted_rank'] = df.apply(lambda row: rank_phd_schools(row['schools_accepted']), axis=1)
-    
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("DROP TABLE IF EXISTS admissions_data_cleaned CASCADE;")
-        conn.commit()
-    except Exception:
-        conn.rollback()
-    
-    cursor.execute("""
-        CREATE TABLE admissions_data_cleaned AS
-        SELECT * FROM admissions_data WHERE 1=0;
-    """)
-    conn.commit()
-    
-    cursor.execute("""
-        ALTER TABLE admissions_data_cleaned
-        ADD COLUMN undergrad_gpa_std DECIMAL(3,2),
-        ADD COLUMN grad_gpa_std DECIMAL(3,2),
-        ADD COLUMN attended_grad_program INTEGER,
-        ADD COLUMN taken_calculus INTEGER,
-        ADD COLUMN taken_linear_algebra INTEGER,
-        ADD COLUMN taken_real_analysis INTEGER,
-        ADD COLUMN gre_quant_std INTEGER,
-        ADD COLUMN gre_verbal_std INTEGER,
-        ADD COLUMN gmat_quant INTEGER,
-        ADD COLUMN gmat_verbal INTEGER,
-        ADD COLUMN gmat_writing DECIMAL(3,1),
-        ADD COLUMN undergrad_econ_related INTEGER,
-        ADD COLUMN academic_lor INTEGER,
-        ADD COLUMN research_lor INTEGER,
-        ADD COLUMN professional_lor INTEGER,
-        ADD COLUMN got_phd_offer INTEGER,
-        ADD COLUMN undergrad_rank INTEGER,
-        ADD COLUMN phd_accepted_rank INTEGER;
-    """)
-    conn.commit()
+    aliases = institution_aliases(institution_names(df), conn)
+    df['undergrad_rank'], df['phd_accepted_rank'] = rank_columns(df, aliases)
+    outcomes = school_outcomes(df, aliases)
     
+    if typed:
+        return apply_dtypes(df, CLEANED_DTYPES), apply_dtypes(outcomes, OUTCOME_DTYPES)
     df['phd_course_taken'] = df['phd_course_taken'].apply(lambda x: None if pd.isna(x) else bool(x))
     df['research_experience'] = df['research_experience'].apply(lambda x: None if pd.isna(x) else bool(x))
-    
-    cols = df.columns.tolist()
-    cols_str = ', '.join([f'"{col}"' for col in cols])
-    placeholders = ', '.join(['%s'] * len(cols))
-    
-    insert_query = f'INSERT INTO admissions_data_cleaned ({cols_str}) VALUES ({placeholders})'
-    
-    data = []
-    for _, row in df.iterrows():
-        row_data = []
-        for val in row:
-            if isinstance(val, (list, np.ndarray)):
-                row_data.append(list(val))
-            elif val is None or (isinstance(val, float) and np.isnan(val)):
-                row_data.append(None)
-            else:
-                row_data.append(val)
-        data.append(tuple(row_data))
-    
-    execute_batch(cursor, insert_query, data, page_size=1000)
-    conn.commit()
-    
-    csv_filename = "admissions_data_cleaned.csv"
-    df.to_csv(csv_filename, index=False)
-   
-    cursor.close()
-    conn.close()
+    return df, outcomes
+
+
+def needs_full_rebuild(conn):
+    """Missing tables, other rules hash, or admissions_data columns changed"""
+    if cleaned_rules_hash(conn) != CLEANING_RULES_HASH:
+        return True
+    if set(column_types(conn, OUTCOME_TABLE)) != {name for name, _ in OUTCOME_COLUMN_TYPES}:
+        return True
+    expected = set(column_types(conn, 'admissions_data')) | {name for name, _ in FEATURE_COLUMN_TYPES}
+    return set(column_types(conn, TABLE)) != expected
+
+
+# Chunked cleaning: partitions of admissions_data are streamed from a named cursor and
+# cleaned and copied back by workers, each with the rankings indexes and its own connection
+CHUNK_SIZE = 5000
+_worker_conn = None
+
+
+def init_worker():
+    """Pool initializer: the rankings indexes are built when cleaning is imported, once per worker"""
+    global _worker_conn
+    _worker_conn = connect()
+
+
+def clean_partition(df, tables):
+    """Clean one partition and COPY it into the (cleaned, outcome) tables; returns (rows, fuzzy audit so far)"""
+    df, outcomes = clean_frame(df, _worker_conn)
+    copy_frame(_worker_conn, df, tables[0])
+    copy_frame(_worker_conn, outcomes, tables[1])
+    _worker_conn.commit()
+    return len(df), fuzzy_audit_report()
+
+
+def stream_admissions(conn, query, chunk_size=CHUNK_SIZE):
+    """Yield query results as DataFrame chunks from a named cursor (conn must not commit meanwhile)"""
+    # coerce_float as in pd.read_sql
+    return stream_frames(conn, query, chunk_size, name='stream_admissions', coerce_float=True)
+
+
+def run_partitions(conn, query, tables, workers=1, chunk_size=CHUNK_SIZE):
+    """Clean the query's rows into the (cleaned, outcome) tables partition by partition; returns (rows cleaned, fuzzy audit)"""
+    global _worker_conn
+    partitions = stream_admissions(conn, query, chunk_size)
+    results = []
+    if workers <= 1:
+        init_worker()
+        try:
+            results = [clean_partition(df, tables) for df in partitions]
+        finally:
+            release(_worker_conn)
+            _worker_conn = None
+    else:
+        with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+            pending = set()
+            for df in partitions:
+                # At most two partitions per worker are in flight, so memory stays bounded
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(f.result() for f in done)
+                pending.add(pool.submit(clean_partition, df, tables))
+            results.extend(f.result() for f in pending)
+    
+    audit = pd.concat([fuzzy_audit_report()] + [report for _, report in results], ignore_index=True)
+    return sum(rows for rows, _ in results), audit.drop_duplicates(['rankings', 'name'])
+
+
+def main(full=False, workers=1, chunk_size=CHUNK_SIZE, snapshot=True):
+    start_time = time.time()
+    conn = connect()
+    sync_institution_rankings(conn, RANKING_TABLES, rankings_file_hash())
+    create_alias_table(conn)
+    
+    full = full or needs_full_rebuild(conn)
+    if full:
+        create_staging_table(conn)
+        rows, audit = run_partitions(conn, "SELECT * FROM admissions_data ORDER BY id",
+                                     (STAGING_TABLE, OUTCOME_STAGING_TABLE), workers, chunk_size)
+        swap_in_staging(conn, CLEANING_RULES_HASH)
+    else:
+        create_changes_table(conn)
+        rows, audit = run_partitions(conn, CHANGED_ROWS_SQL, (CHANGES_TABLE, OUTCOME_CHANGES_TABLE), workers, chunk_size)
+        merge_changes(conn)
+    
+    if len(audit):
+        audit.sort_values('similarity').to_csv("institution_match_audit.csv", index=False)
+    
+    export_cleaned_csv(conn, "admissions_data_cleaned.csv")
+    if snapshot:
+        manifest = write_snapshot(stream_admissions(conn, f"SELECT * FROM {TABLE} ORDER BY id", chunk_size),
+                                  CLEANING_RULES_HASH, CLEANED_DTYPES, source_version=table_version(conn, TABLE))
+        print(f"Published snapshot {manifest['file']} ({manifest['rows']:,} rows)")
+    release(conn)
+    
+    print(f"{'Rebuilt' if full else 'Updated'} admissions_data_cleaned: {rows:,} rows cleaned "
+          f"(rules {CLEANING_RULES_HASH}, {workers} worker{'s' if workers > 1 else ''}) in {time.time() - start_time:.1f}s")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean and rank admissions_data into admissions_data_cleaned")
+    parser.add_argument("--full", action="store_true",
+                        help="recompute every row (default: only rows changed since the last run, unless the rules changed)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes cleaning partitions in parallel")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per partition")
+    parser.add_argument("--no-snapshot", action="store_true", help="skip publishing the Parquet snapshot")
+    args = parser.parse_args()
+    main(args.full, args.workers, args.chunk_size, not args.no_snapshot)
@@ -0,0 +1,103 @@
+"""
+Compiled substring rule matching for the cleaning step:
+Each rule set (ordered rules of literal substrings, optionally vetoed by other
+substrings) is compiled once into a single trie-shaped regex, and a text is
+scanned in one pass that reports every pattern occurring anywhere in it
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def trie_regex(patterns):
+    """Regex matching any of the literals, preferring the longest one at a position"""
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional tail: a shorter pattern only matches when no longer one does
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class RuleMatcher:
+    """Ordered rules [(value, patterns, unless_patterns), ...] over lowercased text
+
+    A rule fires when any of its patterns occurs and none of its unless_patterns
+    does; first() returns the value of the first rule that fires, labels() the
+    values of every rule that fires
+    """
+
+    def __init__(self, rules):
+        self.rules = [(rule[0], list(rule[1]), list(rule[2]) if len(rule) > 2 else []) for rule in rules]
+        patterns = {p for _, pats, unless in self.rules for p in pats + unless}
+        self.regex = re.compile(trie_regex(patterns))
+
+        fires = {p: set() for p in patterns}
+        vetoes = {p: set() for p in patterns}
+        for i, (_, pats, unless) in enumerate(self.rules):
+            for p in pats:
+                fires[p].add(i)
+            for p in unless:
+                vetoes[p].add(i)
+        self.implied = {}
+        for longest in patterns:
+            prefixes = [p for p in patterns if longest.startswith(p)]
+            self.implied[longest] = (
+                frozenset(i for p in prefixes for i in fires[p]),
+                frozenset(i for p in prefixes for i in vetoes[p]),
+            )
+
+    def fired(self, text):
+        """Indexes of the rules that fire on a text"""
+        search = self.regex.search
+        match = search(text)
+        if match is None:
+            return set()
+        # Restarting one character after each match start sees overlapping occurrences too;
+        # the longest literal at a position implies every pattern that is a prefix of it
+        found = set()
+        while match is not None:
+            found.add(match.group())
+            match = search(text, match.start() + 1)
+        fired = set()
+        vetoed = set()
+        for longest in found:
+            rule_fires, rule_vetoes = self.implied[longest]
+            fired |= rule_fires
+            vetoed |= rule_vetoes
+        return fired - vetoed if vetoed else fired
+
+    def first(self, text, default=None):
+        fired = self.fired(text)
+        return self.rules[min(fired)][0] if fired else default
+
+    def labels(self, text):
+        return {self.rules[i][0] for i in self.fired(text)}
+
+    def first_column(self, texts, default=None):
+        """first() over a column of lowercased strings, each distinct text is scanned once"""
+        codes, unique = pd.factorize(texts)
+        values = np.array([self.first(text, default) for text in unique] + [default], dtype=object)
+        return pd.Series(values[codes], index=texts.index)
+
+    def flags_column(self, texts):
+        """0/1 column per rule value, from one pass over each distinct text"""
+        codes, unique = pd.factorize(texts)
+        values = list(dict.fromkeys(value for value, _, _ in self.rules))
+        table = np.zeros((len(unique) + 1, len(values)), dtype=int)  # last row: nulls (code -1)
+        for row, text in enumerate(unique):
+            found = self.labels(text)
+            table[row] = [value in found for value in values]
+        return pd.DataFrame(table[codes], columns=values, index=texts.index)
@@ -0,0 +1,114 @@
+"""
+Institution rankings loaded from institution_rankings.csv:
+One row per (rankings list, alias) with its rank and the canonical institution it
+names. Each list becomes a RankingTable of interned aliases, an alias -> institution
+id array and a rank array, and the file is mirrored into the institution_rankings
+table so SQL can join and filter on schools
+"""
+
+import os
+import csv
+import sys
+import hashlib
+
+import numpy as np
+from psycopg2.extras import execute_batch
+
+RANKINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'institution_rankings.csv')
+
+
+class RankingTable:
+    """Aliases of one rankings list in file order, with their institution ids and ranks"""
+
+    def __init__(self, label, aliases, institution_ids, ranks, institutions):
+        self.label = label
+        self.aliases = aliases
+        self.positions = {alias: i for i, alias in enumerate(aliases)}
+        self.institution_ids = np.array(institution_ids, dtype=np.int32)
+        self.ranks = np.array(ranks, dtype=np.int8)
+        self.institutions = institutions  # shared across lists, indexed by institution id
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def to_dict(self):
+        """{alias: rank} in file order, as used by the matchers"""
+        return dict(zip(self.aliases, self.ranks.tolist()))
+
+    def institution_id(self, alias):
+        return int(self.institution_ids[self.positions[alias]])
+
+    def institution(self, alias):
+        return self.institutions[self.institution_id(alias)]
+
+
+def load_rankings(path=RANKINGS_FILE):
+    """{rankings label: RankingTable}
+
+    Like a dict literal, a repeated alias keeps its first position and its last rank
+    """
+    institutions = []
+    institution_ids = {}
+    lists = {}
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            institution = sys.intern(row['institution'])
+            if institution not in institution_ids:
+                institution_ids[institution] = len(institutions)
+                institutions.append(institution)
+            entries = lists.setdefault(row['rankings'], {})
+            entries[sys.intern(row['alias'])] = (institution_ids[institution], int(row['rank']))
+
+    return {
+        label: RankingTable(
+            label,
+            list(entries),
+            [institution_id for institution_id, _ in entries.values()],
+            [rank for _, rank in entries.values()],
+            institutions
+        )
+        for label, entries in lists.items()
+    }
+
+
+def rankings_file_hash(path=RANKINGS_FILE):
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()[:12]
+
+
+def sync_institution_rankings(conn, tables, version):
+    """Mirror the rankings into institution_rankings unless that version is already there"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS institution_rankings (
+            rankings TEXT,
+            alias TEXT,
+            position INTEGER,
+            institution_id INTEGER,
+            institution TEXT,
+            rank SMALLINT,
+            rankings_version TEXT,
+            PRIMARY KEY (rankings, alias)
+        );
+        CREATE INDEX IF NOT EXISTS idx_institution_rankings_alias ON institution_rankings (alias);
+        CREATE INDEX IF NOT EXISTS idx_institution_rankings_institution ON institution_rankings (institution_id);
+    """)
+    cursor.execute("SELECT DISTINCT rankings_version FROM institution_rankings")
+    if cursor.fetchall() == [(version,)]:
+        conn.commit()
+        cursor.close()
+        return
+
+    data = [
+        (table.label, alias, position, int(table.institution_ids[position]),
+         table.institutions[table.institution_ids[position]], int(table.ranks[position]), version)
+        for table in tables.values()
+        for position, alias in enumerate(table.aliases)
+    ]
+    cursor.execute("DELETE FROM institution_rankings")
+    execute_batch(cursor, """
+        INSERT INTO institution_rankings (rankings, alias, position, institution_id, institution, rank, rankings_version)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, data, page_size=1000)
+    conn.commit()
+    cursor.close()
@@ -6,21 +6,20 @@ Interactive Streamlit dashboard for analyzing PhD admissions data
 import streamlit as st
 import pandas as pd
 import numpy as np
-import psycopg2
 from dotenv import load_dotenv
 import os
+import sys
+from pathlib import Path
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from shared.db import connection, read_prepared
+
 load_dotenv()
-db_params = {
-    'host': os.getenv('DB_HOST'),
-    'port': int(os.getenv('DB_PORT')),
-    'database': os.getenv('DB_NAME'),
-    'user': os.getenv('DB_USER'),
-    'password': os.getenv('DB_PASSWORD')
-}
+# Milliseconds a dashboard query may run before Postgres cancels it
+DASHBOARD_STATEMENT_TIMEOUT = int(os.getenv('DASHBOARD_STATEMENT_TIMEOUT', '15000'))
 
 
 st.set_page_config(
@@ -54,13 +53,51 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_resource
-def get_db_connection():
-    return psycopg2.connect(**db_params) #Database connection
+def run_query(query, params=()):
+    """
+    Run a query on a pooled connection (one per concurrent session instead of one shared by all),
+    prepared once per connection and reused with new filter values
+    """
+    with connection(DASHBOARD_STATEMENT_TIMEOUT) as conn:
+        return read_prepared(conn, query, params)
+
+def filter_clauses(filters):
+    """
+    WHERE clauses for the selected filters, with their values as query parameters
+    """
+    where_clauses = []
+    params = []
+
+    if filters['gpa_range'][0] > 0 or filters['gpa_range'][1] < 4.0:
+        where_clauses.append("undergrad_gpa_std BETWEEN %s AND %s")
+        params += [filters['gpa_range'][0], filters['gpa_range'][1]]
+    if filters['gre_quant_range'][0] > 130 or filters['gre_quant_range'][1] < 170:
+        where_clauses.append("gre_quant_std BETWEEN %s AND %s")
+        params += [filters['gre_quant_range'][0], filters['gre_quant_range'][1]]
+    if filters['gre_verbal_range'][0] > 130 or filters['gre_verbal_range'][1] < 170:
+        where_clauses.append("gre_verbal_std BETWEEN %s AND %s")
+        params += [filters['gre_verbal_range'][0], filters['gre_verbal_range'][1]]
+    if filters['undergrad_rank']:
+        where_clauses.append(f"undergrad_rank IN ({', '.join(['%s'] * len(filters['undergrad_rank']))})")
+        params += list(filters['undergrad_rank'])
+    if filters['has_calculus']:
+        where_clauses.append("taken_calculus = 1")
+    if filters['has_linear_algebra']:
+        where_clauses.append("taken_linear_algebra = 1")
+    if filters['has_real_analysis']:
+        where_clauses.append("taken_real_analysis = 1")
+    if filters['has_research']:
+        where_clauses.append("research_experience = true")
+    if filters['econ_major']:
+        where_clauses.append("undergrad_econ_related = 1")
+    if filters['has_grad_program']:
+        where_clauses.append("attended_grad_program = 1")
+
+    return where_clauses, params
 
 def build_sql_query(filters):
     """
-    Building SQL query with filters for each feature variable
+    Building SQL query with filters for each feature variable, returns (query, params)
     """
     
     base_query = """
@@ -100,90 +137,18 @@ def build_sql_query(filters):
     WHERE got_phd_offer IS NOT NULL  -- Only include those who actually applied
     """
     
-    where_clauses = []
-
-
-    if filters['gpa_range'][0] > 0 or filters['gpa_range'][1] < 4.0:
-        where_clauses.append(
-            f"undergrad_gpa_std BETWEEN {filters['gpa_range'][0]} AND {filters['gpa_range'][1]}"
-        )
+    where_clauses, params = filter_clauses(filters)
     
-
-    if filters['gre_quant_range'][0] > 130 or filters['gre_quant_range'][1] < 170:
-        where_clauses.append(
-            f"gre_quant_std BETWEEN {filters['gre_quant_range'][0]} AND {filters['gre_quant_range'][1]}"
-        )
-    
-
-    if filters['gre_verbal_range'][0] > 130 or filters['gre_verbal_range'][1] < 170:
-        where_clauses.append(
-            f"gre_verbal_std BETWEEN {filters['gre_verbal_range'][0]} AND {filters['gre_verbal_range'][1]}"
-        )
-    
-
-    if filters['undergrad_rank']:
-        rank_list = ','.join(map(str, filters['undergrad_rank']))
-        where_clauses.append(f"undergrad_rank IN ({rank_list})")
-    
-
-    if filters['has_calculus']:
-        where_clauses.append("taken_calculus = 1")
-    if filters['has_linear_algebra']:
-        where_clauses.append("taken_linear_algebra = 1")
-    if filters['has_real_analysis']:
-        where_clauses.append("taken_real_analysis = 1")
-    
-
-    if filters['has_research']:
-        where_clauses.append("research_experience = true")
-    
-
-    if filters['econ_major']:
-        where_clauses.append("undergrad_econ_related = 1")
-    
-
-    if filters['has_grad_program']:
-        where_clauses.append("attended_grad_program = 1")
-    
-
     if where_clauses:
         base_query += " AND " + " AND ".join(where_clauses)
     
-    return base_query
+    return base_query, params
 
 def get_placement_by_tier(filters):
     """Get detailed placement statistics by university tier"""
     
-    where_clauses = ["got_phd_offer = 1", "phd_accepted_rank IS NOT NULL"]
-    
-
-    if filters['gpa_range'][0] > 0 or filters['gpa_range'][1] < 4.0:
-        where_clauses.append(
-            f"undergrad_gpa_std BETWEEN {filters['gpa_range'][0]} AND {filters['gpa_range'][1]}"
-        )
-    if filters['gre_quant_range'][0] > 130 or filters['gre_quant_range'][1] < 170:
-        where_clauses.append(
-            f"gre_quant_std BETWEEN {filters['gre_quant_range'][0]} AND {filters['gre_quant_range'][1]}"
-        )
-    if filters['gre_verbal_range'][0] > 130 or filters['gre_verbal_range'][1] < 170:
-        where_clauses.append(
-            f"gre_verbal_std BETWEEN {filters['gre_verbal_range'][0]} AND {filters['gre_verbal_range'][1]}"
-        )
-    if filters['undergrad_rank']:
-        rank_list = ','.join(map(str, filters['undergrad_rank']))
-        where_clauses.append(f"undergrad_rank IN ({rank_list})")
-    if filters['has_calculus']:
-        where_clauses.append("taken_calculus = 1")
-    if filters['has_linear_algebra']:
-        where_clauses.append("taken_linear_algebra = 1")
-    if filters['has_real_analysis']:
-        where_clauses.append("taken_real_analysis = 1")
-    if filters['has_research']:
-        where_clauses.append("research_experience = true")
-    if filters['econ_major']:
-        where_clauses.append("undergrad_econ_related = 1")
-    if filters['has_grad_program']:
-        where_clauses.append("attended_grad_program = 1")
+    where_clauses, params = filter_clauses(filters)
+    where_clauses = ["got_phd_offer = 1", "phd_accepted_rank IS NOT NULL"] + where_clauses
     
     query = f"""
     SELECT 
@@ -198,8 +163,7 @@ def get_placement_by_tier(filters):
     ORDER BY phd_accepted_rank
     """
     
-    conn = get_db_connection()
-    df = pd.read_sql(query, conn)
+    df = run_query(query, params)
     
     # Map tiers to labels
     tier_labels = {1: 'Top 10', 2: 'Top 20', 3: 'Top 50', 4: 'Top 100'}
@@ -282,9 +246,8 @@ def main():
     
 
     try:
-        conn = get_db_connection()
-        query = build_sql_query(filters)
-        results = pd.read_sql(query, conn)
+        query, params = build_sql_query(filters)
+        results = run_query(query, params)
         
         if len(results) == 0 or results['total_applicants'].iloc[0] == 0:
             st.warning("⚠️ No applicants match the selected filters. Please adjust your criteria.")
@@ -0,0 +1,288 @@
+"""
+Runner for the pipeline stages, from scraping to the models:
+Each stage declares the script it runs, the code it depends on and the tables and files
+it reads and writes; a stage depends on the stages that write its inputs. A stage's
+fingerprint hashes its code, its input files, a cheap version of its input tables (so
+changes made outside the pipeline, such as reextract_fields.py updating admissions_data,
+are seen) and the fingerprints of its upstream stages, and the stage is skipped while that fingerprint matches its last successful
+run and its outputs exist. Stages whose upstream stages are done run concurrently,
+each with its output in pipeline_logs/<stage>.log
+
+    python pipeline.py                   # run every out-of-date stage
+    python pipeline.py cleaning          # cleaning and the stages it reads from only
+    python pipeline.py --dry-run         # list the stages that would run and why
+    python pipeline.py --force scraping  # rerun a stage (and everything downstream)
+    python pipeline.py --mark-done scraping upload  # record stages already run by hand as up to date
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+from typing import NamedTuple, List, Dict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import psycopg2
+from dotenv import dotenv_values
+
+from shared.db import db_params, table_version as read_table_version
+
+ROOT = Path(__file__).resolve().parent
+STATE_FILE = ROOT / "pipeline_state.json"
+LOG_DIR = ROOT / "pipeline_logs"
+TABLE = "table:"  # prefix of table inputs/outputs; anything else is a file relative to the repository root
+DB_CODE = ["shared/db.py"]  # imported by every stage that connects to Postgres
+
+EXTRACTION_CODE = [
+    f"Tools Call/{name}.py"
+    for name in ("gpt_tools_call", "backends", "extraction_schema", "db_writer", "pre_extractor",
+                 "preprocessing", "metrics", "streaming")
+] + ["cleaning-visualization/institution_rankings.csv"] + DB_CODE  # school names routed to the model by pre_extractor
+# cleaning.RULE_SOURCES, plus the snapshot writer
+CLEANING_CODE = [
+    f"cleaning-visualization/{name}"
+    for name in ("cleaning.py", "pattern_matcher.py", "cleaned_writer.py", "rankings.py",
+                 "institution_rankings.csv", "gre_concordance.csv")
+] + ["shared/snapshot.py"] + DB_CODE
+MODEL_CODE = ["shared/snapshot.py"] + DB_CODE  # the models fall back to Postgres when the snapshot is missing or stale
+SNAPSHOT = "snapshots/admissions_data_cleaned.json"
+MODEL_INPUTS = [SNAPSHOT, TABLE + "admissions_data_cleaned"]
+
+
+class Stage(NamedTuple):
+    name: str
+    script: str  # run with its folder as working directory, where its .env is
+    code: List[str]  # files besides the script whose changes make the stage stale
+    inputs: List[str]
+    outputs: List[str]
+    args: List[str] = []
+
+
+STAGES = [
+    Stage("scraping", "Scraping/scraping.py", [], [],
+          ["Scraping/urch_forum_pages_1_to_717.csv"]),
+    Stage("upload", "Scraping/raw_data_upload.py", DB_CODE, ["Scraping/urch_forum_pages_1_to_717.csv"],
+          [TABLE + "forum_posts"]),
+    Stage("filtering", "Filtering/filtering.py", DB_CODE, [TABLE + "forum_posts"],
+          [TABLE + "filtered_posts", "Filtering/filtered_posts_for_gpt.csv"]),
+    Stage("extraction", "Tools Call/gpt_tools_call.py", EXTRACTION_CODE, [TABLE + "filtered_posts"],
+          [TABLE + "admissions_data", "Tools Call/admissions_data_final.csv"]),
+    Stage("cleaning", "cleaning-visualization/cleaning.py", CLEANING_CODE, [TABLE + "admissions_data"],
+          [TABLE + "admissions_data_cleaned", TABLE + "applicant_school_outcome",
+           TABLE + "institution_rankings", SNAPSHOT]),
+    Stage("logistic_regression", "Logistic Regression/logistic_reg.py", MODEL_CODE, MODEL_INPUTS, []),
+    Stage("gb_chances", "Gradient Boosting/chances_gradientboosting.py", MODEL_CODE, MODEL_INPUTS, []),
+    Stage("gb_tier", "Gradient Boosting/tier_gradientboosting.py", MODEL_CODE, MODEL_INPUTS, []),
+]
+
+
+def upstream(stage: Stage, stages: List[Stage]) -> List[str]:
+    """Names of the stages writing any of the stage's inputs"""
+    return [other.name for other in stages
+            if other.name != stage.name and set(other.outputs) & set(stage.inputs)]
+
+
+def select(stages: List[Stage], targets: List[str]) -> List[Stage]:
+    """The target stages and everything upstream of them, in declaration order"""
+    by_name = {stage.name: stage for stage in stages}
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(upstream(by_name[name], stages))
+    return [stage for stage in stages if stage.name in needed]
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(stage: Stage, upstream_fingerprints: Dict[str, str]) -> str:
+    """Hash of the stage's code, args, input files, input table versions and upstream fingerprints"""
+    digest = hashlib.md5()
+    for name in [stage.script] + stage.code + [i for i in stage.inputs if not i.startswith(TABLE)]:
+        path = ROOT / name
+        digest.update(f"{name}:{file_hash(path) if path.exists() else 'missing'}\n".encode())
+    for name in [i for i in stage.inputs if i.startswith(TABLE)]:
+        digest.update(f"{name}:{table_version(stage, name[len(TABLE):])}\n".encode())
+    digest.update(json.dumps(stage.args).encode())
+    for name in sorted(upstream_fingerprints):
+        digest.update(f"{name}:{upstream_fingerprints[name]}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def stage_connection(stage: Stage):
+    """Connection with the database settings of the stage's .env, as the stage itself would connect"""
+    env = {**dotenv_values(ROOT / Path(stage.script).parent / ".env"), **os.environ}
+    return psycopg2.connect(**db_params(env))
+
+
+def table_version(stage: Stage, table: str) -> str:
+    """Table version (see shared.db.table_version) read as the stage would connect; 'missing' when it cannot be read"""
+    try:
+        conn = stage_connection(stage)
+    except psycopg2.Error:
+        return "missing"
+    try:
+        return read_table_version(conn, table)
+    except psycopg2.Error:
+        return "missing"
+    finally:
+        conn.close()
+
+
+def table_exists(stage: Stage, table: str) -> bool:
+    """Checked with the database settings of the stage's .env, as the stage itself would connect"""
+    conn = stage_connection(stage)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def missing_outputs(stage: Stage) -> List[str]:
+    missing = []
+    for output in stage.outputs:
+        if output.startswith(TABLE):
+            try:
+                exists = table_exists(stage, output[len(TABLE):])
+            except psycopg2.Error:
+                exists = False
+        else:
+            exists = (ROOT / output).exists()
+        if not exists:
+            missing.append(output)
+    return missing
+
+
+def load_state() -> Dict[str, dict]:
+    return json.loads(STATE_FILE.read_text()) if STATE_FILE.exists() else {}
+
+
+def save_state(state: Dict[str, dict]):
+    partial = STATE_FILE.with_suffix(".json.partial")
+    partial.write_text(json.dumps(state, indent=2))
+    os.replace(partial, STATE_FILE)
+
+
+def run_reason(stage: Stage, fp: str, state: Dict[str, dict], ran_upstream: List[str], forced: bool):
+    """Why the stage has to run, None when it is up to date"""
+    if forced:
+        return "forced"
+    if ran_upstream:
+        return f"upstream ran ({', '.join(ran_upstream)})"
+    if stage.name not in state:
+        return "never ran"
+    if state[stage.name]["fingerprint"] != fp:
+        return "code or inputs changed"
+    missing = missing_outputs(stage)
+    if missing:
+        return f"missing {', '.join(missing)}"
+    return None
+
+
+def run_stage(stage: Stage) -> int:
+    """Run the stage's script to completion, output to its log file; returns the exit code"""
+    script = ROOT / stage.script
+    LOG_DIR.mkdir(exist_ok=True)
+    with open(LOG_DIR / f"{stage.name}.log", "w", encoding="utf-8") as log:
+        process = subprocess.run([sys.executable, script.name] + stage.args, cwd=script.parent,
+                                 stdout=log, stderr=subprocess.STDOUT)
+    return process.returncode
+
+
+def run_pipeline(stages: List[Stage], force=(), jobs=3, dry_run=False, mark_done=()) -> bool:
+    """Run out-of-date stages, independent ones concurrently; returns False when a stage failed"""
+    state = load_state()
+    deps = {stage.name: upstream(stage, stages) for stage in stages}
+    fingerprints = {}
+    ran = set()
+    done = set()
+    failed = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(done) + len(failed) < len(stages):
+            for stage in stages:
+                name = stage.name
+                if name in done or name in failed or name in running.values():
+                    continue
+                if any(dep in failed for dep in deps[name]):
+                    print(f"[{name}] skipped, upstream failed")
+                    failed.add(name)
+                    continue
+                if not all(dep in done for dep in deps[name]):
+                    continue
+
+                # Input files are hashed once the upstream stages have written them
+                fingerprints[name] = fingerprint(stage, {dep: fingerprints[dep] for dep in deps[name]})
+                reason = run_reason(stage, fingerprints[name], state, [d for d in deps[name] if d in ran],
+                                    name in force)
+                if reason is None:
+                    print(f"[{name}] up to date")
+                    done.add(name)
+                elif name in mark_done and name not in force and not dry_run:
+                    print(f"[{name}] marked up to date")
+                    state[name] = {"fingerprint": fingerprints[name], "finished_at": None}
+                    save_state(state)
+                    done.add(name)
+                elif dry_run:
+                    print(f"[{name}] would run: {reason}")
+                    ran.add(name)
+                    done.add(name)
+                else:
+                    print(f"[{name}] running: {reason}")
+                    running[pool.submit(run_stage, stage)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.result() == 0:
+                    print(f"[{name}] done")
+                    ran.add(name)
+                    done.add(name)
+                    state[name] = {"fingerprint": fingerprints[name], "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                    save_state(state)
+                else:
+                    print(f"[{name}] failed with exit code {future.result()}, see {LOG_DIR / (name + '.log')}")
+                    failed.add(name)
+
+    return not failed
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the out-of-date pipeline stages")
+    parser.add_argument("targets", nargs="*", metavar="stage",
+                        help=f"stages to bring up to date with their upstream stages (default: all of {', '.join(names)})")
+    parser.add_argument("--force", nargs="+", choices=names, default=[], help="rerun these stages regardless")
+    parser.add_argument("--mark-done", nargs="+", choices=names, default=[],
+                        help="record these stages as up to date without running them")
+    parser.add_argument("--jobs", type=int, default=3, help="stages run at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="list the stages that would run")
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(names)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    stages = select(STAGES, args.targets) if args.targets else STAGES
+    if not run_pipeline(stages, set(args.force), args.jobs, args.dry_run, set(args.mark_done)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+Modules shared by the pipeline stages in the other folders, which put the repository
+root on sys.path to import them
+"""
@@ -0,0 +1,209 @@
+"""
+Database access shared by the pipeline scripts and the dashboard:
+Connection settings come from the environment (.env in the folder the script runs in),
+connections come from one thread-safe pool per process and setting, each with a
+statement timeout, and there are helpers for server-side cursors, COPY and prepared
+statements that are reused for the life of the pooled connection
+"""
+
+import io
+import os
+import re
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Mapping
+
+import pandas as pd
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql as pgsql
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv(usecwd=True))
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+# Milliseconds, 0 for none; batch stages keep the default, the dashboard passes its own
+STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "0"))
+
+
+def db_params(env: Mapping = None) -> dict:
+    """psycopg2.connect keyword arguments from DB_* variables (os.environ by default)"""
+    env = os.environ if env is None else env
+    return {
+        'host': env.get('DB_HOST'),
+        'port': int(env.get('DB_PORT') or 5432),
+        'database': env.get('DB_NAME'),
+        'user': env.get('DB_USER'),
+        'password': env.get('DB_PASSWORD')
+    }
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers the statements prepared on its session"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = {}
+
+
+class BlockingPool:
+    """ThreadedConnectionPool that waits for a free connection instead of raising PoolError"""
+
+    def __init__(self, statement_timeout: int, minconn: int = POOL_MIN, maxconn: int = POOL_MAX):
+        options = f"-c statement_timeout={statement_timeout}"
+        self.pool = ThreadedConnectionPool(minconn, maxconn, connection_factory=PooledConnection,
+                                           options=options, **db_params())
+        self.slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=POOL_TIMEOUT):
+            raise psycopg2.OperationalError(f"No database connection free after {POOL_TIMEOUT:.0f}s")
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            self.pool.putconn(conn, close=conn.closed != 0)
+        finally:
+            self.slots.release()
+
+    def closeall(self):
+        self.pool.closeall()
+
+
+# (pid, statement timeout) -> pool. A forked worker builds its own pools; the parent's are
+# kept referenced and never closed there, since closing would end the parent's sessions
+_pools = {}
+_pools_lock = threading.Lock()
+_owners = {}
+
+
+def get_pool(statement_timeout: int = None) -> BlockingPool:
+    key = (os.getpid(), STATEMENT_TIMEOUT if statement_timeout is None else statement_timeout)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = BlockingPool(key[1])
+        return _pools[key]
+
+
+def connect(statement_timeout: int = None):
+    """Connection from the pool, hand it back with release()"""
+    pool = get_pool(statement_timeout)
+    conn = pool.getconn()
+    _owners[id(conn)] = pool
+    return conn
+
+
+def release(conn):
+    """Return a connection to its pool, rolling back anything left uncommitted"""
+    pool = _owners.pop(id(conn))
+    if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    pool.putconn(conn)
+
+
+@contextmanager
+def connection(statement_timeout: int = None):
+    """Pooled connection for the duration of a with block"""
+    conn = connect(statement_timeout)
+    try:
+        yield conn
+    finally:
+        release(conn)
+
+
+def close_pools():
+    """Close this process's pooled connections"""
+    with _pools_lock:
+        for key in [key for key in _pools if key[0] == os.getpid()]:
+            _pools.pop(key).closeall()
+
+
+def stream_frames(conn, query: str, chunk_size: int = 5000, params=None, name: str = "stream_frames",
+                  coerce_float: bool = False) -> Iterator[pd.DataFrame]:
+    """Yield a query result as DataFrame chunks from a named cursor, one chunk held client side
+
+    The cursor lives in its own transaction, so conn must not be committed while iterating
+    """
+    cursor = conn.cursor(name=name)
+    cursor.itersize = chunk_size
+    cursor.execute(query, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=[c.name for c in cursor.description],
+                                            coerce_float=coerce_float)
+    finally:
+        cursor.close()
+        conn.rollback()
+
+
+def table_version(conn, table: str) -> str:
+    """Cheap version of a table: row count and max(id) for appends and deletes, plus the newest
+    row version's transaction id (xmin) for rows updated in place"""
+    cursor = conn.cursor()
+    cursor.execute(pgsql.SQL("SELECT count(*), max(id), max(xmin::text::bigint) FROM {}").format(pgsql.Identifier(table)))
+    version = "/".join(str(value) for value in cursor.fetchone())
+    cursor.close()
+    return version
+
+
+def copy_in(conn, table: str, data, columns=None):
+    """COPY text-format rows (a string or file object) into a table; does not commit"""
+    column_list = " (" + ", ".join(f'"{col}"' for col in columns) + ")" if columns else ""
+    cursor = conn.cursor()
+    cursor.copy_expert(f"COPY {table}{column_list} FROM STDIN", io.StringIO(data) if isinstance(data, str) else data)
+    cursor.close()
+
+
+def copy_out_csv(conn, query: str, path: str):
+    """Stream a query result to a CSV file with a header, rows never pass through pandas"""
+    cursor = conn.cursor()
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+    cursor.close()
+
+
+PLACEHOLDER = re.compile(r"%s|%%")
+
+
+def execute_prepared(conn, sql: str, params=()):
+    """Execute sql (with %s placeholders) as a statement prepared once per pooled connection
+
+    Returns the cursor with the result. Plain connections fall back to a normal execute
+    """
+    cursor = conn.cursor()
+    prepared = getattr(conn, "prepared", None)
+    if prepared is None:
+        cursor.execute(sql, params or None)
+        return cursor
+
+    name = "stmt_" + hashlib.md5(sql.encode()).hexdigest()[:16]
+    if name not in prepared:
+        count = iter(range(1, len(params) + 1))
+        body = PLACEHOLDER.sub(lambda m: f"${next(count)}" if m.group() == "%s" else "%", sql)
+        cursor.execute(f"PREPARE {name} AS {body}")
+        prepared[name] = sql
+    if params:
+        cursor.execute(f"EXECUTE {name} (" + ", ".join(["%s"] * len(params)) + ")", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+    return cursor
+
+
+def read_prepared(conn, sql: str, params=()) -> pd.DataFrame:
+    """pd.read_sql for execute_prepared, NUMERIC values as floats like read_sql"""
+    cursor = execute_prepared(conn, sql, params)
+    df = pd.DataFrame.from_records(cursor.fetchall(), columns=[c.name for c in cursor.description],
+                                   coerce_float=True)
+    cursor.close()
+    return df
@@ -0,0 +1,153 @@
+"""
+Versioned Parquet snapshots of the cleaned dataset:
+cleaning.py publishes admissions_data_cleaned as a typed, columnar file (int8 flags and
+ranks, int16 test scores, float32 GPAs, dictionary-encoded names) next to a small JSON
+manifest, and models and dashboards load only the columns they need from a memory map
+instead of querying Postgres. The manifest records the table version the snapshot was
+written from, so readers can tell when the table has changed since
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from shared.db import table_version
+
+DATASET = "admissions_data_cleaned"
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", Path(__file__).resolve().parent.parent / "snapshots"))
+KEEP_VERSIONS = 3
+
+SCORE = pa.float32()
+NAME = pa.dictionary(pa.int32(), pa.string())
+NAMES = pa.list_(pa.string())
+
+# Arrow type per pandas dtype: typed columns follow the dtypes the rows were cast to
+# (CLEANED_DTYPES in cleaned_writer.py), so Parquet and pandas share one schema
+ARROW_TYPES = {
+    "Int8": pa.int8(),
+    "Int16": pa.int16(),
+    "Int32": pa.int32(),
+    "float32": SCORE,
+    "boolean": pa.bool_(),
+    "category": NAME,
+}
+
+# Columns the dtypes leave as read (ids, arrays, timestamps); any other column is stored as strings
+UNTYPED_COLUMNS = {
+    "id": pa.int32(),
+    "original_post_id": pa.int32(),
+    "math_courses": NAMES,
+    "schools_applied": NAMES,
+    "schools_accepted": NAMES,
+    "schools_rejected": NAMES,
+    "schools_waitlisted": NAMES,
+    "extracted_at": pa.timestamp("us"),
+}
+
+
+def snapshot_schema(columns: List[str], dtypes: Dict[str, str]) -> pa.Schema:
+    return pa.schema([
+        (col, ARROW_TYPES[dtypes[col]] if col in dtypes else UNTYPED_COLUMNS.get(col, pa.string()))
+        for col in columns
+    ])
+
+
+def to_arrow(df: pd.DataFrame, schema: pa.Schema) -> pa.RecordBatch:
+    """Typed record batch from a cleaned-rows DataFrame (DECIMAL values arrive as Decimal objects)"""
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors="coerce")
+        elif pa.types.is_list(field.type):
+            values = values.map(lambda v: None if v is None else [None if s is None else str(s) for s in v],
+                                na_action="ignore")
+        elif pa.types.is_string(field.type) or pa.types.is_dictionary(field.type):
+            values = values.map(str, na_action="ignore")
+        arrays.append(pa.array(values, type=field.type, from_pandas=True, safe=False))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def manifest_path(name: str = DATASET, directory: Path = None) -> Path:
+    return Path(directory or SNAPSHOT_DIR) / f"{name}.json"
+
+
+def write_snapshot(chunks: Iterable[pd.DataFrame], version: str, dtypes: Dict[str, str], name: str = DATASET,
+                   directory: Path = None, source_version: str = None) -> dict:
+    """Write DataFrame chunks as a new snapshot version, typed by their pandas dtypes, then point the manifest at it
+
+    source_version is the table version (shared.db.table_version) the chunks were read at
+    """
+    directory = Path(directory or SNAPSHOT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    created_at = time.strftime("%Y%m%dT%H%M%S")
+    path = directory / f"{name}-{version}-{created_at}.parquet"
+    partial = path.with_suffix(".parquet.partial")
+
+    writer = None
+    rows = 0
+    try:
+        for df in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(partial, snapshot_schema(list(df.columns), dtypes), compression="zstd")
+            writer.write_batch(to_arrow(df, writer.schema))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"No rows to snapshot for {name}")
+    os.replace(partial, path)
+
+    manifest = {
+        "name": name,
+        "version": version,
+        "source_version": source_version,
+        "created_at": created_at,
+        "file": path.name,
+        "rows": rows,
+        "columns": writer.schema.names,
+    }
+    # Readers only ever see a complete manifest
+    manifest_file = manifest_path(name, directory)
+    manifest_file.with_suffix(".json.partial").write_text(json.dumps(manifest, indent=2))
+    os.replace(manifest_file.with_suffix(".json.partial"), manifest_file)
+
+    # Older versions beyond KEEP_VERSIONS are removed
+    for old in sorted(directory.glob(f"{name}-*.parquet"), key=lambda p: p.stat().st_mtime)[:-KEEP_VERSIONS]:
+        old.unlink()
+    return manifest
+
+
+def snapshot_manifest(name: str = DATASET, directory: Path = None) -> Optional[dict]:
+    """Manifest of the current snapshot, None when none has been published"""
+    path = manifest_path(name, directory)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def snapshot_is_current(conn, name: str = DATASET, directory: Path = None) -> bool:
+    """Whether the current snapshot was written from the table as it is now (False when there is none)"""
+    manifest = snapshot_manifest(name, directory)
+    return manifest is not None and manifest.get("source_version") == table_version(conn, name)
+
+
+def read_snapshot(columns: List[str] = None, name: str = DATASET, directory: Path = None) -> pa.Table:
+    """Arrow table of the current snapshot, memory-mapped and limited to columns"""
+    manifest = snapshot_manifest(name, directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No {name} snapshot in {directory or SNAPSHOT_DIR}, run cleaning.py first")
+    path = Path(directory or SNAPSHOT_DIR) / manifest["file"]
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+def load_snapshot(columns: List[str] = None, name: str = DATASET, directory: Path = None) -> pd.DataFrame:
+    """DataFrame of the current snapshot (dictionary columns become categoricals)"""
+    return read_snapshot(columns, name, directory).to_pandas()
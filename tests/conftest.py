@@ -0,0 +1,11 @@
+"""
+The stage folders are not packages: their scripts import each other by module name,
+so the tests put those folders (and the repository root, for shared/) on sys.path
+"""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ("Tools Call", "cleaning-visualization", ""):
+    sys.path.insert(0, str(ROOT / folder))
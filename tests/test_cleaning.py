@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+
+import cleaning
+from benchmarks.corpus import admissions_data
+from benchmark_dtypes import value_mismatches
+from benchmark_features import feature_mismatches
+from benchmark_matcher import institution_names
+from benchmark_patterns import CASES, random_texts
+from cleaned_writer import CLEANED_DTYPES
+from cleaning import (GLOBAL_UNDERGRAD_RANKINGS, PHD_ECON_RANKINGS, add_features, add_features_rowwise,
+                      clean_frame, convert_gre_scores, convert_old_gre_to_new, get_fuzzy_index, get_matcher,
+                      institution_of, match_university, match_university_scan, rank_university_phd,
+                      rank_university_undergrad)
+import shared.snapshot
+from shared.snapshot import ARROW_TYPES, read_snapshot, snapshot_is_current, write_snapshot
+
+# The if/elif ladder convert_old_gre_to_new used to walk: (lowest old score, new score), then the floor
+OLD_GRE_LADDER = {
+    True: ([(800, 170), (760, 169), (740, 168), (720, 167), (700, 166), (680, 165), (660, 164), (640, 163),
+            (620, 162), (600, 161), (580, 160), (560, 159), (540, 158), (520, 157), (500, 156), (480, 155),
+            (460, 154), (440, 153), (420, 152), (400, 151)], 150),
+    False: ([(800, 170), (730, 169), (700, 168), (670, 167), (640, 166), (610, 165), (580, 164), (550, 163),
+             (520, 162), (500, 161), (470, 160), (450, 159), (430, 158), (410, 157), (390, 156), (370, 155),
+             (350, 154)], 153),
+}
+
+
+def old_gre_to_new(score, is_quant):
+    if 130 <= score <= 170:
+        return score
+    steps, floor = OLD_GRE_LADDER[is_quant]
+    return next((new for low, new in steps if score >= low), floor)
+
+
+@pytest.fixture(scope="module")
+def sample():
+    return admissions_data(400)
+
+
+def test_add_features_matches_rowwise(sample):
+    mismatches = feature_mismatches(add_features_rowwise(sample), add_features(sample))
+    assert {col: count for col, count in mismatches.items() if count} == {}
+
+
+@pytest.mark.parametrize("is_quant,section", [(True, "quant"), (False, "verbal")])
+def test_gre_concordance_matches_old_ladder(is_quant, section):
+    scores = np.arange(0, 900)
+    expected = [old_gre_to_new(score, is_quant) for score in scores]
+    assert convert_gre_scores(scores, section).tolist() == expected
+    assert [convert_old_gre_to_new(score, is_quant) for score in scores] == expected
+
+
+@pytest.mark.parametrize("rankings", [GLOBAL_UNDERGRAD_RANKINGS, PHD_ECON_RANKINGS], ids=["undergrad", "phd"])
+def test_institution_matcher_matches_scan(sample, rankings):
+    names = set(institution_names(sample)) | set(rankings) | {"Chicago", "University of Chicago", "ESS", "MIT"}
+    mismatches = {name for name in names if match_university(name, rankings) != match_university_scan(name, rankings)}
+    assert mismatches == set()
+
+
+@pytest.mark.parametrize("name,patterns,scan,compiled,column", CASES, ids=[case[0] for case in CASES])
+def test_rule_matcher_matches_scan(name, patterns, scan, compiled, column):
+    texts = random_texts(patterns, 3000)
+    assert [compiled(text) for text in texts] == [scan(text) for text in texts]
+
+
+def test_dtypes_leave_values_unchanged(sample):
+    untyped, _ = clean_frame(sample, typed=False)
+    typed, _ = clean_frame(sample)
+    mismatches = value_mismatches(untyped, typed)
+    assert {col: count for col, count in mismatches.items() if count} == {}
+
+
+@pytest.mark.parametrize("rank_of,rankings", [(rank_university_undergrad, GLOBAL_UNDERGRAD_RANKINGS),
+                                              (rank_university_phd, PHD_ECON_RANKINGS)], ids=["undergrad", "phd"])
+def test_exact_matches_are_unchanged(sample, rank_of, rankings):
+    names = set(institution_names(sample)) | set(rankings)
+    exact = {name: match_university(name, rankings) for name in names}
+    assert {name: rank_of(name) for name, rank in exact.items() if rank is not None} == \
+        {name: rank for name, rank in exact.items() if rank is not None}
+
+
+@pytest.mark.parametrize("name,key", [
+    ("Boston College", "boston college"),
+    ("Boston Colege", "boston college"),
+    ("Boston Univ", "boston university"),
+    ("Massachussets Institute of Technology", "massachusetts institute of technology"),
+    ("London Schol of Economics", "london school of economics"),
+    ("UC Berkley", "uc berkeley"),
+])
+def test_fuzzy_match_finds_the_right_school(name, key):
+    assert get_fuzzy_index(PHD_ECON_RANKINGS).resolve(name)[0] == key
+
+
+@pytest.mark.parametrize("name", ["Chicago", "University of Texas", "University of California", "Australian University",
+                                  "ESS", "T5 in Economics"])
+def test_fuzzy_match_rejects_ambiguous_or_partial_names(name):
+    for rankings in (GLOBAL_UNDERGRAD_RANKINGS, PHD_ECON_RANKINGS):
+        assert get_fuzzy_index(rankings).resolve(name) == (None, None)
+
+
+def test_rank_cues_are_read_before_fuzzy_matching():
+    assert rank_university_undergrad("Top 5 in Economics") == 1
+    assert rank_university_undergrad("T5 in Economics") is None
+
+
+class RecordingConnection:
+    """Stands in for a psycopg2 connection: records statements, returns no rows"""
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_partitions_only_read_the_alias_table(sample, monkeypatch):
+    conn = RecordingConnection()
+    monkeypatch.setattr(cleaning, "save_institution_aliases", lambda conn, aliases: None)
+    clean_frame(sample, conn)
+    assert conn.statements and all(sql.startswith("SELECT") for sql in conn.statements)
+
+
+def test_institution_ids_come_only_from_exact_matches():
+    assert institution_of("Boston College") != institution_of("Boston University")
+    assert institution_of("Harvard") == institution_of("Harvard University") is not None
+    assert institution_of("Massachussets Institute of Technology") is None
+    assert institution_of("UC Berkley") is None
+
+
+def test_snapshot_types_follow_cleaned_dtypes(sample, tmp_path):
+    cleaned, _ = clean_frame(sample)
+    write_snapshot([cleaned], "test", CLEANED_DTYPES, directory=tmp_path)
+    table = read_snapshot(directory=tmp_path)
+    typed = [col for col in cleaned.columns if col in CLEANED_DTYPES]
+    assert {col: table.schema.field(col).type for col in typed} == \
+        {col: ARROW_TYPES[CLEANED_DTYPES[col]] for col in typed}
+    assert np.allclose(table.column("gre_quant_std").to_pandas(), cleaned["gre_quant_std"].astype(float), equal_nan=True)
+
+
+def test_matcher_caches_follow_the_rankings_table():
+    assert get_matcher(PHD_ECON_RANKINGS) is get_matcher(PHD_ECON_RANKINGS)
+    # A dict that is not a loaded table never gets or replaces a cached matcher
+    other = {"boston college": 1}
+    assert get_matcher(other).match("Harvard University") is None
+    assert get_fuzzy_index(other) is not get_fuzzy_index(PHD_ECON_RANKINGS)
+    assert get_matcher(PHD_ECON_RANKINGS).match("Harvard University") is not None
+
+
+def test_snapshot_is_current_only_for_the_table_version_it_was_read_at(sample, tmp_path, monkeypatch):
+    cleaned, _ = clean_frame(sample)
+    assert not snapshot_is_current(None, directory=tmp_path)
+    write_snapshot([cleaned], "test", CLEANED_DTYPES, directory=tmp_path, source_version="400/400/7")
+    monkeypatch.setattr(shared.snapshot, "table_version", lambda conn, table: "400/400/7")
+    assert snapshot_is_current(None, directory=tmp_path)
+    # e.g. an incremental cleaning run with --no-snapshot
+    monkeypatch.setattr(shared.snapshot, "table_version", lambda conn, table: "400/400/9")
+    assert not snapshot_is_current(None, directory=tmp_path)
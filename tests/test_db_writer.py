@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+import db_writer
+from db_writer import RecordWriter
+
+
+def failing_copy(conn, records):
+    raise RuntimeError("COPY failed")
+
+
+def test_write_raises_writer_error_instead_of_blocking(monkeypatch):
+    monkeypatch.setattr(db_writer, "copy_records", failing_copy)
+
+    async def produce():
+        writer = RecordWriter(None, max_pending=2).start()
+        for _ in range(10):
+            await writer.write([{"original_post_id": 1}])
+
+    with pytest.raises(RuntimeError, match="COPY failed"):
+        asyncio.run(asyncio.wait_for(produce(), timeout=5))
+
+
+def test_close_raises_writer_error(monkeypatch):
+    monkeypatch.setattr(db_writer, "copy_records", failing_copy)
+
+    async def produce():
+        writer = RecordWriter(None).start()
+        await writer.write([{"original_post_id": 1}])
+        await writer.close()
+
+    with pytest.raises(RuntimeError, match="COPY failed"):
+        asyncio.run(asyncio.wait_for(produce(), timeout=5))
+
+
+def test_records_are_written_in_order(monkeypatch):
+    written = []
+    monkeypatch.setattr(db_writer, "copy_records", lambda conn, records: written.extend(records))
+
+    async def produce():
+        writer = RecordWriter(None, max_pending=1).start()
+        for i in range(5):
+            await writer.write([{"original_post_id": i}])
+        await writer.close()
+        return writer.rows_written
+
+    assert asyncio.run(produce()) == 5
+    assert [r["original_post_id"] for r in written] == list(range(5))
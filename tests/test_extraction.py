@@ -0,0 +1,118 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import backends
+import batch_extraction
+import gpt_tools_call
+import reextract_fields
+from backends import ExtractionBackend, LocalServerBackend, MockBackend
+from pre_extractor import pre_extract
+from preprocessing import QuoteFilter, prepare_posts, estimate_tokens
+
+
+def test_model_is_asked_only_for_fields_the_rules_left(monkeypatch):
+    backend = MockBackend()
+    asked = []
+    complete_batch = backend.complete_batch
+
+    async def recording(batch, output_format):
+        asked.append(set(output_format["json_schema"]["schema"]["properties"]))
+        return await complete_batch(batch, output_format)
+
+    monkeypatch.setattr(backend, "complete_batch", recording)
+    monkeypatch.setitem(backends._instances, "mock", backend)
+
+    posts = pd.DataFrame({
+        "id": [1, 2],
+        "post_content": ["GPA 3.8/4.0, GRE 165Q/160V/4.5AWA. Accepted at Harvard, rejected from Yale.",
+                         "Accepted at Harvard, rejected from Yale, still waiting on MIT."],
+        "thread_url": ["t1", "t2"],
+    })
+    requests = prepare_posts(posts, QuoteFilter())
+    successes, errors, _ = asyncio.run(gpt_tools_call.process_batch(requests, backend_name="mock"))
+
+    assert not errors
+    local = {"undergrad_gpa", "undergrad_gpa_out_of", "gre_quant", "gre_verbal", "gre_writing"}
+    assert any(not (fields & local) for fields in asked)
+    assert any(local <= fields for fields in asked)
+    record = next(r for r in successes if r["original_post_id"] == 1)
+    assert (record["gre_quant"], record["gre_verbal"], record["undergrad_gpa"]) == (165, 160, 3.8)
+    assert all(r["segment"] == 1 for r in successes)
+
+
+def test_narrowed_prompt_is_smaller():
+    post = "GPA 3.8/4.0, GRE 165Q/160V. Accepted at Harvard."
+    narrow = [f for f in gpt_tools_call.EXTRACTION_FIELDS if not f.name.startswith(("gre_", "undergrad_gpa"))]
+    tokens = lambda fields: sum(estimate_tokens(m["content"]) for m in gpt_tools_call.build_messages(post, fields))
+    assert tokens(narrow) < tokens(None)
+
+
+def test_local_backend_keeps_at_most_one_request_per_slot(monkeypatch):
+    monkeypatch.setenv("LOCAL_LLM_PARALLEL", "3")
+    backend = LocalServerBackend()
+    answer = MockBackend()._answer
+    in_flight, peak = 0, 0
+
+    async def complete(messages, output_format):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return answer(messages, output_format)
+
+    monkeypatch.setattr(backend, "complete", complete)
+    monkeypatch.setitem(backends._instances, "local", backend)
+
+    items = [(i, f"Accepted at Harvard, GPA 3.{i % 10}") for i in range(20)]
+    results = asyncio.run(gpt_tools_call.extract_requests(items, max_concurrent=10, backend_name="local"))
+
+    assert all(r["success"] for r in results)
+    assert peak == 3
+
+
+def test_backend_must_implement_complete():
+    class Incomplete(ExtractionBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_batch_requests_are_narrowed_like_online_ones(tmp_path):
+    posts = pd.DataFrame({
+        "id": [1],
+        "post_content": ["GPA 3.8/4.0, GRE 165Q/160V/4.5AWA. Accepted at Harvard, rejected from Yale."],
+        "thread_url": ["t1"],
+    })
+    prepared = {r.key: r for r in prepare_posts(posts, QuoteFilter())}
+    pre_results = {key: pre_extract(r.text) for key, r in prepared.items()}
+    fields = gpt_tools_call.remaining_fields(pre_results["1"])
+
+    [request] = batch_extraction.build_extraction_requests(prepared, pre_results)
+    assert request["body"]["messages"] == gpt_tools_call.build_messages(prepared["1"].text, fields)
+    assert request["body"]["response_format"] == gpt_tools_call.extraction_spec(fields)[1]
+    assert "gre_quant" not in request["body"]["response_format"]["json_schema"]["schema"]["properties"]
+
+    client = batch_extraction.LocalBatchClient(
+        lambda body: MockBackend()._answer(body["messages"], body["response_format"]).content
+    )
+    [path] = batch_extraction.write_batch_files([request], str(tmp_path))
+    output = client.download(client.status(client.submit(path))["output_file_id"])
+    successes, errors, invalid, _ = batch_extraction.ingest_results(output, pre_results)
+    assert not errors and not invalid
+    assert (successes[0]["gre_quant"], successes[0]["undergrad_gpa"]) == (165, 3.8)
+
+
+def test_stale_rows_are_matched_to_requests_by_segment():
+    texts = {(7, 1): "first profile", (7, 2): "second profile", (7, 3): "third profile", (8, 1): "single post"}
+    # Rows in write order: the model's answer for segment 3 before the rules-only one for segment 1,
+    # segment 2 failed and has no row, and one row predates stored segments
+    stale = pd.DataFrame({"id": [10, 11, 12, 13], "original_post_id": [7, 7, 8, 9], "version": [1, 1, 1, 1],
+                          "segment": [3, 1, 1, None]})
+    groups, unmatched = reextract_fields.plan_reextraction(stale, texts)
+    assert [(row_id, text) for row_id, _, text in groups[1][1]] == \
+        [(10, "third profile"), (11, "first profile"), (12, "single post")]
+    assert unmatched == [13]
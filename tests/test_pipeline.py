@@ -0,0 +1,30 @@
+import re
+
+import pipeline
+from pipeline import ROOT, STAGES, TABLE, fingerprint
+
+IMPORTS_DB = re.compile(r"^\s*from shared\.db import", re.M)
+
+
+def test_table_changes_change_the_fingerprint(monkeypatch):
+    cleaning = next(stage for stage in STAGES if stage.name == "cleaning")
+    assert TABLE + "admissions_data" in cleaning.inputs
+
+    monkeypatch.setattr(pipeline, "table_version", lambda stage, table: "100/100/5000")
+    before = fingerprint(cleaning, {})
+    assert fingerprint(cleaning, {}) == before
+    monkeypatch.setattr(pipeline, "table_version", lambda stage, table: "100/100/5012")
+    assert fingerprint(cleaning, {}) != before
+
+
+def test_unreachable_database_counts_as_missing_table(monkeypatch):
+    monkeypatch.setenv("DB_HOST", "127.0.0.1")
+    monkeypatch.setenv("DB_PORT", "1")
+    assert pipeline.table_version(STAGES[2], "forum_posts") == "missing"
+
+
+def test_stages_connecting_to_postgres_depend_on_shared_db():
+    for stage in STAGES:
+        sources = [stage.script] + [name for name in stage.code if name.endswith(".py")]
+        if any(IMPORTS_DB.search((ROOT / name).read_text(encoding="utf-8")) for name in sources):
+            assert "shared/db.py" in stage.code, stage.name
@@ -0,0 +1,66 @@
+import pytest
+
+from gpt_tools_call import remaining_fields
+from pre_extractor import pre_extract
+
+
+@pytest.mark.parametrize("text, expected", [
+    # A score belongs to its own label, not the neighbouring one
+    ("Quant: 168 Verbal: 158", {"gre_quant": 168, "gre_verbal": 158}),
+    ("GRE quant 165 verbal 160", {"gre_quant": 165, "gre_verbal": 160}),
+    ("V 160 Q 167", {"gre_verbal": 160, "gre_quant": 167}),
+    # Score-then-label runs
+    ("GRE 165Q/160V/4.5AWA", {"gre_quant": 165, "gre_verbal": 160, "gre_writing": 4.5}),
+    ("My GRE 167Q, 169V, 5.0 AWA.", {"gre_quant": 167, "gre_verbal": 169, "gre_writing": 5.0}),
+    ("Q170 V160 AW 4.0", {"gre_quant": 170, "gre_verbal": 160, "gre_writing": 4.0}),
+    ("GRE quant 165, verbal 160 and writing 4.5", {"gre_quant": 165, "gre_verbal": 160, "gre_writing": 4.5}),
+    # Unlabeled triple
+    ("GRE: 167/169/5.0", {"gre_quant": 167, "gre_verbal": 169, "gre_writing": 5.0}),
+])
+def test_gre_scores_go_to_their_own_label(text, expected):
+    fields = pre_extract(text).fields
+    assert {k: v for k, v in fields.items() if k.startswith("gre_")} == expected
+
+
+def test_conflicting_gre_scores_are_left_to_the_model():
+    pre = pre_extract("First try quant 160, second try quant 167")
+    assert "gre_quant" not in pre.fields
+    assert pre.needs_llm
+
+
+def test_gpa_with_scale():
+    assert pre_extract("GPA 3.85/4.0").fields == {"undergrad_gpa": 3.85, "undergrad_gpa_out_of": 4.0}
+
+
+@pytest.mark.parametrize("text", [
+    "In at Harvard, MIT; out at Yale",
+    "MIT yes, Harvard no",
+    "Harvard: in!",
+    "Undergrad GPA 3.4, grad GPA 3.9",
+    "MA GPA 3.9/4.0",
+])
+def test_schools_outcomes_and_grad_degrees_go_to_the_model(text):
+    assert pre_extract(text).needs_llm
+
+
+def test_scores_only_post_stays_local():
+    pre = pre_extract("GPA 3.8/4.0, Q170 V160")
+    assert not pre.needs_llm
+    assert pre.fields["gre_quant"] == 170
+
+
+@pytest.mark.parametrize("text", [
+    "GRE 160 170 - q v",  # the 160 pairs with no label
+    "3.5 GPA and 800 on the old quant",  # old-scale score, converted by cleaning
+])
+def test_ambiguous_or_old_scale_gre_goes_to_the_model(text):
+    pre = pre_extract(text)
+    assert not any(field.startswith("gre_") for field in pre.fields)
+    assert pre.needs_llm
+    fields = remaining_fields(pre)
+    assert fields is None or {"gre_quant", "gre_verbal"} <= {f.name for f in fields}
+
+
+def test_unlabeled_numbers_outside_a_gre_context_stay_local():
+    pre = pre_extract("GPA 3.8/4.0, applied to 150 programs")
+    assert pre.fields == {"undergrad_gpa": 3.8, "undergrad_gpa_out_of": 4.0}
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import streaming
+from preprocessing import QuoteFilter, strip_boilerplate
+
+PROFILE = "Undergrad GPA 3.8/4.0, GRE 167Q/160V/4.5AWA, econ and math double major."
+
+
+@pytest.mark.parametrize("tail", [
+    "Thanks in advance for reading. Accepted: Harvard, MIT, Stanford. Rejected: Yale.",
+    "Cheers to everyone who got in! Waitlisted at Princeton, rejected from Berkeley and Yale.",
+    "Good luck! In at Chicago, out at Columbia.",
+])
+def test_results_after_a_sign_off_word_are_kept(tail):
+    text = strip_boilerplate(f"{PROFILE} {tail}")
+    assert text == f"{PROFILE} {tail}"
+
+
+@pytest.mark.parametrize("tail", ["Thanks in advance!", "Cheers, and good luck to everyone", "-- sent from my phone"])
+def test_final_sign_off_is_cut(tail):
+    assert strip_boilerplate(f"{PROFILE} {tail}") == PROFILE
+
+
+def test_sign_off_word_mid_sentence_is_kept():
+    text = "Applied broadly and got lucky with some good luck on the waitlist at NYU"
+    assert strip_boilerplate(text) == text
+
+
+def test_quoted_sentences_are_dropped_by_content():
+    quotes = QuoteFilter()
+    original = "I was admitted to Harvard with full funding this year."
+    assert quotes.strip("t", original) == original
+    reply = quotes.strip("t", f"user1 said: {original} Congrats, where else did you apply?")
+    assert reply.strip() == "Congrats, where else did you apply?"
+    assert original.lower().rstrip(".") in quotes.seen
+
+
+def test_quote_filter_keeps_only_the_current_thread():
+    quotes = QuoteFilter()
+    original = "I was admitted to Harvard with full funding this year."
+    quotes.strip("t1", original)
+    assert quotes.strip("t2", original) == original
+    assert quotes.seen == {original.lower().rstrip(".")}
+
+
+def test_streamed_requests_catch_quotes_across_chunks(monkeypatch):
+    original = "I was admitted to Harvard with full funding this year."
+    chunks = [pd.DataFrame({"id": [1], "post_content": [original], "thread_url": ["t"]}),
+              pd.DataFrame({"id": [2], "post_content": [f"{original} Where else did you apply?"], "thread_url": ["t"]})]
+    monkeypatch.setattr(streaming, "stream_posts", lambda conn, chunk_size: iter(chunks))
+    assert [r.text for r in streaming.stream_requests(None)] == [original, "Where else did you apply?"]